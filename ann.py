@@ -0,0 +1,155 @@
+# ann.py
+
+import re
+import zlib
+
+import numpy as np
+
+# Hash functions are (a * x + b) mod p over 32-bit token hashes
+PRIME = (1 << 31) - 1
+
+TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+
+def tokenize(text):
+    """Distinct lower-case word tokens of a feature string."""
+    return set(TOKEN_RE.findall((text or "").lower()))
+
+
+class MinHashLSH:
+    """
+    MinHash signatures in banded hash tables, for candidate generation.
+
+    Each movie's token set (genre, language, cast, director, keywords)
+    gets a signature of ``bands * rows`` minimum hashes. Two movies land
+    in the same bucket of a band when all ``rows`` values of that band
+    agree, which happens with probability J ** rows for Jaccard
+    similarity J. More bands raise recall, more rows per band shrink
+    the candidate sets.
+
+    The index is a set of flat arrays (one sorted key array per band)
+    that is saved and memory-mapped with the recommender model. It is
+    rebuilt together with the model on every catalog change: the
+    vectorizer vocabulary is refitted then anyway, and building the
+    signatures costs a fraction of that.
+    """
+
+    def __init__(self, bands=16, rows=4, seed=1):
+        self.bands = bands
+        self.rows = rows
+        rng = np.random.default_rng(seed)
+        n = bands * rows
+        self.a = rng.integers(1, PRIME, n, dtype=np.uint64)
+        self.b = rng.integers(0, PRIME, n, dtype=np.uint64)
+        # Odd multipliers that fold one band's values into a 64-bit key
+        self.mix = rng.integers(1, 1 << 62, rows, dtype=np.uint64) | np.uint64(1)
+
+        self.ids = np.empty(0, dtype=np.int64)
+        self.id_order = np.empty(0, dtype=np.intp)
+        self.signatures = np.empty((0, n), dtype=np.uint32)
+        self.band_keys = np.empty((bands, 0), dtype=np.uint64)
+        self.band_ids = np.empty((bands, 0), dtype=np.int64)
+
+    @property
+    def params(self):
+        return {"bands": self.bands, "rows": self.rows}
+
+    # -----------------------------
+    # Signatures
+    # -----------------------------
+    def signature(self, text):
+        """MinHash signature of a feature string, or None if it has no tokens."""
+        words = tokenize(text)
+        if not words:
+            return None
+        hashes = np.fromiter(
+            (zlib.crc32(w.encode()) for w in words),
+            dtype=np.uint64, count=len(words)
+        )
+        values = (np.outer(self.a, hashes) + self.b[:, None]) % np.uint64(PRIME)
+        return values.min(axis=1).astype(np.uint32)
+
+    def keys_of(self, signatures):
+        """Band keys (n x bands) of a block of signatures (n x bands*rows)."""
+        blocks = signatures.reshape(len(signatures), self.bands, self.rows)
+        # uint64 arithmetic wraps, which is fine for a hash
+        return (blocks.astype(np.uint64) * self.mix).sum(axis=2, dtype=np.uint64)
+
+    # -----------------------------
+    # Building
+    # -----------------------------
+    def build(self, ids, texts):
+        """Index ``texts`` under ``ids``; movies without tokens are skipped."""
+        ids = np.asarray(ids, dtype=np.int64)
+        signatures = np.zeros((len(ids), self.bands * self.rows), dtype=np.uint32)
+        keep = np.zeros(len(ids), dtype=bool)
+        for i, text in enumerate(texts):
+            sig = self.signature(text)
+            if sig is not None:
+                signatures[i] = sig
+                keep[i] = True
+
+        self.ids = ids[keep]
+        self.id_order = np.argsort(self.ids, kind="stable")
+        self.signatures = signatures[keep]
+
+        keys = self.keys_of(self.signatures).T  # bands x n
+        order = np.argsort(keys, axis=1, kind="stable")
+        self.band_keys = np.take_along_axis(keys, order, axis=1)
+        self.band_ids = self.ids[order]
+        return self
+
+    # -----------------------------
+    # Querying
+    # -----------------------------
+    def _base_position(self, movie_id):
+        if len(self.ids) == 0:
+            return None
+        pos = np.searchsorted(self.ids, movie_id, sorter=self.id_order)
+        if pos < len(self.ids) and self.ids[self.id_order[pos]] == movie_id:
+            return int(self.id_order[pos])
+        return None
+
+    def signature_of(self, movie_id):
+        pos = self._base_position(movie_id)
+        return None if pos is None else np.asarray(self.signatures[pos])
+
+    def candidates(self, movie_id=None, signature=None):
+        """Movie IDs sharing at least one band bucket (the movie included)."""
+        if signature is None:
+            signature = self.signature_of(movie_id)
+        if signature is None:
+            return np.empty(0, dtype=np.int64)
+
+        keys = self.keys_of(signature[None, :])[0]
+        found = []
+        for band, key in enumerate(keys):
+            band_keys = self.band_keys[band]
+            lo = np.searchsorted(band_keys, key, side="left")
+            hi = np.searchsorted(band_keys, key, side="right")
+            if hi > lo:
+                found.append(self.band_ids[band, lo:hi])
+        return np.unique(np.concatenate(found)) if found else np.empty(0, np.int64)
+
+    # -----------------------------
+    # Persistence
+    # -----------------------------
+    def arrays(self):
+        """Flat arrays to save next to the model."""
+        return {
+            "ann_ids": self.ids,
+            "ann_id_order": self.id_order,
+            "ann_signatures": self.signatures,
+            "ann_band_keys": self.band_keys,
+            "ann_band_ids": self.band_ids,
+        }
+
+    @classmethod
+    def from_arrays(cls, params, arrays, seed=1):
+        index = cls(params["bands"], params["rows"], seed=seed)
+        index.ids = arrays["ann_ids"]
+        index.id_order = arrays["ann_id_order"]
+        index.signatures = arrays["ann_signatures"]
+        index.band_keys = arrays["ann_band_keys"]
+        index.band_ids = arrays["ann_band_ids"]
+        return index
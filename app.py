@@ -1,22 +1,50 @@
-from flask import Flask, render_template, request, redirect, url_for, abort, flash
-from flask_sqlalchemy import SQLAlchemy
+import hashlib
+import os
+import threading
+import time
+from functools import wraps
+from types import SimpleNamespace
+
+from flask import (
+    Blueprint, Flask, Response, current_app, g, has_app_context, make_response,
+    render_template, request, redirect, send_from_directory, session,
+    stream_with_context, url_for, abort, flash
+)
+from markupsafe import Markup
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import joinedload
 from flask_login import (
-    LoginManager, UserMixin,
+    LoginManager,
     login_user, login_required,
     logout_user, current_user
 )
+from werkzeug.exceptions import HTTPException
 from werkzeug.security import generate_password_hash, check_password_hash
-from recommender import get_recommendations
-from werkzeug.utils import secure_filename
-import os
-from functools import wraps
-
 
-app = Flask(__name__)
-app.secret_key = "movie_secret_key"
+from avatars import UploadError, avatar_file, is_hashed, save_upload
+from export import DATASETS, FORMATS, export_chunks, gzip_chunks
+from models import (
+    db, CatalogChange, Genre, JobState, Movie, MovieNeighbor, Rating,
+    User, Watchlist, Wishlist, movie_genre
+)
+from search import restore_search_triggers, search_matches, setup_search_index
+from pagination import InvalidCursor, keyset_page, page_size
+from facets import FacetCache, split_genres
+from migrations import migrate, stamp_latest
+from metrics import Metrics
+from page_cache import FragmentCache
+from sqlite_pragmas import apply_pragmas, profile_pragmas
+from recommendation_cache import RecommendationCache, SQLiteCacheBackend
+from serializers import json_response, movie_json
+from user_cache import UserCache, UserSnapshot
+
+# The recommender modules (numpy / scipy / scikit-learn) are imported on
+# first use, see engines(), so scripts and workers start fast.
+
+bp = Blueprint("main", __name__)
 
 UPLOAD_FOLDER = "static/uploads"
-app.config["UPLOAD_FOLDER"] = UPLOAD_FOLDER
+DEFAULT_PROFILE_IMAGE = "default.png"
 
 def admin_required(f):
     @wraps(f)
@@ -26,123 +54,825 @@ def admin_required(f):
         return f(*args, **kwargs)
     return decorated
 
-# Database config
-app.config["SQLALCHEMY_DATABASE_URI"] = "sqlite:///database.db"
-app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
+# ---------------- METRICS ----------------
+def get_metrics():
+    return current_app.extensions["metrics"]
+
 
-db = SQLAlchemy(app)
+def observe_stage(stage, seconds):
+    """Recommender stage timings go to the app doing the work."""
+    if has_app_context():
+        get_metrics().observe_stage(stage, seconds)
 
 # ---------------- LOGIN MANAGER ----------------
 login_manager = LoginManager()
-login_manager.init_app(app)
-login_manager.login_view = "login"
-
-# ---------------- USER MODEL ----------------
-class User(UserMixin, db.Model):
-    id = db.Column(db.Integer, primary_key=True)
-    username = db.Column(db.String(100), nullable=False)
-    email = db.Column(db.String(120), unique=True, nullable=False)
-    password = db.Column(db.String(200), nullable=False)
-    profile_image = db.Column(db.String(200), default="default.png")
-    is_admin = db.Column(db.Boolean, default=False)
-    is_active = db.Column(db.Boolean, default=True)
-    is_verified = db.Column(db.Boolean, default=False)
-
-
-# ---------------- MOVIE MODEL ----------------
-class Movie(db.Model):
-    id = db.Column(db.Integer, primary_key=True)
-    title = db.Column(db.String(200), nullable=False)
-    language = db.Column(db.String(50), nullable=False)
-    genre = db.Column(db.String(200), nullable=False)
-    description = db.Column(db.Text, nullable=False)
-    cast = db.Column(db.Text, nullable=False)
-    director = db.Column(db.String(100), nullable=False)
-    keywords = db.Column(db.Text, nullable=False)
-    release_year = db.Column(db.Integer, nullable=False)
-    poster = db.Column(db.String(300), nullable=False)
-
-# ---------------- WISHLIST MODEL ----------------
-class Wishlist(db.Model):
-    id = db.Column(db.Integer, primary_key=True)
-    user_id = db.Column(db.Integer, db.ForeignKey("user.id"))
-    movie_id = db.Column(db.Integer, db.ForeignKey("movie.id"))
-
-    user = db.relationship("User", backref="wishlist_items")
-    movie = db.relationship("Movie")
-
-class Watchlist(db.Model):
-    id = db.Column(db.Integer, primary_key=True)
-    user_id = db.Column(db.Integer, db.ForeignKey("user.id"))
-    movie_id = db.Column(db.Integer, db.ForeignKey("movie.id"))
-    status = db.Column(db.String(20))  # "watchlist" or "watched"
-
-    __table_args__ = (
-        db.UniqueConstraint("user_id", "movie_id", name="unique_user_movie"),
-    )
-
-    user = db.relationship("User")
-    movie = db.relationship("Movie")
-
-
-class Rating(db.Model):
-    id = db.Column(db.Integer, primary_key=True)
-    user_id = db.Column(db.Integer, db.ForeignKey("user.id"))
-    movie_id = db.Column(db.Integer, db.ForeignKey("movie.id"))
-    rating = db.Column(db.Integer, nullable=False)
-    review = db.Column(db.Text)   # 👈 NEW
-
-    user = db.relationship("User")
-    movie = db.relationship("Movie")
+login_manager.login_view = "main.login"
+
+# ---------------- DATABASE ----------------
+def init_db(rebuild_search=False):
+    """Create missing tables, indexes and the full-text search index."""
+    existing = db.inspect(db.engine).has_table("movie")
+    db.create_all()
+    if existing:
+        for step in migrate(db.engine):
+            print(f"Applied migration {step}")
+    else:
+        stamp_latest(db.engine)
+
+    # create_all skips tables that already exist, so add new indexes too
+    for table in db.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(db.engine, checkfirst=True)
+    setup_search_index(db.engine, rebuild=rebuild_search)
+
+    # Databases created before genres were normalized
+    has_genres = db.session.query(movie_genre.c.movie_id).first()
+    if not has_genres and db.session.query(Movie.id).first():
+        rebuild_movie_genres()
+
+
+# ---------------- RATING AGGREGATES ----------------
+def apply_rating_change(movie_id, added, delta):
+    """Shift a movie's aggregates by ``added`` ratings worth ``delta`` stars."""
+    count = Movie.rating_count + added
+    total = Movie.rating_sum + delta
+    Movie.query.filter_by(id=movie_id).update({
+        Movie.rating_count: count,
+        Movie.rating_sum: total,
+        Movie.rating_avg: db.case((count > 0, total * 1.0 / count), else_=0.0),
+    }, synchronize_session=False)
+    record_rating_change()
+
+
+def record_rating_change():
+    """Bump the ratings version (see content_version) in this transaction."""
+    db.session.execute(
+        sqlite_insert(JobState).values(name="ratings", value=1)
+        .on_conflict_do_update(
+            index_elements=[JobState.name],
+            set_={"value": JobState.value + 1}
+        )
+    )
+
+
+def forget_user_ratings(user_id):
+    """Take a user's ratings out of the movie aggregates (before deleting them)."""
+    db.session.execute(db.text("""
+        UPDATE movie
+        SET rating_count = rating_count - agg.n,
+            rating_sum = rating_sum - agg.total,
+            rating_avg = CASE WHEN rating_count - agg.n > 0
+                THEN (rating_sum - agg.total) * 1.0 / (rating_count - agg.n)
+                ELSE 0 END
+        FROM (
+            SELECT movie_id, COUNT(*) AS n, SUM(rating) AS total
+            FROM rating WHERE user_id = :user_id
+            GROUP BY movie_id
+        ) AS agg
+        WHERE movie.id = agg.movie_id
+    """), {"user_id": user_id})
+    record_rating_change()
+
+
+# ---------------- GENRE HELPERS ----------------
+def genres_for(text):
+    """Genre rows for a genre string, creating missing ones."""
+    names = split_genres(text)
+    existing = {
+        g.name: g for g in Genre.query.filter(Genre.name.in_(names))
+    }
+    genres = []
+    for name in names:
+        if name not in existing:
+            existing[name] = Genre(name=name)
+            db.session.add(existing[name])
+        genres.append(existing[name])
+    return genres
+
+
+def iter_movie_batches(*columns, batch_size=5000):
+    """Yield lists of movie rows in id order, one keyset batch at a time."""
+    last_id = 0
+    while True:
+        batch = db.session.query(Movie.id, *columns).filter(
+            Movie.id > last_id
+        ).order_by(Movie.id).limit(batch_size).all()
+        if not batch:
+            return
+        yield batch
+        last_id = batch[-1].id
+
+
+def rebuild_movie_genres(batch_size=5000):
+    """Recreate every movie <-> genre link from Movie.genre in bulk."""
+    names = set()
+    for batch in iter_movie_batches(Movie.genre, batch_size=batch_size):
+        for m in batch:
+            names.update(split_genres(m.genre))
+
+    known = {g.name for g in Genre.query.with_entities(Genre.name)}
+    missing = [{"name": n} for n in sorted(names - known)]
+    if missing:
+        db.session.execute(Genre.__table__.insert(), missing)
+    genre_ids = dict(Genre.query.with_entities(Genre.name, Genre.id).all())
+
+    db.session.execute(movie_genre.delete())
+    for batch in iter_movie_batches(Movie.genre, batch_size=batch_size):
+        links = [
+            {"movie_id": m.id, "genre_id": genre_ids[name]}
+            for m in batch for name in split_genres(m.genre)
+        ]
+        if links:
+            db.session.execute(movie_genre.insert(), links)
+    db.session.commit()
+
+
+# ---------------- FACETS ----------------
+def get_facet_cache():
+    return current_app.extensions["facet_cache"]
+
+
+def filter_movies(query, language=None, genre=None, year=None):
+    """Apply the /movies dropdown filters as exact indexed lookups."""
+    if language:
+        query = query.filter(Movie.language == language)
+    if genre:
+        query = query.filter(Movie.id.in_(
+            db.select(movie_genre.c.movie_id)
+            .join(Genre, Genre.id == movie_genre.c.genre_id)
+            .where(Genre.name == genre)
+        ))
+    if year:
+        query = query.filter(Movie.release_year == year)
+    return query
+
+
+def compute_facets(language=None, genre=None, year=None):
+    """
+    (value, count) pairs for each dropdown.
+
+    Each facet is counted with the other filters applied but not its own,
+    so the dropdown still shows the alternatives for the current selection.
+    """
+    languages = filter_movies(
+        db.session.query(Movie.language, db.func.count(Movie.id)),
+        genre=genre, year=year
+    ).group_by(Movie.language).order_by(Movie.language).all()
+
+    genres = filter_movies(
+        db.session.query(Genre.name, db.func.count(Movie.id))
+        .join(movie_genre, movie_genre.c.genre_id == Genre.id)
+        .join(Movie, Movie.id == movie_genre.c.movie_id),
+        language=language, year=year
+    ).group_by(Genre.name).order_by(Genre.name).all()
+
+    years = filter_movies(
+        db.session.query(Movie.release_year, db.func.count(Movie.id)),
+        language=language, genre=genre
+    ).group_by(Movie.release_year).order_by(Movie.release_year.desc()).all()
+
+    return {
+        "languages": [tuple(r) for r in languages],
+        "genres": [tuple(r) for r in genres],
+        "years": [tuple(r) for r in years],
+    }
+
+
+def get_facets(language=None, genre=None, year=None):
+    return get_facet_cache().get(
+        catalog_version(),
+        (language or "", genre or "", str(year or "")),
+        lambda: compute_facets(language, genre, year)
+    )
+
+
+# ---------------- PAGINATION ----------------
+def paginate(query, columns, descending=False, default_size=None):
+    """Keyset page of ``query`` driven by the ?after= / ?per_page= args."""
+    size = page_size(
+        request.args.get("per_page"),
+        default=default_size or current_app.config["PAGE_SIZE"]
+    )
+    try:
+        return keyset_page(
+            query, columns,
+            cursor=request.args.get("after"),
+            limit=size,
+            descending=descending
+        )
+    except InvalidCursor:
+        abort(400)
+
+
+@bp.app_template_global()
+def page_url(cursor=None):
+    """Current URL with its query string, moved to the page at ``cursor``."""
+    args = request.args.to_dict()
+    args.pop("after", None)
+    if cursor:
+        args["after"] = cursor
+    return url_for(request.endpoint, **request.view_args, **args)
+
+
+def record_catalog_change(movie_id, action):
+    """
+    Move the catalog version (see catalog_version) in this transaction.
+
+    Every worker picks it up on its next read: get_recommender refits
+    the content model together with its LSH index, the suggest index
+    syncs the changed movies, and the facet, fragment and recommendation
+    caches are keyed on it.
+    """
+    db.session.add(CatalogChange(movie_id=movie_id, action=action))
+
+
+def catalog_version():
+    return db.session.query(db.func.max(CatalogChange.id)).scalar() or 0
+
+
+# ---------------- PAGE CACHING ----------------
+def get_fragment_cache():
+    return current_app.extensions["fragment_cache"]
+
+
+def content_version():
+    """
+    (catalog version, ratings version): changes on every movie write and
+    every rating. One query, remembered for the rest of the request.
+    """
+    if "content_version" not in g:
+        row = db.session.execute(db.select(
+            db.select(db.func.max(CatalogChange.id)).scalar_subquery(),
+            db.select(JobState.value)
+            .where(JobState.name == "ratings").scalar_subquery()
+        )).one()
+        g.content_version = (row[0] or 0, row[1] or 0)
+    return g.content_version
+
+
+def fragment(key, template, load):
+    """
+    ``template`` rendered with the context ``load()`` returns, cached
+    per content version. The result must be the same for every user.
+    """
+    return get_fragment_cache().get(
+        content_version(), key,
+        lambda: Markup(render_template(template, **load()))
+    )
+
+
+def anonymous_conditional(view):
+    """
+    ETag for anonymous visitors, from content_version().
+
+    A conditional GET that still matches is answered with 304 before
+    the view runs. Logged-in pages (and pages with pending flash
+    messages) carry per-user parts and are always rendered.
+
+    There is no Last-Modified: versions are counters shared through the
+    database, and a time only this worker knows could answer
+    If-Modified-Since with 304 for content that changed elsewhere.
+    """
+    @wraps(view)
+    def decorated(*args, **kwargs):
+        if current_user.is_authenticated or session.get("_flashes"):
+            return view(*args, **kwargs)
+
+        version = content_version()
+        etag = hashlib.sha1(
+            f"{version}:{request.full_path}".encode()
+        ).hexdigest()
+        fresh = request.if_none_match.contains(etag)
+        response = Response(status=304) if fresh else make_response(
+            view(*args, **kwargs)
+        )
+        response.set_etag(etag)
+        response.cache_control.no_cache = True
+        response.vary.add("Cookie")
+        return response
+    return decorated
+
+
+# ---------------- RECOMMENDER ----------------
+_engines_lock = threading.Lock()
+
+
+def engines():
+    """
+    The app's recommender, CF engine and profile store, created on first use.
+
+    Creating them imports numpy, scipy and scikit-learn, which dominates
+    startup time; processes that never recommend anything skip it.
+    """
+    state = current_app.extensions.get("engines")
+    if state is None:
+        with _engines_lock:
+            state = current_app.extensions.get("engines")
+            if state is None:
+                state = _create_engines(current_app.config)
+                current_app.extensions["engines"] = state
+    return state
+
+
+def loaded_engines():
+    """The engines if they were created already, else None."""
+    return current_app.extensions.get("engines")
+
+
+def _create_engines(config):
+    from collaborative import CollaborativeEngine
+    from profiles import ProfileStore
+    from recommender import RecommenderEngine, set_stage_observer
+
+    set_stage_observer(observe_stage)
+    return SimpleNamespace(
+        recommender=RecommenderEngine(
+            config["RECOMMENDER_MODEL_PATH"],
+            watched_boost=config["RECOMMENDER_WATCHED_BOOST"],
+            ann=config["RECOMMENDER_ANN"],
+            ann_min_movies=config["RECOMMENDER_ANN_MIN_MOVIES"]
+        ),
+        # Item-item collaborative filtering from ratings and watchlists.
+        # Fitted on first use, then updated in place as users rate / watch.
+        collaborative=CollaborativeEngine(
+            k=20, ttl=config["RECOMMENDER_CF_TTL"]
+        ),
+        # Per-user taste profiles, cached and updated as users rate /
+        # watch / wishlist instead of being rebuilt on every view.
+        profiles=ProfileStore(
+            max_users=config["PROFILE_CACHE_USERS"],
+            ttl=config["PROFILE_CACHE_TTL"]
+        ),
+    )
+
+
+def load_recommender_movies():
+    return Movie.query.with_entities(
+        Movie.id, Movie.genre, Movie.language,
+        Movie.cast, Movie.director, Movie.keywords
+    ).all()
+
+
+def get_recommender():
+    return engines().recommender.ensure_fitted(
+        catalog_version(), load_recommender_movies
+    )
+
+
+def load_interactions():
+    from collaborative import interaction_value
+
+    for r in Rating.query.with_entities(
+            Rating.user_id, Rating.movie_id, Rating.rating):
+        yield r.user_id, r.movie_id, interaction_value(rating=r.rating)
+    for w in Watchlist.query.with_entities(
+            Watchlist.user_id, Watchlist.movie_id, Watchlist.status):
+        yield w.user_id, w.movie_id, interaction_value(status=w.status)
+
+
+def get_collaborative():
+    return engines().collaborative.ensure_fitted(load_interactions)
+
+
+def refresh_interaction(user_id, movie_id):
+    """Push the current rating / watch status of one pair into the CF model."""
+    state = loaded_engines()
+    if state is None or not state.collaborative.fitted:
+        return
+    from collaborative import interaction_value
+
+    rating = Rating.query.filter_by(
+        user_id=user_id, movie_id=movie_id
+    ).with_entities(Rating.rating).first()
+    entry = Watchlist.query.filter_by(
+        user_id=user_id, movie_id=movie_id
+    ).with_entities(Watchlist.status).first()
+    value = max(
+        interaction_value(rating=rating.rating if rating else None),
+        interaction_value(status=entry.status if entry else None)
+    )
+    state.collaborative.update(user_id, movie_id, value)
+
+
+def get_recommendation_cache():
+    return current_app.extensions["recommendation_cache"]
+
+
+def forget_user_engines(user_id):
+    """Drop a deleted user from the CF model and the profile store."""
+    state = loaded_engines()
+    if state is not None:
+        state.collaborative.mark_stale()
+        state.profiles.forget(user_id)
+
+
+def precomputed_recommendations(movie_id, watched_ids=None, k=5,
+                                exclude_watched=False):
+    """
+    Recommendations from the MovieNeighbor table.
+
+    Returns None when the table was built for an older catalog version
+    or has nothing for this movie, so the caller can use the live model.
+
+    The table only holds each movie's top-K, so watched movies are
+    boosted or dropped within that list. That is exact as long as k
+    picks remain and no watched movie below the list could overtake
+    the k-th once boosted; otherwise this also returns None.
+    """
+    state = db.session.get(JobState, "neighbors")
+    if state is None or state.value != catalog_version():
+        return None
+
+    neighbors = MovieNeighbor.query.filter_by(
+        movie_id=movie_id
+    ).order_by(MovieNeighbor.rank).all()
+    if not neighbors:
+        return None
+
+    watched_ids = watched_ids or set()
+    boost = current_app.config["RECOMMENDER_WATCHED_BOOST"]
+    scored = []
+    for n in neighbors:
+        if n.neighbor_id in watched_ids:
+            if exclude_watched:
+                continue
+            scored.append((n.score + boost, n.neighbor_id))
+        else:
+            scored.append((n.score, n.neighbor_id))
+
+    # sort is stable, so equal scores keep their precomputed rank
+    scored.sort(key=lambda x: x[0], reverse=True)
+    if len(scored) < k:
+        return None
+    if watched_ids and not exclude_watched:
+        # Movies below the list score at most the last stored score
+        listed = {n.neighbor_id for n in neighbors}
+        if (not listed.issuperset(watched_ids)
+                and scored[k - 1][0] <= neighbors[-1].score + boost):
+            return None
+    return [mid for _, mid in scored[:k]]
+
+
+def watched_movie_ids(user_id):
+    watched = Watchlist.query.filter_by(
+        user_id=user_id,
+        status="watched"
+    ).with_entities(Watchlist.movie_id).all()
+    return {w.movie_id for w in watched}
+
+
+def compute_recommendations(movie_id, watched_ids):
+    """
+    Recommended movie ids for one movie page (uncached).
+
+    Precomputed neighbours only cover content similarity, so they are
+    used when there is no collaborative signal to blend in. Otherwise
+    the fitted model (reused until the catalog changes) is queried.
+    """
+    exclude_watched = current_app.config["RECOMMENDER_EXCLUDE_WATCHED"]
+    cf_weight = current_app.config["RECOMMENDER_CF_WEIGHT"]
+    cf_scores = get_collaborative().similar(movie_id) if cf_weight else {}
+
+    recommended_ids = None
+    if not cf_scores:
+        recommended_ids = precomputed_recommendations(
+            movie_id,
+            watched_ids=watched_ids,
+            exclude_watched=exclude_watched
+        )
+    if recommended_ids is None:
+        recommended_ids = get_recommender().recommend(
+            movie_id,
+            watched_ids=watched_ids,
+            exclude_watched=exclude_watched,
+            blend=cf_scores,
+            blend_weight=cf_weight
+        )
+    return recommended_ids
+
+
+def batch_recommendations(movie_ids, watched_ids):
+    """
+    {movie_id: recommended ids} for several movies.
+
+    Cached lists are reused; the rest are scored by the live model in
+    one block, blended with collaborative filtering like single pages.
+    """
+    def compute_many(missing):
+        cf_weight = current_app.config["RECOMMENDER_CF_WEIGHT"]
+        blends = {}
+        if cf_weight:
+            collaborative = get_collaborative()
+            blends = {mid: collaborative.similar(mid) for mid in missing}
+        return get_recommender().recommend_many(
+            missing,
+            watched_ids=watched_ids,
+            exclude_watched=current_app.config["RECOMMENDER_EXCLUDE_WATCHED"],
+            blends=blends,
+            blend_weight=cf_weight
+        )
+
+    return get_recommendation_cache().get_or_compute_many(
+        movie_ids, catalog_version(), watched_ids, compute_many
+    )
+
+
+# ---------------- FOR YOU ----------------
+def user_history(user_id, movie_id=None):
+    """
+    Profile weights and seen movies of one user. Seen movies are every
+    movie in the history (rated, watched, watchlisted or wishlisted),
+    so the feed never suggests them.
+
+    Ratings, watchlist and wishlist are read in a single UNION query;
+    ``movie_id`` narrows it to one movie.
+    """
+    from profiles import profile_weight
+
+    parts = [
+        db.select(Rating.movie_id, db.literal("rated"), Rating.rating)
+        .where(Rating.user_id == user_id),
+        db.select(Watchlist.movie_id, Watchlist.status, db.literal(0))
+        .where(Watchlist.user_id == user_id),
+        db.select(Wishlist.movie_id, db.literal("wishlist"), db.literal(0))
+        .where(Wishlist.user_id == user_id),
+    ]
+    if movie_id is not None:
+        parts = [
+            p.where(p.selected_columns[0] == movie_id) for p in parts
+        ]
+
+    signals = {}
+    for mid, kind, rating in db.session.execute(db.union_all(*parts)):
+        signal = signals.setdefault(
+            mid, {"rating": None, "status": None, "wishlisted": False}
+        )
+        if kind == "rated":
+            signal["rating"] = rating
+        elif kind == "wishlist":
+            signal["wishlisted"] = True
+        else:
+            signal["status"] = kind
+
+    weights, seen = {}, set()
+    for mid, signal in signals.items():
+        weight = profile_weight(**signal)
+        if weight:
+            weights[mid] = weight
+        if signal["rating"] or signal["status"] or signal["wishlisted"]:
+            seen.add(mid)
+    return weights, seen
+
+
+def refresh_profile(user_id, movie_id):
+    """Push one movie's current signals into the user's cached profile."""
+    state = loaded_engines()
+    if state is None or user_id not in state.profiles.profiles:
+        return
+    weights, seen = user_history(user_id, movie_id)
+    state.profiles.update(
+        user_id, get_recommender(), movie_id,
+        weights.get(movie_id, 0.0), movie_id in seen
+    )
+
+
+def refresh_interactions(user_id, movie_ids):
+    """
+    refresh_interaction / refresh_profile after a bulk change: the CF
+    pairs are updated from two queries and the profile is rebuilt on
+    its next use.
+    """
+    state = loaded_engines()
+    if state is None:
+        return
+    state.profiles.forget(user_id)
+    if not state.collaborative.fitted:
+        return
+    from collaborative import interaction_value
+
+    ratings = dict(Rating.query.filter(
+        Rating.user_id == user_id, Rating.movie_id.in_(movie_ids)
+    ).with_entities(Rating.movie_id, Rating.rating).all())
+    statuses = dict(Watchlist.query.filter(
+        Watchlist.user_id == user_id, Watchlist.movie_id.in_(movie_ids)
+    ).with_entities(Watchlist.movie_id, Watchlist.status).all())
+    for movie_id in movie_ids:
+        state.collaborative.update(user_id, movie_id, max(
+            interaction_value(rating=ratings.get(movie_id)),
+            interaction_value(status=statuses.get(movie_id))
+        ))
+
+
+def for_you(user_id):
+    ids = engines().profiles.feed(
+        user_id, get_recommender(), user_history,
+        k=current_app.config["FOR_YOU_SIZE"]
+    )
+    if not ids:
+        return []
+    movie_map = {
+        m.id: m for m in Movie.query.filter(Movie.id.in_(ids)).all()
+    }
+    return [movie_map[mid] for mid in ids if mid in movie_map]
 
 
 @login_manager.user_loader
 def load_user(user_id):
-    return User.query.get(int(user_id))
+    """
+    The session's user as a cached UserSnapshot (see user_cache.py).
+    Deactivated users are logged out.
+    """
+    snapshot = get_user_cache().get(int(user_id), load_user_snapshot)
+    if snapshot is None or not snapshot.is_active:
+        return None
+    return snapshot
+
+
+def load_user_snapshot(user_id):
+    user = db.session.get(User, user_id)
+    return UserSnapshot.from_user(user) if user is not None else None
+
+
+def get_user_cache():
+    return current_app.extensions["user_cache"]
+
+
+def forget_cached_user(user_id):
+    """Call after committing a change to a user row."""
+    get_user_cache().forget(user_id)
+
+# ---------------- AUTOCOMPLETE ----------------
+_suggest_lock = threading.Lock()
+
+
+def suggestion_rows(movie_ids=None):
+    """
+    (id, title, year, cast, director, keywords, popularity) rows for the
+    autocomplete index; popularity = ratings + watchlist entries.
+    """
+    watchers = db.select(
+        Watchlist.movie_id, db.func.count().label("entries")
+    ).group_by(Watchlist.movie_id).subquery()
+    query = db.select(
+        Movie.id, Movie.title, Movie.release_year,
+        Movie.cast, Movie.director, Movie.keywords,
+        Movie.rating_count + db.func.coalesce(watchers.c.entries, 0)
+    ).outerjoin(watchers, watchers.c.movie_id == Movie.id)
+    if movie_ids is not None:
+        query = query.where(Movie.id.in_(movie_ids))
+    return db.session.execute(query).all()
+
+
+def build_suggest_index():
+    from suggest import SuggestIndex
+
+    version = catalog_version()
+    return SuggestIndex().build(suggestion_rows(), version)
+
+
+def get_suggest_index():
+    """
+    The autocomplete index, built on first use and kept in step with
+    the catalog version: admin adds / edits / deletes since the build
+    are applied in place, bulk imports rebuild it. Popularity is
+    refreshed by a background rebuild every SUGGEST_INDEX_TTL seconds.
+    """
+    index = current_app.extensions.get("suggest_index")
+    version = catalog_version()
+    if index is None or index.version != version:
+        with _suggest_lock:
+            index = current_app.extensions.get("suggest_index")
+            if index is None:
+                index = build_suggest_index()
+            elif index.version != version:
+                index = sync_suggest_index(index, version)
+            current_app.extensions["suggest_index"] = index
+
+    ttl = current_app.config["SUGGEST_INDEX_TTL"]
+    if ttl is not None and time.monotonic() - index.built_at > ttl:
+        with _suggest_lock:
+            if time.monotonic() - index.built_at > ttl:
+                # Only one rebuild at a time; queries keep using this index
+                index.built_at = time.monotonic()
+                threading.Thread(
+                    target=_rebuild_suggest_index,
+                    args=(current_app._get_current_object(),), daemon=True
+                ).start()
+    return index
+
+
+def sync_suggest_index(index, version):
+    """Apply the catalog changes after ``index.version`` to ``index``."""
+    from suggest import MAX_OVERLAY
+
+    changed = set(db.session.execute(
+        db.select(CatalogChange.movie_id).where(
+            CatalogChange.id > index.version, CatalogChange.id <= version
+        )
+    ).scalars())
+    # None = bulk import
+    if None in changed or index.overlay_size + len(changed) > MAX_OVERLAY:
+        return build_suggest_index()
+
+    rows = {row[0]: row for row in suggestion_rows(changed)}
+    for movie_id in changed:
+        if movie_id in rows:
+            index.set_movie(*rows[movie_id])
+        else:
+            index.remove_movie(movie_id)
+    index.version = version
+    return index
+
+
+def _rebuild_suggest_index(app):
+    with app.app_context():
+        index = build_suggest_index()
+        # Changes committed meanwhile are synced on the next query
+        with _suggest_lock:
+            app.extensions["suggest_index"] = index
+
+
+# ---------------- PROFILE IMAGES ----------------
+def upload_folder():
+    return os.path.join(current_app.root_path, current_app.config["UPLOAD_FOLDER"])
+
+
+def store_profile_image(file):
+    """
+    Save an uploaded profile image; returns its file name, or None
+    (after flashing why) when the upload was rejected.
+    """
+    try:
+        return save_upload(
+            file.stream, upload_folder(), current_app.config["UPLOAD_MAX_BYTES"]
+        )
+    except UploadError as e:
+        flash(str(e), "danger")
+        return None
+
+
+@bp.app_template_global()
+def avatar_url(filename, size=None):
+    """URL of a profile image, as a thumbnail for ``size`` once rendered."""
+    name = avatar_file(upload_folder(), filename or DEFAULT_PROFILE_IMAGE, size)
+    return url_for("main.avatar", filename=name)
+
+
+@bp.route("/avatars/<filename>")
+def avatar(filename):
+    if not is_hashed(filename):
+        return send_from_directory(upload_folder(), filename)
+    # The name is the content hash, so the file can never change
+    response = send_from_directory(
+        upload_folder(), filename,
+        max_age=current_app.config["AVATAR_MAX_AGE"]
+    )
+    response.cache_control.immutable = True
+    return response
+
 
 # ---------------- ROUTES ----------------
-@app.route("/")
+@bp.route("/")
 def home():
     return render_template("login.html")
 
 # ---------- REGISTER ----------
-@app.route("/register", methods=["GET", "POST"])
+@bp.route("/register", methods=["GET", "POST"])
 def register():
     if request.method == "POST":
         username = request.form["username"]
         email = request.form["email"]
         password = request.form["password"]
 
+        if User.query.filter_by(email=email).first():
+            flash("Email already registered", "danger")
+            return redirect(url_for(".register"))
+
         image = request.files.get("image")
-        filename = "default.png"
+        filename = DEFAULT_PROFILE_IMAGE
         if image:
-            filename = secure_filename(image.filename)
-            image.save(os.path.join(app.config["UPLOAD_FOLDER"], filename))
+            filename = store_profile_image(image)
+            if filename is None:
+                return redirect(url_for(".register"))
 
-        user = User(
+        hashed_password = generate_password_hash(password)
+        new_user = User(
             username=username,
             email=email,
-            password=password,
+            password=hashed_password,
             profile_image=filename
         )
 
-        if User.query.filter_by(email=email).first():
-            flash("Email already registered", "danger")
-            return redirect(url_for("register"))
-
-        hashed_password = generate_password_hash(password)
-        new_user = User(username=username, email=email, password=hashed_password)
-
         db.session.add(new_user)
         db.session.commit()
 
         flash("Registration successful! Please login.", "success")
-        return redirect(url_for("login"))
+        return redirect(url_for(".login"))
 
     return render_template("register.html")
 
 # ---------- LOGIN ----------
-@app.route("/login", methods=["GET", "POST"])
+@bp.route("/login", methods=["GET", "POST"])
 def login():
     if request.method == "POST":
         email = request.form["email"]
@@ -151,46 +881,109 @@ def login():
         user = User.query.filter_by(email=email).first()
 
         if user and check_password_hash(user.password, password):
-            login_user(user)
+            if not login_user(user):
+                flash("This account has been deactivated", "danger")
+                return render_template("login.html")
             flash("Login successful", "success")
             if user.is_admin:
-                return redirect(url_for("admin_dashboard"))
+                return redirect(url_for(".admin_dashboard"))
             else:
-                return redirect(url_for("movies"))  
+                return redirect(url_for(".movies"))  
         else:
             flash("Invalid email or password", "danger")
 
     return render_template("login.html")
 
-@app.route("/profile", methods=["GET", "POST"])
+@bp.route("/profile", methods=["GET", "POST"])
 @login_required
 def profile():
     if request.method == "POST":
         file = request.files.get("image")
         if file:
-            filename = secure_filename(file.filename)
-            file.save(os.path.join(app.config["UPLOAD_FOLDER"], filename))
-            current_user.profile_image = filename
-            db.session.commit()
-            flash("Profile image updated", "success")
+            filename = store_profile_image(file)
+            if filename is not None:
+                User.query.filter_by(id=current_user.id).update(
+                    {User.profile_image: filename}
+                )
+                db.session.commit()
+                forget_cached_user(current_user.id)
+                flash("Profile image updated", "success")
+                # current_user is the old snapshot for the rest of this request
+                return redirect(url_for(".profile"))
 
     return render_template("profile.html")
 
-@app.route("/admin")
+@bp.route("/admin")
 @login_required
 @admin_required
 def admin_dashboard():
-    users = User.query.all()
-    movies = Movie.query.all()
-    users_count = User.query.count()
-    movies_count = Movie.query.count()
-    ratings_count = Rating.query.count()
-    return render_template("admin/dashboard.html", users=users, movies=movies,  
+    # All three counts in a single aggregate query
+    users_count, movies_count, ratings_count = db.session.query(
+        db.select(db.func.count(User.id)).scalar_subquery(),
+        db.select(db.func.count(Movie.id)).scalar_subquery(),
+        db.select(db.func.count(Rating.id)).scalar_subquery()
+    ).one()
+    return render_template("admin/dashboard.html",
         users_count=users_count,
         movies_count=movies_count,
         ratings_count=ratings_count)
 
-@app.route("/admin/movie/add", methods=["GET", "POST"])
+@bp.route("/admin/metrics")
+@login_required
+@admin_required
+def admin_metrics():
+    metrics = get_metrics()
+    endpoints, stages = metrics.summary()
+    return render_template(
+        "admin/metrics.html",
+        endpoints=endpoints,
+        stages=stages,
+        slow_requests=list(metrics.slow_requests),
+        cache=get_recommendation_cache().stats(),
+        fragments=get_fragment_cache().stats(),
+        users=get_user_cache().stats(),
+        slow_ms=current_app.config["METRICS_SLOW_REQUEST_MS"]
+    )
+
+
+@bp.route("/admin/metrics/prometheus")
+@login_required
+@admin_required
+def admin_metrics_prometheus():
+    return Response(
+        get_metrics().prometheus() + get_recommendation_cache().prometheus()
+        + get_user_cache().prometheus(),
+        mimetype="text/plain; version=0.0.4"
+    )
+
+
+# ---------- EXPORT ----------
+@bp.route("/admin/export/<dataset>")
+@login_required
+@admin_required
+def admin_export(dataset):
+    """
+    Download movies / ratings / watchlist / wishlist as a file,
+    streamed batch by batch: ?format=csv|ndjson, &gzip=1 to compress.
+    """
+    fmt = request.args.get("format", "csv")
+    if dataset not in DATASETS or fmt not in FORMATS:
+        abort(404)
+
+    chunks = export_chunks(dataset, fmt)
+    filename = f"{dataset}.{fmt}"
+    mimetype = FORMATS[fmt]
+    if request.args.get("gzip") == "1":
+        chunks = gzip_chunks(chunks)
+        filename += ".gz"
+        mimetype = "application/gzip"
+
+    response = Response(stream_with_context(chunks), mimetype=mimetype)
+    response.headers["Content-Disposition"] = f'attachment; filename="{filename}"'
+    return response
+
+
+@bp.route("/admin/movie/add", methods=["GET", "POST"])
 @login_required
 @admin_required
 def admin_add_movie():
@@ -206,15 +999,18 @@ def admin_add_movie():
             release_year=request.form["release_year"],
             poster=request.form["poster"]
         )
+        movie.genres = genres_for(movie.genre)
         db.session.add(movie)
+        db.session.flush()
+        record_catalog_change(movie.id, "add")
         db.session.commit()
         flash("Movie added successfully", "success")
-        return redirect(url_for("admin_movies"))
+        return redirect(url_for(".admin_movies"))
 
     return render_template("admin/movie_form.html", movie=None)
 
 
-@app.route("/admin/movie/edit/<int:movie_id>", methods=["GET", "POST"])
+@bp.route("/admin/movie/edit/<int:movie_id>", methods=["GET", "POST"])
 @login_required
 @admin_required
 def admin_edit_movie(movie_id):
@@ -230,17 +1026,19 @@ def admin_edit_movie(movie_id):
         movie.description = request.form["description"]
         movie.release_year = request.form["release_year"]
         movie.poster = request.form["poster"]
+        movie.genres = genres_for(movie.genre)
 
+        record_catalog_change(movie.id, "edit")
         db.session.commit()
         flash("Movie updated successfully", "success")
-        return redirect(url_for("admin_movies"))
+        return redirect(url_for(".admin_movies"))
 
     return render_template("admin/movie_form.html", movie=movie)
 
 
 
 # ---------- ADD TO WISHLIST ----------
-@app.route("/wishlist/add/<int:movie_id>")
+@bp.route("/wishlist/add/<int:movie_id>")
 @login_required
 def add_to_wishlist(movie_id):
     existing = Wishlist.query.filter_by(
@@ -252,6 +1050,7 @@ def add_to_wishlist(movie_id):
         item = Wishlist(user_id=current_user.id, movie_id=movie_id)
         db.session.add(item)
         db.session.commit()
+        refresh_profile(current_user.id, movie_id)
         flash("Added to wishlist ❤️", "success")
     else:
         flash("Already in wishlist", "info")
@@ -260,15 +1059,17 @@ def add_to_wishlist(movie_id):
 
 
 # ---------- VIEW WISHLIST ----------
-@app.route("/wishlist")
+@bp.route("/wishlist")
 @login_required
 def wishlist():
-    items = Wishlist.query.filter_by(user_id=current_user.id).all()
+    items = Wishlist.query.options(
+        joinedload(Wishlist.movie)
+    ).filter_by(user_id=current_user.id).all()
     return render_template("wishlist.html", items=items)
 
 
 # ---------- REMOVE FROM WISHLIST ----------
-@app.route("/wishlist/remove/<int:item_id>")
+@bp.route("/wishlist/remove/<int:item_id>")
 @login_required
 def remove_from_wishlist(item_id):
     item = Wishlist.query.get_or_404(item_id)
@@ -276,11 +1077,12 @@ def remove_from_wishlist(item_id):
     if item.user_id == current_user.id:
         db.session.delete(item)
         db.session.commit()
+        refresh_profile(current_user.id, item.movie_id)
         flash("Removed from wishlist", "warning")
 
-    return redirect(url_for("wishlist"))
+    return redirect(url_for(".wishlist"))
 
-@app.route("/rate/<int:movie_id>", methods=["POST"])
+@bp.route("/rate/<int:movie_id>", methods=["POST"])
 @login_required
 def rate_movie(movie_id):
     value = int(request.form["rating"])
@@ -292,6 +1094,7 @@ def rate_movie(movie_id):
     ).first()
 
     if existing:
+        apply_rating_change(movie_id, 0, value - existing.rating)
         existing.rating = value
         existing.review = review_text
     else:
@@ -302,13 +1105,16 @@ def rate_movie(movie_id):
             review=review_text
         )
         db.session.add(r)
+        apply_rating_change(movie_id, 1, value)
 
     db.session.commit()
+    refresh_interaction(current_user.id, movie_id)
+    refresh_profile(current_user.id, movie_id)
     flash("Rating & review saved ⭐", "success")
-    return redirect(url_for("movie_detail", movie_id=movie_id))
+    return redirect(url_for(".movie_detail", movie_id=movie_id))
 
 
-@app.route("/add-movie", methods=["GET", "POST"])
+@bp.route("/add-movie", methods=["GET", "POST"])
 @login_required
 def add_movie():
     if request.method == "POST":
@@ -323,189 +1129,241 @@ def add_movie():
             release_year=request.form["release_year"],
             poster=request.form["poster"]
         )
+        movie.genres = genres_for(movie.genre)
         db.session.add(movie)
+        db.session.flush()
+        record_catalog_change(movie.id, "add")
         db.session.commit()
         flash("Movie added successfully!", "success")
-        return redirect(url_for("add_movie"))
+        return redirect(url_for(".add_movie"))
 
     return render_template("add_movie.html")
 
-@app.route("/movie/<int:movie_id>")
-def movie_detail(movie_id):
+def movie_reviews(movie_id):
     movie = Movie.query.get_or_404(movie_id)
-
-    watched_ids = []
-
-    if current_user.is_authenticated:
-        watched = Watchlist.query.filter_by(
-            user_id=current_user.id,
-            status="watched"
-        ).all()
-        watched_ids = [w.movie_id for w in watched]
-    # ✅ ALWAYS define this FIRST
-    all_movies = Movie.query.all()
-
-    # Ratings
-    ratings = Rating.query.filter_by(movie_id=movie_id).all()
+    # Ratings, with their users loaded in the same query
+    ratings = Rating.query.options(
+        joinedload(Rating.user)
+    ).filter_by(movie_id=movie_id).all()
     avg_rating = None
-    if ratings:
-        avg_rating = round(
-            sum(r.rating for r in ratings) / len(ratings), 1
-        )
+    if movie.rating_count:
+        avg_rating = round(movie.rating_avg, 1)
+    return {"movie": movie, "ratings": ratings, "avg_rating": avg_rating}
 
-    # User id for personalized recommendations
-    user_id = current_user.id if current_user.is_authenticated else None
 
-    # ✅ Now safe to use all_movies
-    recommended_ids = get_recommendations(
-        movie_id,
-        all_movies,
-        watched_ids=watched_ids
-    )
-    if recommended_ids:
-        recommended_movies = Movie.query.filter(
-            Movie.id.in_(recommended_ids)
-    ).all()
-
-    recommended_movies = []
+def recommended_movies(recommended_ids):
+    movie_map = {}
     if recommended_ids:
         movie_map = {
             m.id: m for m in Movie.query.filter(
                 Movie.id.in_(recommended_ids)
             ).all()
         }
-        for mid in recommended_ids:
-            if mid in movie_map:
-                recommended_movies.append(movie_map[mid])
+    return {
+        "recommendations": [
+            movie_map[mid] for mid in recommended_ids if mid in movie_map
+        ]
+    }
+
+
+@bp.route("/movie/<int:movie_id>")
+@anonymous_conditional
+def movie_detail(movie_id):
+    # Movie details, reviews and the similar-movies strip are the same
+    # for everyone and come from the fragment cache; the buttons and
+    # the rating form are rendered per user.
+    info = fragment(
+        ("movie", movie_id), "_movie_info.html",
+        lambda: {"movie": Movie.query.get_or_404(movie_id)}
+    )
+    reviews = fragment(
+        ("reviews", movie_id), "_movie_reviews.html",
+        lambda: movie_reviews(movie_id)
+    )
+
+    watched_ids = set()
+
+    if current_user.is_authenticated:
+        watched_ids = watched_movie_ids(current_user.id)
+
+    recommended_ids = get_recommendation_cache().get_or_compute(
+        movie_id, content_version()[0], watched_ids,
+        lambda: compute_recommendations(movie_id, watched_ids)
+    )
+    recommendations = fragment(
+        ("recommendations", *recommended_ids), "_recommendations.html",
+        lambda: recommended_movies(recommended_ids)
+    )
 
     return render_template(
         "movie_detail.html",
-        movie=movie,
-        ratings=ratings,
-        avg_rating=avg_rating,
-        recommendations=recommended_movies
+        movie_id=movie_id,
+        info=info,
+        reviews=reviews,
+        recommendations=recommendations
     )
 
 
 
 # ---------- DASHBOARD (PROTECTED) ----------
-@app.route("/dashboard")
+@bp.route("/dashboard")
 @login_required
 def dashboard():
-    watchlist_movies = Watchlist.query.filter_by(
-        user_id=current_user.id,
-        status="watchlist"
-    ).all()
+    # Both lists and their movies in one query
+    entries = Watchlist.query.options(
+        joinedload(Watchlist.movie)
+    ).filter(
+        Watchlist.user_id == current_user.id,
+        Watchlist.status.in_(["watchlist", "watched"])
+    ).order_by(Watchlist.id).all()
 
-    watched_movies = Watchlist.query.filter_by(
-        user_id=current_user.id,
-        status="watched"
-    ).all()
+    watchlist_movies = [w for w in entries if w.status == "watchlist"]
+    watched_movies = [w for w in entries if w.status == "watched"]
 
     return render_template(
         "dashboard.html",
+        for_you=for_you(current_user.id),
         watchlist=watchlist_movies,
         watched=watched_movies
     )
     return render_template("dashboard.html", user=current_user)
 
 # ---------- LOGOUT ----------
-@app.route("/logout")
+@bp.route("/logout")
 @login_required
 def logout():
     logout_user()
     flash("Logged out successfully", "info")
-    return redirect(url_for("login"))
+    return redirect(url_for(".login"))
 
-@app.route("/movies")
-def movies():
+def movie_listing_page():
+    """
+    One keyset page of the catalog for the /movies query string
+    (search, language, genre, year, sort, after, per_page).
+    """
     search = request.args.get("search")
     language = request.args.get("language")
     genre = request.args.get("genre")
     year = request.args.get("year")
 
+    sort = request.args.get("sort", "")
+
     query = Movie.query
 
-    if search:
-        query = query.filter(Movie.title.ilike(f"%{search}%"))
+    # Full-text search over title, cast, director, keywords and
+    # description, best BM25 matches first
+    matches = search_matches(search)
+    if matches is not None:
+        query = query.join(matches, Movie.id == matches.c.rowid)
 
-    if language:
-        query = query.filter(Movie.language == language)
+    query = filter_movies(query, language=language, genre=genre, year=year)
 
-    if genre:
-        query = query.filter(Movie.genre.ilike(f"%{genre}%"))
+    if sort == "newest":
+        return paginate(query, [Movie.release_year, Movie.id], descending=True)
+    if sort == "top_rated":
+        return paginate(query, [Movie.rating_avg, Movie.id], descending=True)
+    if sort == "most_reviewed":
+        return paginate(query, [Movie.rating_count, Movie.id], descending=True)
+    if matches is not None:
+        return paginate(query, [matches.c.rank, Movie.id])
+    return paginate(query, [Movie.id])
 
-    if year:
-        query = query.filter(Movie.release_year == year)
 
-    movies = query.all()
+@bp.route("/movies")
+@anonymous_conditional
+def movies():
+    language = request.args.get("language")
+    genre = request.args.get("genre")
+    year = request.args.get("year")
 
-    # For dropdown values
-    languages = db.session.query(Movie.language).distinct().all()
-    genres = db.session.query(Movie.genre).distinct().all()
-    years = db.session.query(Movie.release_year).distinct().order_by(Movie.release_year.desc()).all()
+    # Search / filter form with dropdown counts for the current selection
+    filters = fragment(
+        ("filters", *(request.args.get(name, "") for name in
+                      ("search", "language", "genre", "year", "sort"))),
+        "_movie_filters.html",
+        lambda: get_facets(language=language, genre=genre, year=year)
+    )
 
-    return render_template(
-        "movies.html",
-        movies=movies,
-        languages=[l[0] for l in languages],
-        genres=[g[0] for g in genres],
-        years=[y[0] for y in years]
+    def load_grid():
+        page = movie_listing_page()
+        return {"movies": page.items, "page": page}
+
+    grid = fragment(
+        ("grid", *sorted(request.args.items(multi=True))),
+        "_movie_grid.html", load_grid
     )
 
-@app.route("/admin/users")
+    return render_template("movies.html", filters=filters, grid=grid)
+
+@bp.route("/admin/users")
 @login_required
 @admin_required
 def admin_users():
-    users = User.query.all()
-    return render_template("admin/users.html", users=users)
+    page = paginate(
+        User.query, [User.id], default_size=current_app.config["ADMIN_PAGE_SIZE"]
+    )
+    return render_template("admin/users.html", users=page.items, page=page)
 
-@app.route("/admin/user/toggle/<int:user_id>")
+@bp.route("/admin/user/toggle/<int:user_id>")
 @login_required
 @admin_required
 def toggle_user(user_id):
     user = User.query.get_or_404(user_id)
     user.is_active = not user.is_active
     db.session.commit()
-    return redirect(url_for("admin_users"))
+    forget_cached_user(user_id)
+    return redirect(url_for(".admin_users"))
 
-@app.route("/admin/user/verify/<int:user_id>")
+@bp.route("/admin/user/verify/<int:user_id>")
 @login_required
 @admin_required
 def verify_user(user_id):
     user = User.query.get_or_404(user_id)
     user.is_verified = not user.is_verified
     db.session.commit()
-    return redirect(url_for("admin_users"))
+    forget_cached_user(user_id)
+    return redirect(url_for(".admin_users"))
 
-@app.route("/admin/user/delete/<int:user_id>")
+@bp.route("/admin/user/delete/<int:user_id>")
 @login_required
 @admin_required
 def delete_user(user_id):
+    forget_user_ratings(user_id)
     Rating.query.filter_by(user_id=user_id).delete()
     Wishlist.query.filter_by(user_id=user_id).delete()
     User.query.filter_by(id=user_id).delete()
     db.session.commit()
-    return redirect(url_for("admin_users"))
+    forget_cached_user(user_id)
+    forget_user_engines(user_id)
+    return redirect(url_for(".admin_users"))
 
-@app.route("/admin/movies")
+@bp.route("/admin/movies")
 @login_required
 @admin_required
 def admin_movies():
-    movies = Movie.query.all()
-    return render_template("admin/movies.html", movies=movies)
+    page = paginate(
+        Movie.query, [Movie.id], default_size=current_app.config["ADMIN_PAGE_SIZE"]
+    )
+    return render_template("admin/movies.html", movies=page.items, page=page)
 
-@app.route("/admin/movie/delete/<int:movie_id>")
+@bp.route("/admin/movie/delete/<int:movie_id>")
 @login_required
 @admin_required
 def delete_movie(movie_id):
     Rating.query.filter_by(movie_id=movie_id).delete()
     Wishlist.query.filter_by(movie_id=movie_id).delete()
+    db.session.execute(
+        movie_genre.delete().where(movie_genre.c.movie_id == movie_id)
+    )
     Movie.query.filter_by(id=movie_id).delete()
+    record_catalog_change(movie_id, "delete")
     db.session.commit()
-    return redirect(url_for("admin_movies"))
+    state = loaded_engines()
+    if state is not None:
+        state.collaborative.mark_stale()
+    return redirect(url_for(".admin_movies"))
 
-@app.route("/watchlist/add/<int:movie_id>")
+@bp.route("/watchlist/add/<int:movie_id>")
 @login_required
 def add_to_watchlist(movie_id):
     existing = Watchlist.query.filter_by(
@@ -521,11 +1379,13 @@ def add_to_watchlist(movie_id):
         )
         db.session.add(w)
         db.session.commit()
+        refresh_interaction(current_user.id, movie_id)
+        refresh_profile(current_user.id, movie_id)
         flash("Added to watchlist", "success")
 
-    return redirect(url_for("movie_detail", movie_id=movie_id))
+    return redirect(url_for(".movie_detail", movie_id=movie_id))
 
-@app.route("/watchlist/watched/<int:movie_id>")
+@bp.route("/watchlist/watched/<int:movie_id>")
 @login_required
 def mark_as_watched(movie_id):
     entry = Watchlist.query.filter_by(
@@ -544,10 +1404,12 @@ def mark_as_watched(movie_id):
         db.session.add(entry)
 
     db.session.commit()
+    refresh_interaction(current_user.id, movie_id)
+    refresh_profile(current_user.id, movie_id)
     flash("Marked as watched", "success")
-    return redirect(url_for("movie_detail", movie_id=movie_id))
+    return redirect(url_for(".movie_detail", movie_id=movie_id))
 
-@app.route("/watchlist/add/<int:movie_id>")
+@bp.route("/watchlist/add/<int:movie_id>")
 @login_required
 def add_to_watchlist_movie(movie_id):
     entry = Watchlist.query.filter_by(
@@ -568,13 +1430,396 @@ def add_to_watchlist_movie(movie_id):
         db.session.commit()
         flash("Added to watchlist", "success")
 
-    return redirect(url_for("movie_detail", movie_id=movie_id))
+    return redirect(url_for(".movie_detail", movie_id=movie_id))
 
 
+# ---------------- JSON API ----------------
+api = Blueprint("api", __name__, url_prefix="/api/v1")
 
-if __name__ == "__main__":
+WATCH_STATUSES = ("watchlist", "watched")
+
+
+@api.errorhandler(HTTPException)
+def api_error(error):
+    return json_response(
+        {"error": error.name, "message": error.description},
+        status=error.code
+    )
+
+
+def api_login_required(f):
+    """Like login_required, but answers 401 instead of redirecting."""
+    @wraps(f)
+    def decorated(*args, **kwargs):
+        if not current_user.is_authenticated:
+            abort(401)
+        return f(*args, **kwargs)
+    return decorated
+
+
+def parse_movie_ids(value, limit):
+    """Distinct movie IDs of a "1,2,3" argument, in request order."""
+    try:
+        ids = [int(part) for part in (value or "").split(",") if part.strip()]
+    except ValueError:
+        abort(400, description="ids must be comma-separated integers")
+    ids = list(dict.fromkeys(ids))
+    if not ids:
+        abort(400, description="ids is required")
+    if len(ids) > limit:
+        abort(400, description=f"at most {limit} ids per request")
+    return ids
+
+
+@api.route("/movies")
+def api_movies():
+    """Catalog page; same query string as /movies, ?after= to continue."""
+    page = movie_listing_page()
+    return json_response(
+        {
+            "movies": [movie_json(m) for m in page.items],
+            "next": page.next_cursor,
+        },
+        max_age=current_app.config["API_MAX_AGE"]
+    )
+
+
+@api.route("/movies/<int:movie_id>")
+def api_movie(movie_id):
+    movie = Movie.query.options(
+        joinedload(Movie.genres)
+    ).filter_by(id=movie_id).first_or_404()
+    data = movie_json(movie, detail=True)
+    data["genres"] = sorted(g.name for g in movie.genres)
+    return json_response(data, max_age=current_app.config["API_MAX_AGE"])
+
+
+@api.route("/recommendations")
+def api_recommendations():
+    """
+    Recommendations for several movies at once (?ids=1,2,3).
+
+    Returns the recommended IDs per requested movie plus one "movies"
+    map with every recommended movie, so a client needs one round trip.
+    """
+    ids = parse_movie_ids(
+        request.args.get("ids"), current_app.config["API_BATCH_SIZE"]
+    )
+    watched_ids = set()
+    if current_user.is_authenticated:
+        watched_ids = watched_movie_ids(current_user.id)
+
+    recommended = batch_recommendations(ids, watched_ids)
+    wanted = {rid for mid in ids for rid in recommended[mid]}
+    movies = Movie.query.filter(Movie.id.in_(wanted)).all() if wanted else []
+
+    response = json_response(
+        {
+            "recommendations": {str(mid): recommended[mid] for mid in ids},
+            "movies": {str(m.id): movie_json(m) for m in movies},
+        },
+        max_age=current_app.config["API_MAX_AGE"],
+        private=current_user.is_authenticated
+    )
+    # The body depends on the session: shared caches must not hand the
+    # anonymous copy to a logged-in user
+    response.vary.add("Cookie")
+    return response
+
+
+def user_activity(user_id):
+    watchlist = Watchlist.query.filter_by(user_id=user_id).with_entities(
+        Watchlist.movie_id, Watchlist.status
+    ).order_by(Watchlist.id).all()
+    wishlist = Wishlist.query.filter_by(user_id=user_id).with_entities(
+        Wishlist.movie_id
+    ).order_by(Wishlist.id).all()
+    ratings = Rating.query.filter_by(user_id=user_id).with_entities(
+        Rating.movie_id, Rating.rating, Rating.review
+    ).order_by(Rating.id).all()
+    return {
+        "watchlist": [
+            {"movie_id": w.movie_id, "status": w.status} for w in watchlist
+        ],
+        "wishlist": [w.movie_id for w in wishlist],
+        "ratings": [
+            {"movie_id": r.movie_id, "rating": r.rating, "review": r.review}
+            for r in ratings
+        ],
+    }
+
+
+def parse_activity(data):
+    """
+    Validated changes of a bulk activity sync:
+
+        {"watchlist": [{"movie_id": 1, "status": "watched"},
+                       {"movie_id": 2, "status": null}],   # null removes
+         "wishlist": {"add": [3], "remove": [4]},
+         "ratings": [{"movie_id": 5, "rating": 4, "review": "..."}]}
+
+    Returns (statuses, wishlist_add, wishlist_remove, ratings).
+    """
+    if not isinstance(data, dict):
+        abort(400, description="expected a JSON object")
+    try:
+        statuses = {}
+        for item in data.get("watchlist", []):
+            status = item.get("status")
+            if status is not None and status not in WATCH_STATUSES:
+                abort(400, description=f"unknown status {status!r}")
+            statuses[int(item["movie_id"])] = status
+
+        wishlist = data.get("wishlist", {})
+        wishlist_add = {int(mid) for mid in wishlist.get("add", [])}
+        wishlist_remove = {int(mid) for mid in wishlist.get("remove", [])}
+
+        ratings = {}
+        for item in data.get("ratings", []):
+            value = int(item["rating"])
+            if not 1 <= value <= 5:
+                abort(400, description="ratings must be between 1 and 5")
+            review = item.get("review")
+            if review is not None and not isinstance(review, str):
+                abort(400, description="review must be a string or null")
+            ratings[int(item["movie_id"])] = (value, review)
+    except (AttributeError, KeyError, TypeError, ValueError):
+        abort(400, description="malformed activity")
+    return statuses, wishlist_add, wishlist_remove, ratings
+
+
+@api.route("/users/me/activity", methods=["GET", "POST"])
+@api_login_required
+def api_activity():
+    """
+    GET: the user's watchlist, wishlist and ratings.
+    POST: apply a batch of changes (see parse_activity) in one
+    transaction, then answer with the updated activity.
+    """
+    user_id = current_user.id
+    if request.method == "GET":
+        return json_response(user_activity(user_id), private=True)
+
+    statuses, wishlist_add, wishlist_remove, ratings = parse_activity(
+        request.get_json(silent=True)
+    )
+    touched = set(statuses) | wishlist_add | wishlist_remove | set(ratings)
+    if touched:
+        known = {
+            m.id for m in Movie.query.filter(
+                Movie.id.in_(touched)
+            ).with_entities(Movie.id)
+        }
+        unknown = sorted(touched - known)
+        if unknown:
+            abort(400, description=f"unknown movie ids: {unknown}")
+
+        entries = {
+            w.movie_id: w for w in Watchlist.query.filter(
+                Watchlist.user_id == user_id,
+                Watchlist.movie_id.in_(touched)
+            )
+        }
+        for movie_id, status in statuses.items():
+            entry = entries.get(movie_id)
+            if status is None:
+                if entry is not None:
+                    db.session.delete(entry)
+                    del entries[movie_id]
+            elif entry is not None:
+                entry.status = status
+            else:
+                entries[movie_id] = Watchlist(
+                    user_id=user_id, movie_id=movie_id, status=status
+                )
+                db.session.add(entries[movie_id])
+
+        wished = {
+            w.movie_id: w for w in Wishlist.query.filter(
+                Wishlist.user_id == user_id,
+                Wishlist.movie_id.in_(wishlist_add | wishlist_remove)
+            )
+        }
+        for movie_id in wishlist_add - wished.keys():
+            db.session.add(Wishlist(user_id=user_id, movie_id=movie_id))
+        for movie_id in wishlist_remove - wishlist_add:
+            if movie_id in wished:
+                db.session.delete(wished[movie_id])
+
+        existing = {
+            r.movie_id: r for r in Rating.query.filter(
+                Rating.user_id == user_id,
+                Rating.movie_id.in_(ratings)
+            )
+        }
+        for movie_id, (value, review) in ratings.items():
+            rating = existing.get(movie_id)
+            if rating is not None:
+                apply_rating_change(movie_id, 0, value - rating.rating)
+                rating.rating = value
+                rating.review = review
+            else:
+                db.session.add(Rating(
+                    user_id=user_id, movie_id=movie_id,
+                    rating=value, review=review
+                ))
+                apply_rating_change(movie_id, 1, value)
+
+        db.session.commit()
+        refresh_interactions(user_id, touched)
+
+    return json_response(user_activity(user_id), private=True)
+
+
+@api.route("/suggest")
+def api_suggest():
+    """Search-as-you-type: movies whose words start with the query's (?q=&k=)."""
+    query = request.args.get("q", "")
+    k = request.args.get("k", 10, type=int)
+    suggestions = get_suggest_index().suggest(query, k) if query.strip() else []
+    return json_response(
+        {
+            "query": query,
+            "suggestions": [
+                {"id": movie_id, "title": title, "year": year}
+                for movie_id, title, year in suggestions
+            ],
+        },
+        max_age=current_app.config["API_MAX_AGE"]
+    )
+
+
+# ---------------- APP FACTORY ----------------
+def create_app(config=None):
+    app = Flask(__name__)
+    app.secret_key = "movie_secret_key"
+    app.config["UPLOAD_FOLDER"] = UPLOAD_FOLDER
+    # Profile images: size cap, and how long browsers keep the
+    # content-hashed files (they never change under the same name)
+    app.config["UPLOAD_MAX_BYTES"] = 2 * 1024 * 1024
+    app.config["MAX_CONTENT_LENGTH"] = 4 * 1024 * 1024
+    app.config["AVATAR_MAX_AGE"] = 365 * 24 * 3600
+
+    # Database config
+    app.config["SQLALCHEMY_DATABASE_URI"] = os.environ.get(
+        "DATABASE_URL", "sqlite:///database.db"
+    )
+    app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
+    # PRAGMAs for every SQLite connection: "production" (WAL, busy
+    # timeout, ...) or "default"; SQLITE_PRAGMAS overrides single values.
+    # See sqlite_pragmas.ENGINE_PROFILES and benchmarks/concurrency.py.
+    app.config["SQLITE_PROFILE"] = os.environ.get(
+        "SQLITE_PROFILE", "production"
+    )
+    app.config["SQLITE_PRAGMAS"] = {}
+
+    # Recommender tuning
+    # Saved (memory-mapped) model; None keeps it in memory only
+    app.config["RECOMMENDER_MODEL_PATH"] = os.path.join(
+        app.instance_path, "recommender"
+    )
+    app.config["RECOMMENDER_WATCHED_BOOST"] = 0.15
+    app.config["RECOMMENDER_EXCLUDE_WATCHED"] = False
+    # Share of collaborative filtering in the blended score (0 = content only)
+    app.config["RECOMMENDER_CF_WEIGHT"] = 0.3
+    # Refit interval (seconds) of the CF model, to pick up ratings and
+    # watchlist changes made through other workers; None = never
+    app.config["RECOMMENDER_CF_TTL"] = 600
+    # Approximate (MinHash LSH) candidate search for big catalogs, e.g.
+    # {"bands": 32, "rows": 3}; tune with benchmarks/ann_recall.py
+    app.config["RECOMMENDER_ANN"] = None
+    app.config["RECOMMENDER_ANN_MIN_MOVIES"] = 50000
+    # Recommendation lists cached per (movie, catalog version, watched set).
+    # Set RECOMMENDATION_CACHE_PATH to share the cache between workers.
+    app.config["RECOMMENDATION_CACHE_SIZE"] = 2048
+    app.config["RECOMMENDATION_CACHE_TTL"] = 300  # seconds, None = no expiry
+    app.config["RECOMMENDATION_CACHE_PATH"] = os.environ.get(
+        "RECOMMENDATION_CACHE_PATH"
+    )
+    # "For You" feed on the dashboard
+    app.config["FOR_YOU_SIZE"] = 12
+    app.config["PROFILE_CACHE_USERS"] = 10000
+    app.config["PROFILE_CACHE_TTL"] = 900  # seconds
+    # Load and fit the recommender in the background at startup
+    # instead of on the first request that needs it
+    app.config["WARM_UP"] = os.environ.get("WARM_UP") == "1"
+
+    # Autocomplete index: full rebuild interval (seconds) to pick up new
+    # ratings / watchlist counts; catalog edits apply immediately
+    app.config["SUGGEST_INDEX_TTL"] = 3600
+
+    # Logged-in users are cached per process instead of loaded on every
+    # request; admin changes reach other workers within the TTL (seconds)
+    app.config["USER_CACHE_SIZE"] = 10000
+    app.config["USER_CACHE_TTL"] = 30
+
+    # Rows per page on listing pages (?per_page= is capped at 100)
+    app.config["PAGE_SIZE"] = 24
+    app.config["ADMIN_PAGE_SIZE"] = 50
+
+    # JSON API: movies per batch recommendation request, and how long
+    # clients may reuse catalog responses before revalidating (seconds)
+    app.config["API_BATCH_SIZE"] = 50
+    app.config["API_MAX_AGE"] = 60
+
+    # Requests slower than this are logged with their SQL
+    app.config["METRICS_SLOW_REQUEST_MS"] = 500
+
+    app.config.update(config or {})
+
+    db.init_app(app)
     with app.app_context():
-        db.create_all()
-    app.run(debug=True)
+        apply_pragmas(db.engine, profile_pragmas(
+            app.config["SQLITE_PROFILE"], app.config["SQLITE_PRAGMAS"]
+        ))
+        # An import that was killed (see import_catalog.py) leaves the
+        # search triggers dropped, and admin edits would miss the index
+        if restore_search_triggers(db.engine):
+            app.logger.warning("Restored the search triggers of an interrupted import")
+    login_manager.init_app(app)
+    app.extensions["metrics"] = Metrics(app)
+
+    # Keyed on the catalog version, so admin adds / edits / deletes (which
+    # record a CatalogChange) invalidate it in every worker automatically.
+    cache_path = app.config["RECOMMENDATION_CACHE_PATH"]
+    app.extensions["recommendation_cache"] = RecommendationCache(
+        max_entries=app.config["RECOMMENDATION_CACHE_SIZE"],
+        ttl=app.config["RECOMMENDATION_CACHE_TTL"],
+        backend=SQLiteCacheBackend(cache_path) if cache_path else None
+    )
+
+    # Per app, so several apps (create_app()) in one process never
+    # serve each other's pages
+    app.extensions["facet_cache"] = FacetCache()
+    app.extensions["fragment_cache"] = FragmentCache()
+    app.extensions["user_cache"] = UserCache(
+        max_users=app.config["USER_CACHE_SIZE"],
+        ttl=app.config["USER_CACHE_TTL"]
+    )
+
+    app.register_blueprint(bp)
+    app.register_blueprint(api)
 
+    if app.config["WARM_UP"]:
+        threading.Thread(target=warm_up, args=(app,), daemon=True).start()
+    return app
+
+
+def warm_up(app):
+    """
+    Import and fit the recommender and CF model, and build the
+    autocomplete index, ahead of the first request.
+    """
+    with app.app_context():
+        get_recommender()
+        get_collaborative()
+        get_suggest_index()
 
+
+app = create_app()
+
+
+if __name__ == "__main__":
+    with app.app_context():
+        init_db()
+    app.run(debug=True)
@@ -0,0 +1,208 @@
+# avatars.py
+
+import hashlib
+import os
+import re
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:  # thumbnails are optional; originals are served instead
+    Image = None
+
+# Square sizes (CSS pixels) the templates show avatars at. Thumbnails are
+# rendered at twice that so they stay sharp on high-DPI screens.
+THUMBNAIL_SIZES = (40, 140)
+PIXEL_DENSITY = 2
+
+CHUNK_SIZE = 64 * 1024
+
+# Leading bytes of the image types we accept, and the extension we store
+SIGNATURES = (
+    (b"\xff\xd8\xff", "jpg"),
+    (b"\x89PNG\r\n\x1a\n", "png"),
+    (b"GIF87a", "gif"),
+    (b"GIF89a", "gif"),
+)
+
+# <sha256 prefix>.<ext> and its thumbnails <sha256 prefix>-<size>.<ext>
+HASHED_NAME = re.compile(r"^([0-9a-f]{32})(?:-(\d+))?\.(jpg|png|gif)$")
+
+
+class UploadError(ValueError):
+    pass
+
+
+def image_type(head):
+    for signature, ext in SIGNATURES:
+        if head.startswith(signature):
+            return ext
+    return None
+
+
+def is_hashed(name):
+    return HASHED_NAME.match(name or "") is not None
+
+
+def thumbnail_name(name, size):
+    stem, ext = os.path.splitext(name)
+    # GIF thumbnails are stored as PNG (Pillow writes one frame anyway)
+    return f"{stem}-{size}{'.png' if ext == '.gif' else ext}"
+
+
+# -----------------------------
+# Storing uploads
+# -----------------------------
+def save_upload(stream, folder, max_bytes):
+    """
+    Stream an uploaded image into ``folder`` under its content hash.
+
+    The data is copied in chunks to a temporary file while it is hashed,
+    so nothing larger than a chunk is held in memory and oversized
+    uploads stop at ``max_bytes``. Identical images share one file.
+    Returns the stored file name; raises UploadError for files that are
+    too large or not a JPEG / PNG / GIF.
+    """
+    os.makedirs(folder, exist_ok=True)
+    digest = hashlib.sha256()
+    size = 0
+    ext = None
+    fd, tmp_path = tempfile.mkstemp(dir=folder, suffix=".part")
+    try:
+        with os.fdopen(fd, "wb") as out:
+            while True:
+                chunk = stream.read(CHUNK_SIZE)
+                if not chunk:
+                    break
+                if ext is None:
+                    ext = image_type(chunk)
+                    if ext is None:
+                        raise UploadError("Only JPEG, PNG and GIF images are allowed")
+                size += len(chunk)
+                if size > max_bytes:
+                    raise UploadError(
+                        f"Images can be at most {max_bytes // 1024} KB"
+                    )
+                digest.update(chunk)
+                out.write(chunk)
+        if ext is None:
+            raise UploadError("The uploaded file is empty")
+
+        name = f"{digest.hexdigest()[:32]}.{ext}"
+        path = os.path.join(folder, name)
+        if os.path.exists(path):
+            os.remove(tmp_path)
+            # Fresh again, so garbage collection leaves it to the new owner
+            os.utime(path)
+        else:
+            os.replace(tmp_path, path)
+        return name
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+# -----------------------------
+# Thumbnails
+# -----------------------------
+_executor = None
+_pending = set()
+_lock = threading.Lock()
+
+
+def make_thumbnails(folder, name):
+    """Write every missing thumbnail of ``name`` (needs Pillow)."""
+    source = os.path.join(folder, name)
+    with Image.open(source) as original:
+        image = ImageOps.exif_transpose(original)
+        if image.mode not in ("RGB", "RGBA"):
+            image = image.convert("RGBA" if "transparency" in image.info else "RGB")
+        for size in THUMBNAIL_SIZES:
+            target = os.path.join(folder, thumbnail_name(name, size))
+            if os.path.exists(target):
+                continue
+            pixels = size * PIXEL_DENSITY
+            thumb = ImageOps.fit(image, (pixels, pixels), Image.LANCZOS)
+            if target.endswith(".jpg") and thumb.mode != "RGB":
+                thumb = thumb.convert("RGB")
+            # Write next to the target and rename, so a half-written
+            # thumbnail is never served
+            tmp_path = target + ".part"
+            thumb.save(tmp_path, format="JPEG" if target.endswith(".jpg") else "PNG",
+                       optimize=True)
+            os.replace(tmp_path, target)
+
+
+def schedule_thumbnails(folder, name):
+    """Render ``name``'s thumbnails on a background thread (once)."""
+    global _executor
+    if Image is None:
+        return
+    with _lock:
+        if name in _pending:
+            return
+        _pending.add(name)
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=1, thread_name_prefix="thumbnails"
+            )
+    _executor.submit(_run_thumbnails, folder, name)
+
+
+def _run_thumbnails(folder, name):
+    try:
+        make_thumbnails(folder, name)
+    except (OSError, ValueError):
+        pass  # unreadable image: keep serving the original
+    finally:
+        with _lock:
+            _pending.discard(name)
+
+
+def avatar_file(folder, name, size):
+    """
+    File to serve for ``name`` shown at ``size`` CSS pixels: the
+    thumbnail once it exists, the original until then.
+    """
+    if size in THUMBNAIL_SIZES:
+        thumb = thumbnail_name(name, size)
+        if os.path.exists(os.path.join(folder, thumb)):
+            return thumb
+        if os.path.exists(os.path.join(folder, name)):
+            schedule_thumbnails(folder, name)
+    return name
+
+
+# -----------------------------
+# Garbage collection
+# -----------------------------
+def unreferenced_files(folder, referenced, min_age=86400, legacy=False):
+    """
+    Upload files no user points at any more, with their thumbnails.
+
+    Only content-hashed files (and leftovers of interrupted uploads)
+    are considered unless ``legacy`` is set; default images never are.
+    Files younger than ``min_age`` seconds are kept, so an upload whose
+    user row is not committed yet is not collected.
+    """
+    keep = set(referenced)
+    keep.update(
+        thumbnail_name(name, size)
+        for name in referenced for size in THUMBNAIL_SIZES
+    )
+    now = time.time()
+    for entry in os.scandir(folder):
+        if not entry.is_file() or entry.name in keep:
+            continue
+        leftover = entry.name.endswith(".part")  # interrupted upload
+        if not (is_hashed(entry.name) or leftover or legacy):
+            continue
+        if entry.name.startswith("default"):
+            continue
+        if now - entry.stat().st_mtime < min_age:
+            continue
+        yield entry.path
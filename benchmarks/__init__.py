@@ -0,0 +1 @@
+"""Performance benchmarks. Run them from the project root with ``py -m``."""
@@ -0,0 +1,124 @@
+"""
+Recall@k and latency of the MinHash LSH mode against exact scoring.
+
+    py -m benchmarks.ann_recall                          # 100k movies
+    py -m benchmarks.ann_recall --movies 300000 --grid 16x4 32x4 20x5
+    py -m benchmarks.ann_recall -o ann.json
+
+Fits the content model once on a synthetic catalog, then for every
+BANDSxROWS setting builds the LSH index and compares the top-k of the
+same queries with and without it. Pick the cheapest setting whose
+recall is acceptable and put it in RECOMMENDER_ANN.
+"""
+import argparse
+import json
+import random
+import time
+from types import SimpleNamespace
+
+import numpy as np
+
+from ann import MinHashLSH
+from benchmarks.synthetic import generate_movies
+from recommender import RecommenderEngine, movie_features
+
+DEFAULT_GRID = ["16x2", "32x2", "64x2", "32x3", "64x3", "32x4"]
+
+
+def synthetic_movies(n, seed):
+    return [
+        SimpleNamespace(id=i + 1, **row)
+        for i, row in enumerate(generate_movies(n, seed))
+    ]
+
+
+def timed_queries(engine, queries, k):
+    results, samples = [], []
+    for movie_id in queries:
+        start = time.perf_counter()
+        results.append(engine.recommend(movie_id, k=k))
+        samples.append(time.perf_counter() - start)
+    return results, np.asarray(samples) * 1000
+
+
+def recall(engine, queries, exact, approx):
+    """
+    Share of the exact top-k that the approximate top-k matches.
+
+    Ties are common (many movies share cast / genres), so a returned
+    movie counts as a hit when its exact score reaches the k-th exact
+    score, even if exact scoring picked another movie of equal score.
+    """
+    hits = total = 0
+    for movie_id, truth, found in zip(queries, exact, approx):
+        if not truth:
+            continue
+        scores = engine.scores_for(movie_id)
+        rows, _ = engine.lookup(found)
+        kth = scores[engine.row(truth[-1])]
+        hits += min(len(truth), int((scores[rows] >= kth - 1e-12).sum()))
+        total += len(truth)
+    return hits / total if total else 1.0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="LSH recall / latency report")
+    parser.add_argument("--movies", type=int, default=100_000)
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("-k", type=int, default=10)
+    parser.add_argument("--grid", nargs="+", default=DEFAULT_GRID,
+                        help="BANDSxROWS settings to try")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("-o", "--output", help="also write the report as JSON")
+    args = parser.parse_args()
+
+    movies = synthetic_movies(args.movies, args.seed)
+    documents = [movie_features(m) for m in movies]
+    engine = RecommenderEngine()
+    start = time.perf_counter()
+    engine.fit(movies)
+    print(f"fit {args.movies} movies in {time.perf_counter() - start:.2f}s")
+
+    rng = random.Random(args.seed)
+    queries = [rng.randint(1, args.movies) for _ in range(args.queries)]
+    exact, exact_ms = timed_queries(engine, queries, args.k)
+
+    report = [{
+        "setting": "exact", "recall": 1.0,
+        "p50_ms": float(np.percentile(exact_ms, 50)),
+        "p95_ms": float(np.percentile(exact_ms, 95)),
+        "candidates": args.movies, "build_s": 0.0,
+    }]
+    for setting in args.grid:
+        bands, rows = map(int, setting.lower().split("x"))
+        start = time.perf_counter()
+        engine.model = engine.model.replace(
+            ann=MinHashLSH(bands, rows).build(engine.model.movie_ids, documents)
+        )
+        build_s = time.perf_counter() - start
+
+        approx, ms = timed_queries(engine, queries, args.k)
+        candidates = [len(engine.model.ann.candidates(q)) for q in queries]
+        report.append({
+            "setting": setting,
+            "recall": recall(engine, queries, exact, approx),
+            "p50_ms": float(np.percentile(ms, 50)),
+            "p95_ms": float(np.percentile(ms, 95)),
+            "candidates": float(np.mean(candidates)), "build_s": build_s,
+        })
+    engine.model = engine.model.replace(ann=None)
+
+    print(f"\n{'setting':>8} {f'recall@{args.k}':>10} {'p50 ms':>8} "
+          f"{'p95 ms':>8} {'candidates':>11} {'build s':>8}")
+    for r in report:
+        print(f"{r['setting']:>8} {r['recall']:10.3f} {r['p50_ms']:8.2f} "
+              f"{r['p95_ms']:8.2f} {r['candidates']:11.0f} {r['build_s']:8.2f}")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"params": vars(args), "results": report}, f, indent=2)
+        print(f"✅ Report written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
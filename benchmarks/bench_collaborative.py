@@ -0,0 +1,128 @@
+"""
+Per-query latency of the collaborative-filtering engine.
+
+    py -m benchmarks.bench_collaborative                  # 1M ratings
+    py -m benchmarks.bench_collaborative --ratings 200000 --queries 500
+    py -m benchmarks.bench_collaborative --check 300   # exactness only
+
+Builds a synthetic user x movie matrix with skewed (Zipf-like) movie
+popularity, then times cold neighbour queries, cached queries and
+queries right after an incremental update. --check instead compares
+the incrementally updated engine with a fresh fit after every update.
+"""
+import argparse
+import time
+
+import numpy as np
+
+from collaborative import CollaborativeEngine
+
+
+def synthetic_interactions(n_ratings, n_users, n_movies, seed=0):
+    rng = np.random.default_rng(seed)
+    popularity = 1.0 / np.arange(1, n_movies + 1) ** 0.8
+    popularity /= popularity.sum()
+
+    users = rng.integers(0, n_users, n_ratings)
+    movies = rng.choice(n_movies, n_ratings, p=popularity)
+    values = rng.integers(1, 6, n_ratings) / 5.0
+    return zip(users.tolist(), movies.tolist(), values.tolist())
+
+
+def percentiles(samples):
+    ms = np.asarray(samples) * 1000
+    return "p50 {:.2f} ms  p95 {:.2f} ms  p99 {:.2f} ms".format(
+        *np.percentile(ms, [50, 95, 99])
+    )
+
+
+def timed(fn, args_list):
+    samples = []
+    for args in args_list:
+        start = time.perf_counter()
+        fn(*args)
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+def score_sets(engine, movie_ids):
+    return {
+        m: sorted(round(s, 9) for s in engine.similar(m).values())
+        for m in movie_ids
+    }
+
+
+def check_updates(n_updates, k, seed=0):
+    """Mismatching queries between update() + cache and a fresh fit."""
+    rng = np.random.default_rng(seed)
+    cells = {
+        (u, m): v for u, m, v in synthetic_interactions(3000, 200, 100, seed)
+    }
+    engine = CollaborativeEngine(k=k, merge_threshold=50)
+    engine.fit((u, m, v) for (u, m), v in cells.items())
+    movie_ids = list(engine.movie_ids)
+    score_sets(engine, movie_ids)  # fill the neighbour cache
+
+    mismatches = queries = 0
+    for _ in range(n_updates):
+        user, movie = int(rng.integers(0, 200)), int(rng.choice(movie_ids))
+        value = float(rng.integers(0, 6)) / 5
+        engine.update(user, movie, value)
+        cells[(user, movie)] = value
+
+        fresh = CollaborativeEngine(k=k).fit(
+            (u, m, v) for (u, m), v in cells.items()
+        )
+        expected = score_sets(fresh, movie_ids)
+        got = score_sets(engine, movie_ids)
+        mismatches += sum(got[m] != expected[m] for m in movie_ids)
+        queries += len(movie_ids)
+    return mismatches, queries
+
+
+def main():
+    parser = argparse.ArgumentParser(description="CF latency benchmark")
+    parser.add_argument("--ratings", type=int, default=1_000_000)
+    parser.add_argument("--users", type=int, default=100_000)
+    parser.add_argument("--movies", type=int, default=20_000)
+    parser.add_argument("--queries", type=int, default=1000)
+    parser.add_argument("-k", type=int, default=20)
+    parser.add_argument("--check", type=int, metavar="UPDATES",
+                        help="compare with a fresh fit after each of "
+                             "UPDATES random updates, then exit")
+    args = parser.parse_args()
+
+    if args.check:
+        mismatches, queries = check_updates(args.check, args.k)
+        print(f"{mismatches} of {queries} queries differ from a fresh fit")
+        raise SystemExit(1 if mismatches else 0)
+
+    rng = np.random.default_rng(1)
+    engine = CollaborativeEngine(k=args.k)
+
+    start = time.perf_counter()
+    engine.fit(synthetic_interactions(args.ratings, args.users, args.movies))
+    print(f"fit: {engine.matrix.nnz} interactions, "
+          f"{len(engine.user_row)} users, {len(engine.movie_ids)} movies "
+          f"in {time.perf_counter() - start:.2f}s")
+
+    movie_ids = rng.choice(engine.movie_ids, args.queries).tolist()
+    cold = timed(engine.similar, [(m,) for m in movie_ids])
+    print(f"cold query   : {percentiles(cold)}")
+
+    warm = timed(engine.similar, [(m,) for m in movie_ids])
+    print(f"cached query : {percentiles(warm)}")
+
+    updates = [
+        (int(rng.integers(0, args.users)), int(m), float(rng.integers(1, 6)) / 5)
+        for m in movie_ids
+    ]
+    update_times = timed(engine.update, updates)
+    print(f"update       : {percentiles(update_times)}")
+
+    after = timed(engine.similar, [(m,) for _, m, _ in updates])
+    print(f"after update : {percentiles(after)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""
+Per-keystroke latency of the autocomplete index.
+
+    py -m benchmarks.bench_suggest                   # 100k movies
+    py -m benchmarks.bench_suggest --movies 20000 --queries 2000
+
+Indexes a synthetic catalog with Zipf-like popularity, then times what
+a user typing produces: every prefix of real title / cast words, and
+two-word queries whose last word is still being typed. The last line
+times the same queries with a few hundred admin edits in the overlay.
+"""
+import argparse
+import random
+import time
+
+import numpy as np
+
+from benchmarks.synthetic import generate_movies
+from suggest import MAX_OVERLAY, SuggestIndex, normalize_tokens
+
+
+def percentiles(samples):
+    ms = np.asarray(samples) * 1000
+    return "p50 {:.3f} ms  p95 {:.3f} ms  p99 {:.3f} ms  max {:.3f} ms".format(
+        *np.percentile(ms, [50, 95, 99, 100])
+    )
+
+
+def timed(index, queries):
+    samples = []
+    for query in queries:
+        start = time.perf_counter()
+        index.suggest(query)
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Autocomplete latency benchmark")
+    parser.add_argument("--movies", type=int, default=100_000)
+    parser.add_argument("--queries", type=int, default=5000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    movies = list(generate_movies(args.movies, args.seed))
+    rows = [
+        (i, m["title"], m["release_year"], m["cast"], m["director"],
+         m["keywords"], int(1000 / i ** 0.8))
+        for i, m in enumerate(movies, start=1)
+    ]
+
+    start = time.perf_counter()
+    index = SuggestIndex().build(rows)
+    print(f"build: {len(index)} movies, {len(index.tokens)} entries, "
+          f"{len(index.top)} precomputed prefixes in "
+          f"{time.perf_counter() - start:.2f}s")
+
+    words = [
+        word for row in rng.sample(rows, min(len(rows), 2000))
+        for word in normalize_tokens(f"{row[1]} {row[3]}")
+    ]
+    typed = [
+        word[:rng.randint(1, len(word))]
+        for word in rng.choices(words, k=args.queries)
+    ]
+    pairs = [
+        f"{a} {b[:rng.randint(1, len(b))]}"
+        for a, b in zip(rng.choices(words, k=args.queries),
+                        rng.choices(words, k=args.queries))
+    ]
+
+    print(f"one word     : {percentiles(timed(index, typed))}")
+    print(f"two words    : {percentiles(timed(index, pairs))}")
+
+    for row in rng.sample(rows, MAX_OVERLAY // 2):
+        index.set_movie(row[0], row[1] + " edited", *row[2:])
+    print(f"with overlay : {percentiles(timed(index, typed + pairs))}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,264 @@
+"""
+Mixed read / write load from many threads against one SQLite file.
+
+    py -m benchmarks.concurrency                         # 4 x 2 threads, 10s
+    py -m benchmarks.concurrency --processes 8 --write-share 0.3
+    py -m benchmarks.concurrency -o concurrency.json
+
+Every variant runs in its own process on a fresh copy of the same
+synthetic database:
+
+    before        SQLite defaults, without the interaction indexes
+    pragmas-only  the "production" PRAGMAs, without the indexes
+    after         the "production" PRAGMAs and the indexes
+
+Like gunicorn workers, several forked processes hit the file at once,
+each with a few threads. Every thread logs in as its own user and loops
+over movie pages, catalog pages and writes (rate, watchlist, wishlist)
+through the Flask test client. Errors are responses >= 500, e.g.
+"database is locked".
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+VARIANTS = {
+    "before": ("default", False),
+    "pragmas-only": ("production", False),
+    "after": ("production", True),
+}
+
+INTERACTION_INDEXES = (
+    "ux_rating_user_movie", "ix_rating_movie_id",
+    "ux_wishlist_user_movie", "ix_watchlist_user_status_movie",
+)
+PASSWORD = "bench"
+
+
+def build_database(path, args):
+    """Synthetic catalog and activity in ``path`` (run in a child process)."""
+    from werkzeug.security import generate_password_hash
+
+    from app import app, db, init_db
+    from benchmarks.synthetic import seed_activity, write_catalog_csv
+    from import_catalog import import_csv
+
+    csv_path = os.path.join(os.path.dirname(path), "movies.csv")
+    write_catalog_csv(csv_path, args.movies, args.seed)
+    with app.app_context():
+        init_db()
+        with contextlib.redirect_stdout(io.StringIO()):
+            import_csv(csv_path, rebuild_model=False)
+        with db.engine.begin() as conn:
+            seed_activity(conn, args.users, args.per_user,
+                          generate_password_hash(PASSWORD), args.seed)
+
+
+def worker(app, user_id, movie_ids, args, deadline, results, seed):
+    rng = random.Random(seed)
+    client = app.test_client()
+    client.post("/login", data={"email": f"user{user_id}@example.com",
+                                "password": PASSWORD})
+    languages = ["Hindi", "Tamil", "Telugu", "Malayalam"]
+
+    while time.perf_counter() < deadline:
+        movie_id = rng.choice(movie_ids)
+        if rng.random() < args.write_share:
+            kind = rng.choice(["rate", "watchlist", "wishlist"])
+            if kind == "rate":
+                call = lambda: client.post(  # noqa: E731
+                    f"/rate/{movie_id}",
+                    data={"rating": str(rng.randint(1, 5)), "review": "ok"}
+                )
+            elif kind == "watchlist":
+                call = lambda: client.get(  # noqa: E731
+                    f"/watchlist/watched/{movie_id}"
+                )
+            else:
+                call = lambda: client.get(  # noqa: E731
+                    f"/wishlist/add/{movie_id}",
+                    headers={"Referer": f"/movie/{movie_id}"}
+                )
+        else:
+            kind = rng.choice(["movie", "movies"])
+            if kind == "movie":
+                call = lambda: client.get(f"/movie/{movie_id}")  # noqa: E731
+            else:
+                call = lambda: client.get(  # noqa: E731
+                    f"/movies?language={rng.choice(languages)}&sort=top_rated"
+                )
+
+        start = time.perf_counter()
+        status = call().status_code
+        elapsed = time.perf_counter() - start
+        results.append((kind, status, elapsed))
+
+
+def worker_process(app, index, movie_ids, args, deadline, queue):
+    """One forked "gunicorn worker": ``args.threads`` client threads."""
+    from app import db
+
+    with app.app_context():
+        # Connections inherited from the parent must not be shared
+        db.engine.dispose(close=False)
+
+    results = []
+    threads = [
+        threading.Thread(
+            target=worker,
+            args=(app, 1 + (index * args.threads + i) % args.users,
+                  movie_ids, args, deadline, results,
+                  args.seed + index * args.threads + i)
+        )
+        for i in range(args.threads)
+    ]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    queue.put(results)
+
+
+def run_variant(name, db_path, args):
+    """Load test one variant; runs in a child process, prints JSON."""
+    profile, indexes = VARIANTS[name]
+    os.environ["DATABASE_URL"] = "sqlite:///" + db_path
+    os.environ["SQLITE_PROFILE"] = profile
+
+    import multiprocessing
+
+    import numpy as np
+
+    from app import app, db
+
+    app.config["RECOMMENDER_MODEL_PATH"] = None
+    app.config["METRICS_SLOW_REQUEST_MS"] = 10 ** 9
+    app.logger.disabled = True
+
+    with app.app_context():
+        with db.engine.begin() as conn:
+            if not indexes:
+                for index in INTERACTION_INDEXES:
+                    conn.exec_driver_sql(f"DROP INDEX IF EXISTS {index}")
+        movie_ids = [m for (m,) in db.session.execute(
+            db.text("SELECT id FROM movie")
+        )]
+        # Fit the models before forking so the timed loop measures
+        # the database, not model fitting
+        app.test_client().get(f"/movie/{movie_ids[0]}")
+
+    context = multiprocessing.get_context("fork")
+    queue = context.Queue()
+    deadline = time.perf_counter() + args.seconds
+    processes = [
+        context.Process(
+            target=worker_process,
+            args=(app, i, movie_ids, args, deadline, queue)
+        )
+        for i in range(args.processes)
+    ]
+    start = time.perf_counter()
+    for p in processes:
+        p.start()
+    results = [row for _ in processes for row in queue.get()]
+    for p in processes:
+        p.join()
+    elapsed = time.perf_counter() - start
+
+    report = {"ops_per_sec": len(results) / elapsed, "by_kind": {}}
+    for kind in sorted({k for k, _, _ in results}):
+        rows = [(s, t) for k, s, t in results if k == kind]
+        ms = np.asarray([t for _, t in rows]) * 1000
+        report["by_kind"][kind] = {
+            "ops": len(rows),
+            "errors": sum(1 for s, _ in rows if s >= 500),
+            "p50_ms": float(np.percentile(ms, 50)),
+            "p95_ms": float(np.percentile(ms, 95)),
+        }
+    report["errors"] = sum(r["errors"] for r in report["by_kind"].values())
+    print(json.dumps(report))
+
+
+def child(args, *extra):
+    out = subprocess.run(
+        [sys.executable, "-m", "benchmarks.concurrency", *extra,
+         *(f"--{k.replace('_', '-')}={v}" for k, v in vars(args).items()
+           if k in ("movies", "users", "per_user", "processes", "threads",
+                    "seconds", "write_share", "seed"))],
+        capture_output=True, text=True, check=True
+    ).stdout
+    return out.strip().splitlines()[-1] if out.strip() else None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="SQLite concurrency benchmark")
+    parser.add_argument("--movies", type=int, default=5_000)
+    parser.add_argument("--users", type=int, default=1_000)
+    parser.add_argument("--per-user", type=int, default=20)
+    parser.add_argument("--processes", type=int, default=4,
+                        help="worker processes, like gunicorn -w")
+    parser.add_argument("--threads", type=int, default=2,
+                        help="client threads per process")
+    parser.add_argument("--seconds", type=float, default=10.0)
+    parser.add_argument("--write-share", type=float, default=0.2)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--variants", nargs="+", default=list(VARIANTS),
+                        choices=list(VARIANTS))
+    parser.add_argument("-o", "--output", help="also write the report as JSON")
+    parser.add_argument("--build", help=argparse.SUPPRESS)
+    parser.add_argument("--variant", help=argparse.SUPPRESS)
+    parser.add_argument("--db", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.build:
+        os.environ["DATABASE_URL"] = "sqlite:///" + args.build
+        # Rollback journal (WAL sticks to the file); variants pick their own
+        os.environ["SQLITE_PROFILE"] = "default"
+        build_database(args.build, args)
+        return
+    if args.variant:
+        run_variant(args.variant, args.db, args)
+        return
+
+    tmp_dir = tempfile.mkdtemp()
+    template = os.path.join(tmp_dir, "template.db")
+    print(f"Building {args.movies} movies / {args.users} users...")
+    child(args, f"--build={template}")
+
+    report = {}
+    for name in args.variants:
+        print(f"Running {name} ({args.processes} processes x "
+              f"{args.threads} threads, {args.seconds}s)...")
+        db_path = os.path.join(tmp_dir, f"{name}.db")
+        shutil.copy(template, db_path)
+        report[name] = json.loads(
+            child(args, f"--variant={name}", f"--db={db_path}")
+        )
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+
+    print(f"\n{'variant':14} {'ops/s':>8} {'errors':>7}  "
+          f"p95 ms (movie / movies / rate / watchlist / wishlist)")
+    for name, r in report.items():
+        p95 = " / ".join(
+            f"{r['by_kind'][k]['p95_ms']:.1f}" if k in r["by_kind"] else "-"
+            for k in ("movie", "movies", "rate", "watchlist", "wishlist")
+        )
+        print(f"{name:14} {r['ops_per_sec']:8.1f} {r['errors']:7d}  {p95}")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"params": vars(args), "results": report}, f, indent=2)
+        print(f"✅ Report written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,251 @@
+"""
+End-to-end benchmark suite on a synthetic catalog.
+
+    py -m benchmarks.run                                 # 10k movies
+    py -m benchmarks.run --movies 100000 --users 20000 -o before.json
+    py -m benchmarks.run --compare before.json after.json
+
+Generates a catalog and user activity into a throwaway database, then
+times the CSV import, model fitting, get_recommendations and the
+/movies, /movie/<id> and /dashboard pages through the Flask test client.
+Pages are timed with empty fragment and facet caches (the render and
+query path), and again warm as ``<page>_warm`` (cache hits). Each scenario reports latency percentiles and the tracemalloc peak of
+one extra (traced) run. Results go to a JSON file so runs on different
+commits can be compared.
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+_tmp_dir = tempfile.mkdtemp()
+os.environ["DATABASE_URL"] = "sqlite:///" + os.path.join(_tmp_dir, "bench.db")
+
+import numpy as np  # noqa: E402
+from werkzeug.security import generate_password_hash  # noqa: E402
+
+from app import (  # noqa: E402
+    app, db, catalog_version, engines, init_db, load_recommender_movies
+)
+from benchmarks.synthetic import (  # noqa: E402
+    GENRES, LANGUAGES, seed_activity, write_catalog_csv
+)
+from import_catalog import import_csv  # noqa: E402
+from recommender import RecommenderEngine, get_recommendations  # noqa: E402
+
+PASSWORD = "bench"
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def stats(samples):
+    ms = np.asarray(samples) * 1000
+    p50, p95, p99 = np.percentile(ms, [50, 95, 99])
+    return {"runs": len(samples), "mean_ms": float(ms.mean()),
+            "p50_ms": float(p50), "p95_ms": float(p95),
+            "p99_ms": float(p99)}
+
+
+def peak_memory(fn):
+    """Peak traced allocation (KiB) while ``fn`` runs."""
+    tracemalloc.start()
+    try:
+        fn()
+        return tracemalloc.get_traced_memory()[1] / 1024
+    finally:
+        tracemalloc.stop()
+
+
+def measure(fn, args_list, before=None):
+    """
+    Time ``fn(*args)`` for every args tuple, then trace one more call.
+
+    ``before()``, if given, runs untimed ahead of every call.
+    """
+    samples = []
+    for args in args_list:
+        if before:
+            before()
+        start = time.perf_counter()
+        fn(*args)
+        samples.append(time.perf_counter() - start)
+    result = stats(samples)
+    if before:
+        before()
+    result["peak_kib"] = peak_memory(lambda: fn(*args_list[0]))
+    return result
+
+
+def get_ok(client, path):
+    response = client.get(path)
+    if response.status_code != 200:
+        raise RuntimeError(f"GET {path} returned {response.status_code}")
+
+
+def run(args):
+    rng = random.Random(args.seed)
+    results = {}
+    csv_path = os.path.join(_tmp_dir, "movies.csv")
+    app.config["RECOMMENDER_MODEL_PATH"] = None
+
+    print(f"Generating {args.movies} movies...")
+    write_catalog_csv(csv_path, args.movies, args.seed)
+
+    with app.app_context():
+        init_db()
+
+        def do_import():
+            with contextlib.redirect_stdout(io.StringIO()):
+                import_csv(csv_path, rebuild_model=False)
+
+        print("Importing catalog...")
+        start = time.perf_counter()
+        do_import()
+        elapsed = time.perf_counter() - start
+        results["import"] = {
+            "seconds": elapsed, "rows_per_sec": args.movies / elapsed
+        }
+
+        print(f"Seeding {args.users} users...")
+        with db.engine.begin() as conn:
+            results["activity"] = seed_activity(
+                conn, args.users, args.per_user,
+                generate_password_hash(PASSWORD), args.seed
+            )
+
+        movies = load_recommender_movies()
+        movie_ids = [m.id for m in movies]
+        sample = [rng.choice(movie_ids) for _ in range(args.queries)]
+
+        recommender_engine = engines().recommender
+        print("Fitting recommender...")
+        start = time.perf_counter()
+        recommender_engine.fit(movies, catalog_version())
+        results["model_fit"] = {
+            "seconds": time.perf_counter() - start,
+            "peak_kib": peak_memory(lambda: RecommenderEngine().fit(movies)),
+        }
+
+        print("Timing recommendations...")
+        watched = [rng.sample(movie_ids, min(20, len(movie_ids)))
+                   for _ in sample]
+        results["recommend"] = measure(
+            recommender_engine.recommend, list(zip(sample, watched))
+        )
+        # The one-off helper refits per call; keep it to a few runs
+        one_off = [(m, movies) for m in sample[:args.one_off_runs]]
+        results["get_recommendations"] = measure(get_recommendations, one_off)
+
+    client = app.test_client()
+    client.post("/login", data={"email": "user2@example.com",
+                                "password": PASSWORD})
+
+    languages = list(LANGUAGES)
+    pages = {
+        "movies_first_page": ["/movies"] * args.queries,
+        "movies_filter": [
+            f"/movies?language={rng.choice(languages)}"
+            f"&genre={rng.choice(GENRES)}&sort=top_rated"
+            for _ in range(args.queries)
+        ],
+        "movies_search": [
+            f"/movies?search={word}"
+            for word in rng.choices(
+                ["love", "family", "revenge", "police", "village", "secret"],
+                k=args.queries
+            )
+        ],
+        "movie_detail": [f"/movie/{m}" for m in sample],
+        "dashboard": ["/dashboard"] * args.queries,
+    }
+    def clear_page_caches():
+        app.extensions["fragment_cache"].clear()
+        app.extensions["facet_cache"].clear()
+
+    for name, paths in pages.items():
+        print(f"Timing {name}...")
+        get_ok(client, paths[0])  # warm-up: CF model, recommender
+        results[name] = measure(
+            lambda path: get_ok(client, path), [(p,) for p in paths],
+            before=clear_page_caches
+        )
+        results[f"{name}_warm"] = measure(
+            lambda path: get_ok(client, path), [(p,) for p in paths]
+        )
+    return results
+
+
+def compare(old_path, new_path):
+    with open(old_path) as f:
+        old = json.load(f)["results"]
+    with open(new_path) as f:
+        new = json.load(f)["results"]
+
+    print(f"{'scenario':24} {'metric':10} {'before':>10} {'after':>10} {'change':>8}")
+    for name in new:
+        if name not in old:
+            continue
+        for metric in ("p50_ms", "p95_ms", "seconds", "peak_kib"):
+            if metric in new[name] and metric in old[name]:
+                a, b = old[name][metric], new[name][metric]
+                change = (b - a) / a * 100 if a else 0.0
+                print(f"{name:24} {metric:10} {a:10.2f} {b:10.2f} {change:+7.1f}%")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="End-to-end benchmarks")
+    parser.add_argument("--movies", type=int, default=10_000)
+    parser.add_argument("--users", type=int, default=2_000)
+    parser.add_argument("--per-user", type=int, default=20,
+                        help="average interactions per user")
+    parser.add_argument("--queries", type=int, default=200,
+                        help="timed runs per scenario")
+    parser.add_argument("--one-off-runs", type=int, default=3,
+                        help="timed runs of get_recommendations (refits)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("-o", "--output", default="benchmark-results.json")
+    parser.add_argument("--compare", nargs=2, metavar=("BEFORE", "AFTER"),
+                        help="print the difference between two result files")
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(*args.compare)
+        return
+
+    results = run(args)
+    report = {
+        "commit": git_commit(),
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "params": {k: v for k, v in vars(args).items()
+                   if k not in ("output", "compare")},
+        "results": results,
+    }
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+
+    for name, r in results.items():
+        if "p50_ms" in r:
+            print(f"{name:24} p50 {r['p50_ms']:8.2f} ms  "
+                  f"p95 {r['p95_ms']:8.2f} ms  peak {r['peak_kib']:9.0f} KiB")
+    print(f"✅ Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
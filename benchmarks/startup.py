@@ -0,0 +1,82 @@
+"""
+Process startup cost: importing the app and serving the first pages.
+
+    py -m benchmarks.startup
+    py -m benchmarks.startup --runs 10
+
+Every measurement runs in a fresh interpreter against a throwaway copy
+of dataset/movies.csv, so module imports are never cached between runs.
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+SETUP = """
+import contextlib, io
+from app import app, init_db
+from import_catalog import import_csv
+with app.app_context(), contextlib.redirect_stdout(io.StringIO()):
+    init_db()
+    import_csv("dataset/movies.csv", rebuild_model=False)
+"""
+
+# Each snippet prints the seconds it took, measured from interpreter start
+SCENARIOS = {
+    "import app (scripts, workers)": """
+import app
+""",
+    "admin script (import + query)": """
+from app import app, User
+with app.app_context():
+    User.query.first()
+""",
+    "first /movies": """
+from app import app
+assert app.test_client().get("/movies").status_code == 200
+""",
+    "first /movie/1 (loads recommender)": """
+from app import app
+assert app.test_client().get("/movie/1").status_code == 200
+""",
+    "import recommender modules": """
+import recommender, collaborative, profiles
+""",
+}
+
+PREFIX = "import time; _start = time.perf_counter()\n"
+SUFFIX = "\nprint(time.perf_counter() - _start)\n"
+
+
+def run_snippet(code, env):
+    out = subprocess.run(
+        [sys.executable, "-c", PREFIX + code + SUFFIX],
+        capture_output=True, text=True, env=env, check=True
+    ).stdout
+    return float(out.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Startup time report")
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    tmp_dir = tempfile.mkdtemp()
+    env = dict(
+        os.environ,
+        DATABASE_URL="sqlite:///" + os.path.join(tmp_dir, "startup.db"),
+        PYTHONPATH=os.getcwd(),
+    )
+    subprocess.run([sys.executable, "-c", SETUP], env=env, check=True)
+
+    print(f"{'scenario':38} {'median':>9} {'min':>9}")
+    for name, code in SCENARIOS.items():
+        samples = [run_snippet(code, env) for _ in range(args.runs)]
+        print(f"{name:38} {statistics.median(samples) * 1000:7.0f}ms "
+              f"{min(samples) * 1000:7.0f}ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,182 @@
+"""
+Synthetic catalogs and user activity for benchmarks.
+
+    py -m benchmarks.synthetic movies.csv --movies 100000
+
+Everything is driven by a seed, so the same arguments always produce the
+same data. Genres, languages, cast, directors and keywords are drawn from
+skewed (Zipf-like) distributions: a few popular values, a long tail of
+rare ones, and pool sizes that grow with the catalog, which is roughly
+what a real movie catalog looks like to the recommender and facets.
+"""
+import argparse
+import csv
+import itertools
+import random
+
+import sqlalchemy as sa
+
+LANGUAGES = {
+    "Hindi": 30, "Tamil": 18, "Telugu": 18, "Malayalam": 12,
+    "Kannada": 8, "Bengali": 6, "Marathi": 5, "Punjabi": 3,
+}
+GENRES = [
+    "Drama", "Action", "Comedy", "Romance", "Thriller", "Crime", "Family",
+    "Mystery", "Horror", "Biography", "History", "Fantasy", "Musical",
+    "Sports", "War", "Adventure", "Sci-Fi", "Animation",
+]
+SYLLABLES = [
+    "ra", "vi", "ka", "ma", "su", "ni", "de", "sha", "pri", "an", "ja",
+    "ya", "lak", "sh", "mi", "ta", "ru", "dev", "kum", "ar", "esh", "na",
+]
+WORDS = [
+    "love", "family", "revenge", "village", "city", "police", "college",
+    "friendship", "politics", "secret", "journey", "war", "music", "farmer",
+    "gangster", "wedding", "mystery", "betrayal", "courage", "dream",
+    "sacrifice", "honour", "escape", "rivalry", "truth", "power", "destiny",
+    "heist", "tradition", "freedom", "memory", "storm", "river", "mountain",
+]
+CSV_FIELDS = (
+    "title", "language", "genre", "keywords", "cast",
+    "director", "description", "release_year", "poster",
+)
+
+
+def zipf_weights(n, s=1.0):
+    return [1.0 / (i + 1) ** s for i in range(n)]
+
+
+def make_names(rng, count, parts=2):
+    names = set()
+    while len(names) < count:
+        name = " ".join(
+            "".join(rng.choices(SYLLABLES, k=rng.randint(2, 3))).title()
+            for _ in range(parts)
+        )
+        names.add(name.replace(" ", ""))
+    return sorted(names)
+
+
+def generate_movies(n_movies, seed=0):
+    """Yield ``n_movies`` CSV-ready movie dicts."""
+    rng = random.Random(seed)
+
+    # Pools grow sub-linearly: big catalogs reuse the same stars a lot
+    actors = make_names(rng, max(50, int(n_movies ** 0.6)))
+    directors = make_names(rng, max(20, int(n_movies ** 0.5)))
+    vocabulary = WORDS + make_names(rng, max(100, int(n_movies ** 0.4)), parts=1)
+    vocabulary = [w.lower() for w in vocabulary]
+
+    languages = list(LANGUAGES)
+    language_weights = list(itertools.accumulate(LANGUAGES.values()))
+    genre_weights = list(itertools.accumulate(zipf_weights(len(GENRES), 0.9)))
+    actor_weights = list(itertools.accumulate(zipf_weights(len(actors))))
+    director_weights = list(itertools.accumulate(zipf_weights(len(directors))))
+    word_weights = list(itertools.accumulate(zipf_weights(len(vocabulary))))
+    years = list(range(1960, 2026))
+    year_weights = list(itertools.accumulate(
+        1.03 ** (y - years[0]) for y in years
+    ))
+
+    for i in range(n_movies):
+        genres = []
+        for g in rng.choices(GENRES, cum_weights=genre_weights,
+                             k=rng.randint(1, 3)):
+            if g not in genres:
+                genres.append(g)
+        keywords = rng.choices(vocabulary, cum_weights=word_weights, k=4)
+        yield {
+            "title": f"{rng.choice(WORDS).title()} "
+                     f"{rng.choice(vocabulary).title()} {i + 1}",
+            "language": rng.choices(languages, cum_weights=language_weights)[0],
+            "genre": " ".join(genres),
+            "keywords": " ".join(keywords),
+            "cast": " ".join(rng.choices(actors, cum_weights=actor_weights,
+                                         k=rng.randint(2, 4))),
+            "director": rng.choices(directors, cum_weights=director_weights)[0],
+            "description": " ".join(rng.choices(WORDS, k=12)).capitalize() + ".",
+            "release_year": rng.choices(years, cum_weights=year_weights)[0],
+            "poster": "https://image_url",
+        }
+
+
+def write_catalog_csv(path, n_movies, seed=0):
+    with open(path, "w", encoding="utf-8", newline="") as file:
+        writer = csv.DictWriter(file, fieldnames=CSV_FIELDS)
+        writer.writeheader()
+        writer.writerows(generate_movies(n_movies, seed))
+    return path
+
+
+def generate_activity(movie_ids, n_users, per_user=20, seed=0):
+    """
+    Ratings and watchlist rows for ``n_users`` users (ids 1..n_users).
+
+    Returns (ratings, watchlist, wishlist) lists of row dicts. Activity
+    per user varies around ``per_user`` and favours popular movies.
+    """
+    rng = random.Random(seed)
+    popularity = list(itertools.accumulate(zipf_weights(len(movie_ids), 0.8)))
+    ratings, watchlist, wishlist = [], [], []
+
+    for user_id in range(1, n_users + 1):
+        n = max(1, int(rng.expovariate(1.0 / per_user)))
+        picked = set(rng.choices(movie_ids, cum_weights=popularity, k=n))
+        for movie_id in picked:
+            roll = rng.random()
+            if roll < 0.5:
+                ratings.append({
+                    "user_id": user_id, "movie_id": movie_id,
+                    "rating": rng.choices(range(1, 6), (1, 2, 4, 6, 4))[0],
+                    "review": "Synthetic review",
+                })
+            if roll < 0.8:
+                status = "watched" if roll < 0.6 else "watchlist"
+                watchlist.append({"user_id": user_id, "movie_id": movie_id,
+                                  "status": status})
+            else:
+                wishlist.append({"user_id": user_id, "movie_id": movie_id})
+    return ratings, watchlist, wishlist
+
+
+def seed_activity(conn, n_users, per_user=20, password_hash="", seed=0):
+    """Insert users and their activity; returns the row counts."""
+    from migrations import recompute_rating_aggregates
+
+    movie_ids = list(conn.execute(
+        sa.text("SELECT id FROM movie ORDER BY id")
+    ).scalars())
+    users = [
+        {"id": i, "username": f"user{i}", "email": f"user{i}@example.com",
+         "password": password_hash, "profile_image": "default.png",
+         "is_admin": i == 1, "is_active": True, "is_verified": True}
+        for i in range(1, n_users + 1)
+    ]
+    ratings, watchlist, wishlist = generate_activity(
+        movie_ids, n_users, per_user, seed
+    )
+
+    meta = sa.MetaData()
+    meta.reflect(conn, only=["user", "rating", "watchlist", "wishlist"])
+    for name, rows in (("user", users), ("rating", ratings),
+                       ("watchlist", watchlist), ("wishlist", wishlist)):
+        if rows:
+            conn.execute(meta.tables[name].insert(), rows)
+    recompute_rating_aggregates(conn)
+    return {"users": len(users), "ratings": len(ratings),
+            "watchlist": len(watchlist), "wishlist": len(wishlist)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Write a synthetic movies CSV")
+    parser.add_argument("path")
+    parser.add_argument("--movies", type=int, default=10_000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    write_catalog_csv(args.path, args.movies, args.seed)
+    print(f"✅ Wrote {args.movies} movies to {args.path}")
+
+
+if __name__ == "__main__":
+    main()
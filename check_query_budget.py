@@ -0,0 +1,137 @@
+"""
+Fail when a page runs more SQL statements than its budget.
+
+    py check_query_budget.py
+
+Seeds a throwaway database with a movie that has many reviews and a user
+with long watchlist / wishlist histories, then requests every page and
+counts its statements. Budgets are fixed, so a lazy load per row (N+1)
+shows up as a failure no matter how many rows a page lists.
+"""
+import os
+import sys
+import tempfile
+
+_tmp_dir = tempfile.mkdtemp()
+os.environ["DATABASE_URL"] = "sqlite:///" + os.path.join(_tmp_dir, "budget.db")
+
+from werkzeug.security import generate_password_hash  # noqa: E402
+
+from app import (  # noqa: E402
+    app, db, Movie, Rating, User, Watchlist, Wishlist,
+    genres_for, init_db
+)
+from querycount import count_queries  # noqa: E402
+
+ROWS = 40
+PASSWORD = "budget"
+
+# Max statements per request, with fragment and facet caches cold. The
+# logged-in user comes from the user cache, filled by the warm-up request.
+BUDGETS = {
+    "user": {
+        "/movies": 6,
+        "/movies?search=movie&genre=Drama": 6,
+        "/movie/1": 6,
+        "/dashboard": 3,  # + catalog version and For You movies
+        "/wishlist": 1,
+        "/profile": 0,
+        "/api/v1/movies?sort=top_rated": 1,
+        "/api/v1/movies/1": 1,
+        "/api/v1/recommendations?ids=1,2,3": 3,
+        "/api/v1/users/me/activity": 3,
+        "/api/v1/suggest?q=mov": 1,  # catalog version once the index is built
+    },
+    "admin": {
+        "/admin": 1,
+        "/admin/movies": 1,
+        "/admin/users": 1,
+    },
+}
+
+
+def seed():
+    init_db()
+    movies = []
+    for i in range(1, ROWS + 1):
+        movie = Movie(
+            title=f"Movie {i}", language="Tamil", genre="Drama Thriller",
+            keywords=f"keyword{i % 7} family", cast=f"Actor{i % 5}",
+            director=f"Director{i % 3}", description="Seeded movie",
+            release_year=2000 + i % 20, poster="https://image_url"
+        )
+        movie.genres = genres_for(movie.genre)
+        db.session.add(movie)
+        movies.append(movie)
+
+    password = generate_password_hash(PASSWORD)
+    users = [
+        User(username=f"user{i}", email=f"user{i}@example.com",
+             password=password)
+        for i in range(ROWS)
+    ]
+    users[0].is_admin = True
+    db.session.add_all(users)
+    db.session.flush()
+
+    viewer = users[1]
+    for user in users:
+        db.session.add(Rating(user_id=user.id, movie_id=movies[0].id,
+                              rating=4, review="Seeded review"))
+    for i, movie in enumerate(movies[1:]):
+        status = "watched" if i % 2 else "watchlist"
+        db.session.add(Watchlist(user_id=viewer.id, movie_id=movie.id,
+                                 status=status))
+        db.session.add(Wishlist(user_id=viewer.id, movie_id=movie.id))
+    db.session.commit()
+
+    movies[0].rating_count = len(users)
+    movies[0].rating_sum = 4 * len(users)
+    movies[0].rating_avg = 4.0
+    db.session.commit()
+    return {"user": viewer.email, "admin": users[0].email}
+
+
+def check(client, engine, budgets):
+    failures = 0
+    for path, budget in budgets.items():
+        client.get(path)  # warm-up: model fitting, user cache
+        # Measure the pages as rendered, not as served from cached
+        # fragments, so lazy loads in templates still count
+        app.extensions["fragment_cache"].clear()
+        app.extensions["facet_cache"].clear()
+        with count_queries(engine) as counter:
+            response = client.get(path)
+        ok = response.status_code == 200 and counter.count <= budget
+        print(f"{'ok  ' if ok else 'FAIL'} {path:40} "
+              f"{counter.count:3} / {budget} statements "
+              f"(HTTP {response.status_code})")
+        if not ok:
+            failures += 1
+            print(counter.report())
+    return failures
+
+
+def main():
+    # keep the real model files untouched
+    app.config["RECOMMENDER_MODEL_PATH"] = None
+
+    with app.app_context():
+        emails = seed()
+        engine = db.engine
+
+    failures = 0
+    for role, budgets in BUDGETS.items():
+        client = app.test_client()
+        client.post("/login", data={"email": emails[role],
+                                    "password": PASSWORD})
+        failures += check(client, engine, budgets)
+
+    if failures:
+        print(f"❌ {failures} page(s) over their query budget")
+        sys.exit(1)
+    print("✅ All pages within their query budget")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,272 @@
+# collaborative.py
+
+import threading
+import time
+
+import numpy as np
+from scipy import sparse
+
+from recommender import top_k_rows
+
+# Strength of the implicit watchlist signals (ratings use rating / 5)
+WATCHLIST_WEIGHT = 0.4
+WATCHED_WEIGHT = 0.8
+
+
+def interaction_value(rating=None, status=None):
+    """How strongly a user is linked to a movie (0 = no interaction)."""
+    if rating:
+        return rating / 5.0
+    if status == "watched":
+        return WATCHED_WEIGHT
+    if status == "watchlist":
+        return WATCHLIST_WEIGHT
+    return 0.0
+
+
+class CollaborativeEngine:
+    """
+    Item-item collaborative filtering over a sparse user x movie matrix.
+
+    Similar movies are the ones the same users interacted with, scored by
+    cosine similarity between movie columns. Only the ``k`` best
+    neighbours of a movie are kept, computed on first use and cached.
+
+    New interactions go to a small pending table instead of rebuilding
+    the matrix. Per-movie norms are updated on the spot and queries
+    correct for pending values. An update changes the movie's norm, and
+    so its similarity to every movie sharing a user with it; the cached
+    lists of all those movies are dropped, so results stay exact. The
+    pending table is merged into the matrix once it reaches
+    ``merge_threshold`` entries.
+
+    Updates only reach the engine of the worker that handled the write;
+    ``ttl`` (seconds) makes ``ensure_fitted`` refit from the database
+    after that long, which bounds how long other workers' ratings and
+    watchlist changes stay invisible here.
+    """
+
+    def __init__(self, k=20, merge_threshold=1000, ttl=None):
+        self.k = k
+        self.merge_threshold = merge_threshold
+        self.ttl = ttl
+        self.fitted = False
+        self.fitted_at = None
+        self._lock = threading.RLock()
+        self._reset()
+
+    def _reset(self):
+        self.user_row = {}
+        self.item_col = {}
+        self.movie_ids = []
+        self.matrix = sparse.csr_matrix((0, 0))
+        self.matrix_csc = self.matrix.tocsc()
+        self.sq_norms = np.zeros(0)
+        self.pending = {}
+        self.pending_by_user = {}
+        self.pending_by_item = {}
+        self.neighbors = {}
+
+    # -----------------------------
+    # Building
+    # -----------------------------
+    def _user(self, user_id):
+        row = self.user_row.get(user_id)
+        if row is None:
+            row = self.user_row[user_id] = len(self.user_row)
+        return row
+
+    def _item(self, movie_id):
+        col = self.item_col.get(movie_id)
+        if col is None:
+            col = self.item_col[movie_id] = len(self.movie_ids)
+            self.movie_ids.append(movie_id)
+            self.sq_norms = np.append(self.sq_norms, 0.0)
+        return col
+
+    def fit(self, interactions):
+        """interactions : iterable of (user_id, movie_id, value)"""
+        with self._lock:
+            self._reset()
+            cells = {}
+            for user_id, movie_id, value in interactions:
+                if value:
+                    key = (self._user(user_id), self._item(movie_id))
+                    # Keep the strongest signal for a repeated pair
+                    cells[key] = max(value, cells.get(key, 0.0))
+
+            shape = (len(self.user_row), len(self.movie_ids))
+            rows = [r for r, _ in cells]
+            cols = [c for _, c in cells]
+            matrix = sparse.csr_matrix(
+                (np.fromiter(cells.values(), dtype=np.float64,
+                             count=len(cells)), (rows, cols)),
+                shape=shape
+            )
+            self._set_matrix(matrix)
+            self.fitted = True
+            self.fitted_at = time.monotonic()
+        return self
+
+    def is_current(self):
+        """Fitted, and no longer ago than ``ttl``."""
+        return self.fitted and (
+            self.ttl is None or time.monotonic() - self.fitted_at < self.ttl
+        )
+
+    def ensure_fitted(self, load_interactions):
+        """Refit from ``load_interactions()`` when stale or expired."""
+        if self.is_current():
+            return self
+        with self._lock:
+            if not self.is_current():
+                self.fit(load_interactions())
+        return self
+
+    def _set_matrix(self, matrix):
+        self.matrix = matrix
+        self.matrix_csc = matrix.tocsc()
+        self.sq_norms = np.asarray(
+            matrix.multiply(matrix).sum(axis=0)
+        ).ravel()
+        self.neighbors = {}
+
+    def mark_stale(self):
+        self.fitted = False
+
+    # -----------------------------
+    # Incremental updates
+    # -----------------------------
+    def _base_value(self, row, col):
+        if row < self.matrix.shape[0] and col < self.matrix.shape[1]:
+            return self.matrix[row, col]
+        return 0.0
+
+    def _value(self, row, col):
+        if (row, col) in self.pending:
+            return self.pending[(row, col)]
+        return self._base_value(row, col)
+
+    def update(self, user_id, movie_id, value):
+        """Set the interaction strength of one user/movie pair."""
+        with self._lock:
+            row = self._user(user_id)
+            col = self._item(movie_id)
+
+            old = self._value(row, col)
+            if old == value:
+                return
+            self.pending[(row, col)] = value
+            self.pending_by_user.setdefault(row, set()).add(col)
+            self.pending_by_item.setdefault(col, set()).add(row)
+            self.sq_norms[col] += value * value - old * old
+
+            # Every similarity involving this movie moved (its norm
+            # changed), and any cached list may have to gain or lose it
+            for c in self._co_items(col, row):
+                self.neighbors.pop(c, None)
+
+            if len(self.pending) >= self.merge_threshold:
+                self._merge()
+
+    def _co_items(self, col, row):
+        """This movie and every movie sharing a user with it (or ``row``)."""
+        rows = set(self._column(col))
+        rows.add(row)
+        items = {col}
+        base_rows = [r for r in rows if r < self.matrix.shape[0]]
+        if base_rows:
+            items.update(np.unique(self.matrix[base_rows].indices).tolist())
+        for r in rows & self.pending_by_user.keys():
+            items.update(self.pending_by_user[r])
+        return items
+
+    def _merge(self):
+        shape = (len(self.user_row), len(self.movie_ids))
+        base = self.matrix.tocoo()
+        base = sparse.csr_matrix(
+            (base.data, (base.row, base.col)), shape=shape
+        )
+
+        rows, cols = zip(*self.pending)
+        values = np.fromiter(self.pending.values(), dtype=np.float64)
+        mask = sparse.csr_matrix(
+            (np.ones(len(rows)), (rows, cols)), shape=shape
+        )
+        updates = sparse.csr_matrix((values, (rows, cols)), shape=shape)
+
+        merged = (base - base.multiply(mask) + updates).tocsr()
+        merged.eliminate_zeros()
+        self._set_matrix(merged)
+        self.pending = {}
+        self.pending_by_user = {}
+        self.pending_by_item = {}
+
+    # -----------------------------
+    # Querying
+    # -----------------------------
+    def _column(self, col):
+        """Effective (users, values) of one movie column."""
+        values = {}
+        if col < self.matrix_csc.shape[1]:
+            start = self.matrix_csc.indptr[col]
+            end = self.matrix_csc.indptr[col + 1]
+            values = dict(zip(
+                self.matrix_csc.indices[start:end].tolist(),
+                self.matrix_csc.data[start:end].tolist()
+            ))
+        for row in self.pending_by_item.get(col, ()):
+            values[row] = self.pending[(row, col)]
+        return values
+
+    def _neighbors(self, col):
+        cached = self.neighbors.get(col)
+        if cached is not None:
+            return cached
+
+        column = self._column(col)
+        n_items = len(self.movie_ids)
+        dots = np.zeros(n_items)
+
+        # Co-occurrence with the merged matrix ...
+        base_rows = [r for r in column if r < self.matrix.shape[0]]
+        if base_rows:
+            # 1 x users row times the CSR matrix only touches the rows
+            # of users who interacted with this movie
+            vec = sparse.csr_matrix(
+                ([column[r] for r in base_rows],
+                 ([0] * len(base_rows), base_rows)),
+                shape=(1, self.matrix.shape[0])
+            )
+            base_dots = vec.dot(self.matrix).toarray().ravel()
+            dots[:len(base_dots)] += base_dots
+
+        # ... corrected for values that are still pending
+        for row in self.pending_by_user.keys() & column.keys():
+            weight = column[row]
+            for other in self.pending_by_user[row]:
+                delta = self.pending[(row, other)] - self._base_value(row, other)
+                dots[other] += delta * weight
+
+        norms = np.sqrt(np.maximum(self.sq_norms, 0.0)) * np.sqrt(
+            max(self.sq_norms[col], 0.0)
+        )
+        scores = np.full(n_items, -np.inf)
+        linked = (dots > 0) & (norms > 0)
+        scores[linked] = dots[linked] / norms[linked]
+        scores[col] = -np.inf
+
+        best = top_k_rows(scores, self.k)
+        cached = self.neighbors[col] = (best, scores[best])
+        return cached
+
+    def similar(self, movie_id):
+        """{movie_id: similarity} of the ``k`` closest movies."""
+        with self._lock:
+            col = self.item_col.get(movie_id)
+            if col is None:
+                return {}
+            cols, scores = self._neighbors(col)
+            return {
+                self.movie_ids[c]: float(s) for c, s in zip(cols, scores)
+            }
@@ -0,0 +1,140 @@
+# export.py
+
+import csv
+import io
+import json
+import zlib
+
+from models import db, Movie, Rating, User, Watchlist, Wishlist
+
+# Columns of dataset/movies.csv; import_catalog.py reads the same ones,
+# so a catalog export can be imported again
+CATALOG_FIELDS = (
+    "title", "language", "genre", "keywords", "cast",
+    "director", "description", "release_year", "poster",
+)
+
+# Rows fetched from the database cursor (and written) per batch
+BATCH_SIZE = 1000
+
+# Leading characters that make spreadsheets read a CSV cell as a formula
+FORMULA_PREFIXES = ("=", "+", "-", "@", "\t", "\r")
+
+FORMATS = {
+    "csv": "text/csv; charset=utf-8",
+    "ndjson": "application/x-ndjson",
+}
+
+
+def _movie_columns():
+    return [Movie.id.label("movie_id"), Movie.title,
+            Movie.release_year, Movie.language]
+
+
+def _catalog():
+    return db.select(*(getattr(Movie, f) for f in CATALOG_FIELDS)).order_by(Movie.id)
+
+
+def _ratings():
+    return db.select(
+        Rating.user_id, User.email, *_movie_columns(),
+        Rating.rating, Rating.review
+    ).join(Movie, Movie.id == Rating.movie_id).outerjoin(
+        User, User.id == Rating.user_id
+    ).order_by(Rating.id)
+
+
+def _watchlist():
+    return db.select(
+        Watchlist.user_id, User.email, *_movie_columns(), Watchlist.status
+    ).join(Movie, Movie.id == Watchlist.movie_id).outerjoin(
+        User, User.id == Watchlist.user_id
+    ).order_by(Watchlist.id)
+
+
+def _wishlist():
+    return db.select(
+        Wishlist.user_id, User.email, *_movie_columns()
+    ).join(Movie, Movie.id == Wishlist.movie_id).outerjoin(
+        User, User.id == Wishlist.user_id
+    ).order_by(Wishlist.id)
+
+
+# Dataset name -> SELECT; ratings include the reviews
+DATASETS = {
+    "movies": _catalog,
+    "ratings": _ratings,
+    "watchlist": _watchlist,
+    "wishlist": _wishlist,
+}
+
+
+def csv_escape(value):
+    """Prefix text a spreadsheet would run as a formula with ``'``."""
+    if isinstance(value, str) and value.startswith(FORMULA_PREFIXES):
+        return "'" + value
+    return value
+
+
+def csv_unescape(value):
+    """Undo csv_escape, so exported catalogs import unchanged."""
+    if value.startswith("'") and value[1:].startswith(FORMULA_PREFIXES):
+        return value[1:]
+    return value
+
+
+def export_batches(dataset, batch_size=BATCH_SIZE):
+    """
+    (column names, iterator of row batches) for one dataset.
+
+    Rows are streamed from the database cursor ``batch_size`` at a
+    time (yield_per), so memory does not grow with the table.
+    """
+    result = db.session.execute(
+        DATASETS[dataset]().execution_options(yield_per=batch_size)
+    )
+    return list(result.keys()), result.partitions()
+
+
+def export_chunks(dataset, fmt="csv", batch_size=BATCH_SIZE):
+    """
+    Text of ``dataset`` as CSV or NDJSON, one chunk per batch.
+
+    CSV cells that start like a formula (user reviews, titles) are
+    escaped with csv_escape; NDJSON is written as is.
+    """
+    if fmt not in FORMATS:
+        raise ValueError(f"unknown export format {fmt!r}")
+    columns, batches = export_batches(dataset, batch_size)
+
+    if fmt == "ndjson":
+        for batch in batches:
+            yield "".join(
+                json.dumps(dict(zip(columns, row)), ensure_ascii=False,
+                           separators=(",", ":")) + "\n"
+                for row in batch
+            )
+        return
+
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator="\n")
+    writer.writerow(columns)
+    for batch in batches:
+        writer.writerows([csv_escape(v) for v in row] for row in batch)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    # Header only, for an empty table
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+def gzip_chunks(chunks, level=6):
+    """Compress text chunks into one gzip stream, chunk by chunk."""
+    # wbits=31: zlib writes the gzip header and trailer
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+    for chunk in chunks:
+        data = compressor.compress(chunk.encode("utf-8"))
+        if data:
+            yield data
+    yield compressor.flush()
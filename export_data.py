@@ -0,0 +1,54 @@
+"""
+Export the catalog, ratings / reviews, watchlists or wishlists.
+
+    py export_data.py movies -o movies.csv        # re-importable with import_catalog.py
+    py export_data.py ratings --format ndjson -o ratings.ndjson.gz
+    py export_data.py watchlist > watchlist.csv
+
+Rows are streamed from the database in batches, so memory stays flat
+however large the table is. Output ending in .gz (or --gzip) is
+compressed; without -o the export goes to stdout.
+"""
+import argparse
+import sys
+
+from app import app
+from export import BATCH_SIZE, DATASETS, FORMATS, export_chunks, gzip_chunks
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("dataset", choices=sorted(DATASETS))
+    parser.add_argument("--format", choices=sorted(FORMATS), default="csv")
+    parser.add_argument("-o", "--output", help="file to write (default: stdout)")
+    parser.add_argument("--gzip", action="store_true",
+                        help="compress (implied by an output ending in .gz)")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE,
+                        help="rows fetched and written per batch")
+    args = parser.parse_args()
+    compress = args.gzip or (args.output or "").endswith(".gz")
+
+    with app.app_context():
+        chunks = export_chunks(args.dataset, args.format, args.batch_size)
+        if compress:
+            chunks = gzip_chunks(chunks)
+        else:
+            chunks = (chunk.encode("utf-8") for chunk in chunks)
+
+        out = open(args.output, "wb") if args.output else sys.stdout.buffer
+        written = 0
+        try:
+            for chunk in chunks:
+                out.write(chunk)
+                written += len(chunk)
+        finally:
+            if args.output:
+                out.close()
+
+    if args.output:
+        print(f"✅ Exported {args.dataset} to {args.output} "
+              f"({written / 1024:.0f} KB)")
+
+
+if __name__ == "__main__":
+    main()
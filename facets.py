@@ -0,0 +1,52 @@
+# facets.py
+
+import threading
+
+
+def split_genres(text):
+    """'Thriller Crime' -> ['Thriller', 'Crime'] (deduplicated, title case)."""
+    names = []
+    for word in (text or "").replace(",", " ").split():
+        name = word.strip().title()
+        if name and name not in names:
+            names.append(name)
+    return names
+
+
+class FacetCache:
+    """
+    In-process cache of facet counts for the /movies filters.
+
+    Entries are tied to the catalog version they were computed for. When
+    the version moves (any movie write) the whole cache is dropped, so
+    every worker notices catalog writes made by other workers too.
+    The number of filter combinations kept is capped at ``max_entries``.
+    """
+
+    def __init__(self, max_entries=256):
+        self.max_entries = max_entries
+        self.version = None
+        self.entries = {}
+        self._lock = threading.Lock()
+
+    def get(self, version, key, compute):
+        with self._lock:
+            if version != self.version:
+                self.version = version
+                self.entries = {}
+            if key in self.entries:
+                return self.entries[key]
+
+        value = compute()
+
+        with self._lock:
+            if version == self.version:
+                if len(self.entries) >= self.max_entries:
+                    self.entries.pop(next(iter(self.entries)))
+                self.entries[key] = value
+        return value
+
+    def clear(self):
+        with self._lock:
+            self.version = None
+            self.entries = {}
@@ -1,6 +1,6 @@
-from app import app, db
+from app import app, db, init_db
 
 with app.app_context():
     db.drop_all()
-    db.create_all()
+    init_db(rebuild_search=True)
     print("Database schema updated successfully")
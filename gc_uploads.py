@@ -0,0 +1,45 @@
+"""
+Delete profile images that no user refers to any more.
+
+    py gc_uploads.py              # content-hashed uploads older than a day
+    py gc_uploads.py --dry-run    # only list them
+    py gc_uploads.py --legacy     # also files from before content hashing
+"""
+import argparse
+import os
+
+from app import app, db, User, upload_folder
+from avatars import unreferenced_files
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--dry-run", action="store_true")
+    parser.add_argument("--legacy", action="store_true",
+                        help="also collect unreferenced non-hashed uploads")
+    parser.add_argument("--min-age", type=float, default=24.0,
+                        help="keep files younger than this many hours")
+    args = parser.parse_args()
+
+    with app.app_context():
+        referenced = set(
+            db.session.execute(db.select(User.profile_image).distinct()).scalars()
+        )
+        paths = list(unreferenced_files(
+            upload_folder(), referenced,
+            min_age=args.min_age * 3600, legacy=args.legacy
+        ))
+
+    freed = 0
+    for path in paths:
+        freed += os.path.getsize(path)
+        if args.dry_run:
+            print(f"would delete {path}")
+        else:
+            os.remove(path)
+    action = "Would free" if args.dry_run else "Freed"
+    print(f"✅ {action} {freed / 1024:.0f} KB in {len(paths)} file(s)")
+
+
+if __name__ == "__main__":
+    main()
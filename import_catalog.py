@@ -0,0 +1,177 @@
+"""
+Stream a movies CSV into the catalog.
+
+    py import_catalog.py dataset/movies.csv
+    py import_catalog.py big.csv --batch-size 10000
+
+Rows are upserted on (title, release_year, language), so re-running an
+import updates movies instead of duplicating them. Each batch is written
+with executemany and committed on its own; the number of committed rows
+is checkpointed so an interrupted import resumes where it stopped.
+The search index, genre links and recommender model are rebuilt once
+at the end instead of per row.
+"""
+import argparse
+import csv
+import hashlib
+import itertools
+import os
+import time
+
+import sqlalchemy as sa
+
+from app import (
+    app, db, JobState, Movie,
+    get_recommender, init_db, rebuild_movie_genres, record_catalog_change
+)
+from export import CATALOG_FIELDS as FIELDS, csv_unescape
+from search import drop_search_triggers, setup_search_index
+
+
+def checkpoint_name(path):
+    """JobState key for one version of one file (path, size and mtime)."""
+    stat = os.stat(path)
+    raw = f"{os.path.abspath(path)}|{stat.st_size}|{stat.st_mtime_ns}"
+    return "import:" + hashlib.sha1(raw.encode()).hexdigest()[:16]
+
+
+def clean_row(row):
+    """CSV row -> column dict, or None if the row is unusable."""
+    try:
+        values = {f: csv_unescape((row.get(f) or "").strip()) for f in FIELDS}
+        values["release_year"] = int(values["release_year"])
+    except ValueError:
+        return None
+    if not values["title"] or not values["language"]:
+        return None
+    return values
+
+
+def natural_key(values):
+    return values["title"], values["release_year"], values["language"]
+
+
+def upsert_batch(rows):
+    """Insert new movies and update existing ones; returns (inserted, updated)."""
+    movie = Movie.__table__
+
+    # Last row wins when a batch repeats a movie
+    by_key = {natural_key(r): r for r in rows}
+
+    existing = {}
+    titles = {key[0] for key in by_key}
+    for m in db.session.execute(
+        sa.select(movie.c.id, movie.c.title,
+                  movie.c.release_year, movie.c.language)
+        .where(movie.c.title.in_(titles))
+    ):
+        existing.setdefault((m.title, m.release_year, m.language), m.id)
+
+    inserts, updates = [], []
+    for key, values in by_key.items():
+        if key in existing:
+            updates.append(dict(values, _id=existing[key]))
+        else:
+            inserts.append(values)
+
+    if inserts:
+        db.session.execute(movie.insert(), inserts)
+    if updates:
+        db.session.execute(
+            movie.update().where(movie.c.id == sa.bindparam("_id")),
+            updates
+        )
+    return len(inserts), len(updates)
+
+
+def import_csv(path, batch_size=5000, rebuild_model=True):
+    name = checkpoint_name(path)
+    state = db.session.get(JobState, name)
+    if state is None:
+        state = JobState(name=name, value=0)
+        db.session.add(state)
+        db.session.commit()
+
+    skip = state.value
+    if skip:
+        print(f"Resuming {path} after row {skip}")
+
+    # The FTS index is rebuilt once at the end
+    with db.engine.begin() as conn:
+        drop_search_triggers(conn)
+
+    started = time.perf_counter()
+    done = committed = inserted = updated = skipped = 0
+
+    try:
+        with open(path, encoding="utf-8", newline="") as file:
+            reader = itertools.islice(csv.DictReader(file), skip, None)
+            while True:
+                batch = list(itertools.islice(reader, batch_size))
+                if not batch:
+                    break
+
+                rows = [r for r in map(clean_row, batch) if r is not None]
+                skipped += len(batch) - len(rows)
+                if rows:
+                    i, u = upsert_batch(rows)
+                    inserted += i
+                    updated += u
+
+                done += len(batch)
+                state.value = skip + done
+                db.session.commit()
+                committed = done
+
+                elapsed = time.perf_counter() - started
+                print(f"  {skip + done} rows  ({done / elapsed:.0f} rows/sec)")
+    except BaseException:
+        # Searches and admin edits must keep working until the import is
+        # resumed: restore the triggers and index what was written so far
+        db.session.rollback()
+        setup_search_index(db.engine, rebuild=True)
+        if committed:
+            # Committed batches are live: link their genres and bump the
+            # catalog version so caches and models pick them up
+            rebuild_movie_genres()
+            record_catalog_change(None, "import")
+            db.session.commit()
+        raise
+
+    print("Rebuilding search index and genres...")
+    setup_search_index(db.engine, rebuild=True)
+    rebuild_movie_genres()
+
+    record_catalog_change(None, "import")
+    db.session.delete(state)
+    db.session.commit()
+
+    if rebuild_model:
+        print("Fitting recommender model...")
+        get_recommender()
+
+    elapsed = time.perf_counter() - started
+    print(
+        f"✅ Imported {done} rows in {elapsed:.2f}s "
+        f"({done / elapsed if elapsed else 0:.0f} rows/sec): "
+        f"{inserted} new, {updated} updated, {skipped} skipped"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("path", nargs="?", default="dataset/movies.csv")
+    parser.add_argument("--batch-size", type=int, default=5000,
+                        help="rows per executemany / commit")
+    parser.add_argument("--skip-model", action="store_true",
+                        help="leave the recommender to refit on first use")
+    args = parser.parse_args()
+
+    with app.app_context():
+        init_db()
+        import_csv(args.path, batch_size=args.batch_size,
+                   rebuild_model=not args.skip_model)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,250 @@
+# metrics.py
+
+import bisect
+import threading
+import time
+from collections import deque
+
+from flask import (
+    before_render_template, current_app, g, has_request_context, request,
+    template_rendered
+)
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+# Histogram bucket upper bounds in seconds: 0.1 ms .. ~60 s, x1.5 apart
+BUCKETS = tuple(0.0001 * 1.5 ** i for i in range(34))
+
+
+class Histogram:
+    """
+    Fixed-bucket latency histogram.
+
+    Memory does not grow with the number of observations. Percentiles
+    are interpolated inside the bucket they fall in, which is accurate to
+    the bucket width (each bucket is 1.5x the previous one).
+    """
+
+    def __init__(self, buckets=BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # last one is +Inf
+        self.count = 0
+        self.sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        with self._lock:
+            self.counts[bisect.bisect_left(self.buckets, value)] += 1
+            self.count += 1
+            self.sum += value
+
+    def percentile(self, p):
+        with self._lock:
+            if not self.count:
+                return 0.0
+            target = self.count * p / 100.0
+            seen = 0
+            for i, n in enumerate(self.counts):
+                if n and seen + n >= target:
+                    lower = self.buckets[i - 1] if i else 0.0
+                    upper = self.buckets[i] if i < len(self.buckets) else lower
+                    return lower + (upper - lower) * (target - seen) / n
+                seen += n
+            return self.buckets[-1]
+
+    @property
+    def mean(self):
+        return self.sum / self.count if self.count else 0.0
+
+    def cumulative(self):
+        """(upper bound, cumulative count) pairs, ending with +Inf."""
+        with self._lock:
+            total = 0
+            pairs = []
+            for bound, n in zip(self.buckets + (float("inf"),), self.counts):
+                total += n
+                pairs.append((bound, total))
+            return pairs
+
+
+_sql_listeners = False
+
+
+def _listen_sql():
+    """Time SQL statements on every engine (once per process)."""
+    global _sql_listeners
+    if not _sql_listeners:
+        event.listen(Engine, "before_cursor_execute", _start_sql)
+        event.listen(Engine, "after_cursor_execute", _finish_sql)
+        _sql_listeners = True
+
+
+def _start_sql(conn, cursor, statement, parameters, context, executemany):
+    # Kept on the execution context rather than a per-connection stack:
+    # a statement that raises never reaches _finish_sql, and its start
+    # time goes away with its context instead of skewing later ones
+    if context is not None:
+        context.metrics_sql_started = time.perf_counter()
+
+
+def _finish_sql(conn, cursor, statement, parameters, context, executemany):
+    # Statements are collected on g, so they go to the request's own app
+    started = getattr(context, "metrics_sql_started", None)
+    if started is None:
+        return
+    if has_request_context() and "metrics_sql" in g:
+        elapsed = time.perf_counter() - started
+        g.metrics_sql.append((statement, elapsed))
+        g.metrics_sql_time += elapsed
+
+
+class Metrics:
+    """
+    Per-request timing for a Flask app.
+
+    Records, per endpoint: wall time, SQL statement count and time,
+    template render time; plus recommender stage times fed through
+    ``observe_stage``. Requests slower than METRICS_SLOW_REQUEST_MS are
+    logged together with their SQL and kept for the admin page.
+    """
+
+    def __init__(self, app=None):
+        self.requests = {}
+        self.sql_time = {}
+        self.render_time = {}
+        self.sql_statements = {}
+        self.stages = {}
+        self.slow_requests = deque(maxlen=50)
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault("METRICS_SLOW_REQUEST_MS", 500)
+        app.before_request(self._start_request)
+        app.after_request(self._finish_request)
+        before_render_template.connect(self._start_render, app)
+        template_rendered.connect(self._finish_render, app)
+        _listen_sql()
+
+    # -----------------------------
+    # Collection
+    # -----------------------------
+    def _histogram(self, table, key):
+        hist = table.get(key)
+        if hist is None:
+            with self._lock:
+                hist = table.setdefault(key, Histogram())
+        return hist
+
+    def _start_request(self):
+        g.metrics_started = time.perf_counter()
+        g.metrics_sql = []
+        g.metrics_sql_time = 0.0
+        g.metrics_render_time = 0.0
+
+    def _finish_request(self, response):
+        started = g.pop("metrics_started", None)
+        if started is None:
+            return response
+        elapsed = time.perf_counter() - started
+        endpoint = request.endpoint or "unmatched"
+
+        self._histogram(self.requests, endpoint).observe(elapsed)
+        self._histogram(self.sql_time, endpoint).observe(g.metrics_sql_time)
+        self._histogram(self.render_time, endpoint).observe(
+            g.metrics_render_time
+        )
+        with self._lock:
+            self.sql_statements[endpoint] = (
+                self.sql_statements.get(endpoint, 0) + len(g.metrics_sql)
+            )
+
+        if elapsed * 1000 >= current_app.config["METRICS_SLOW_REQUEST_MS"]:
+            self._log_slow(endpoint, elapsed)
+        return response
+
+    def _log_slow(self, endpoint, elapsed):
+        entry = {
+            "endpoint": endpoint,
+            "path": request.full_path.rstrip("?"),
+            "seconds": elapsed,
+            "sql_seconds": g.metrics_sql_time,
+            "sql": [(" ".join(s.split()), t) for s, t in g.metrics_sql],
+        }
+        self.slow_requests.appendleft(entry)
+        current_app.logger.warning(
+            "Slow request %s took %.0f ms (%d SQL statements, %.0f ms SQL)\n%s",
+            entry["path"], elapsed * 1000, len(entry["sql"]),
+            g.metrics_sql_time * 1000,
+            "\n".join(f"  [{t * 1000:.1f} ms] {s}" for s, t in entry["sql"])
+        )
+
+    def _start_render(self, sender, template, context, **extra):
+        if "metrics_sql" in g:
+            g.metrics_render_started = time.perf_counter()
+
+    def _finish_render(self, sender, template, context, **extra):
+        started = g.pop("metrics_render_started", None)
+        if started is not None:
+            g.metrics_render_time += time.perf_counter() - started
+
+    def observe_stage(self, stage, seconds):
+        """Time spent in one recommender stage (vectorize / score / rank)."""
+        self._histogram(self.stages, stage).observe(seconds)
+
+    # -----------------------------
+    # Reporting
+    # -----------------------------
+    def summary(self):
+        """Rows for the admin page, slowest endpoints (by p95) first."""
+        rows = []
+        for endpoint, hist in list(self.requests.items()):
+            count = hist.count or 1
+            rows.append({
+                "endpoint": endpoint,
+                "count": hist.count,
+                "p50": hist.percentile(50),
+                "p95": hist.percentile(95),
+                "p99": hist.percentile(99),
+                "sql_per_request": self.sql_statements.get(endpoint, 0) / count,
+                "sql_mean": self.sql_time.get(endpoint, Histogram()).mean,
+                "render_mean": self.render_time.get(endpoint, Histogram()).mean,
+            })
+        rows.sort(key=lambda r: r["p95"], reverse=True)
+
+        stages = [
+            {"stage": stage, "count": hist.count, "p50": hist.percentile(50),
+             "p95": hist.percentile(95), "p99": hist.percentile(99)}
+            for stage, hist in sorted(self.stages.items())
+        ]
+        return rows, stages
+
+    def prometheus(self):
+        """All metrics in the Prometheus text exposition format."""
+        lines = []
+        families = [
+            ("app_request_duration_seconds", "Request wall time",
+             "endpoint", self.requests),
+            ("app_sql_duration_seconds", "SQL time per request",
+             "endpoint", self.sql_time),
+            ("app_template_render_seconds", "Template render time per request",
+             "endpoint", self.render_time),
+            ("app_recommender_stage_seconds", "Time per recommender stage",
+             "stage", self.stages),
+        ]
+        for name, help_text, label, table in families:
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} histogram")
+            for key, hist in sorted(table.items()):
+                for bound, total in hist.cumulative():
+                    le = "+Inf" if bound == float("inf") else f"{bound:.6g}"
+                    lines.append(f'{name}_bucket{{{label}="{key}",le="{le}"}} {total}')
+                lines.append(f'{name}_sum{{{label}="{key}"}} {hist.sum:.6f}')
+                lines.append(f'{name}_count{{{label}="{key}"}} {hist.count}')
+
+        lines.append("# HELP app_sql_statements_total SQL statements executed")
+        lines.append("# TYPE app_sql_statements_total counter")
+        for endpoint, total in sorted(self.sql_statements.items()):
+            lines.append(f'app_sql_statements_total{{endpoint="{endpoint}"}} {total}')
+        return "\n".join(lines) + "\n"
@@ -0,0 +1,107 @@
+# migrations.py
+
+import sqlalchemy as sa
+
+# Schema changes for databases created by an older version of the app.
+# Each step runs once; SQLite's PRAGMA user_version remembers how many
+# have been applied. Fresh databases get the current schema from
+# db.create_all() and are simply stamped with the latest version.
+
+
+def _add_rating_aggregates(conn):
+    conn.execute(sa.text(
+        "ALTER TABLE movie ADD COLUMN rating_count INTEGER NOT NULL DEFAULT 0"
+    ))
+    conn.execute(sa.text(
+        "ALTER TABLE movie ADD COLUMN rating_sum INTEGER NOT NULL DEFAULT 0"
+    ))
+    conn.execute(sa.text(
+        "ALTER TABLE movie ADD COLUMN rating_avg FLOAT NOT NULL DEFAULT 0"
+    ))
+    recompute_rating_aggregates(conn)
+
+
+def _add_interaction_indexes(conn):
+    # Older databases may hold duplicate pairs (double clicks raced the
+    # "already there?" check); keep one row per pair before the unique
+    # indexes go in. For ratings the newest one wins.
+    conn.execute(sa.text("""
+        DELETE FROM rating WHERE id NOT IN (
+            SELECT MAX(id) FROM rating GROUP BY user_id, movie_id
+        )
+    """))
+    conn.execute(sa.text("""
+        DELETE FROM wishlist WHERE id NOT IN (
+            SELECT MIN(id) FROM wishlist GROUP BY user_id, movie_id
+        )
+    """))
+    recompute_rating_aggregates(conn)
+
+    for statement in (
+        "CREATE UNIQUE INDEX IF NOT EXISTS ux_rating_user_movie"
+        " ON rating (user_id, movie_id)",
+        "CREATE INDEX IF NOT EXISTS ix_rating_movie_id ON rating (movie_id)",
+        "CREATE UNIQUE INDEX IF NOT EXISTS ux_wishlist_user_movie"
+        " ON wishlist (user_id, movie_id)",
+        "CREATE INDEX IF NOT EXISTS ix_watchlist_user_status_movie"
+        " ON watchlist (user_id, status, movie_id)",
+    ):
+        conn.execute(sa.text(statement))
+    conn.execute(sa.text("ANALYZE"))
+
+
+MIGRATIONS = [
+    _add_rating_aggregates,
+    _add_interaction_indexes,
+]
+
+
+def schema_version(conn):
+    return conn.execute(sa.text("PRAGMA user_version")).scalar()
+
+
+def set_schema_version(conn, version):
+    # PRAGMA does not take bound parameters
+    conn.execute(sa.text(f"PRAGMA user_version = {int(version)}"))
+
+
+def migrate(engine):
+    """Apply pending migrations, each in its own transaction."""
+    applied = []
+    with engine.connect() as conn:
+        current = schema_version(conn)
+    for version, step in enumerate(MIGRATIONS, 1):
+        if version <= current:
+            continue
+        with engine.begin() as conn:
+            step(conn)
+            set_schema_version(conn, version)
+        applied.append(step.__name__)
+    return applied
+
+
+def stamp_latest(engine):
+    with engine.begin() as conn:
+        set_schema_version(conn, len(MIGRATIONS))
+
+
+# -----------------------------
+# Data repair helpers
+# -----------------------------
+def recompute_rating_aggregates(conn):
+    """Rebuild movie.rating_count / rating_sum / rating_avg from the rating table."""
+    conn.execute(sa.text(
+        "UPDATE movie SET rating_count = 0, rating_sum = 0, rating_avg = 0"
+    ))
+    conn.execute(sa.text("""
+        UPDATE movie
+        SET rating_count = agg.n,
+            rating_sum = agg.total,
+            rating_avg = agg.total * 1.0 / agg.n
+        FROM (
+            SELECT movie_id, COUNT(*) AS n, SUM(rating) AS total
+            FROM rating
+            GROUP BY movie_id
+        ) AS agg
+        WHERE movie.id = agg.movie_id
+    """))
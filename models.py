@@ -0,0 +1,135 @@
+# models.py
+
+from flask_login import UserMixin
+from flask_sqlalchemy import SQLAlchemy
+
+# Bound to the app in app.create_app()
+db = SQLAlchemy()
+
+
+# ---------------- USER MODEL ----------------
+class User(UserMixin, db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    username = db.Column(db.String(100), nullable=False)
+    email = db.Column(db.String(120), unique=True, nullable=False)
+    password = db.Column(db.String(200), nullable=False)
+    profile_image = db.Column(db.String(200), default="default.png")
+    is_admin = db.Column(db.Boolean, default=False)
+    is_active = db.Column(db.Boolean, default=True)
+    is_verified = db.Column(db.Boolean, default=False)
+
+
+# ---------------- GENRES ----------------
+# Movie.genre stays the display string; genres are also normalized
+# into this association table for exact, indexed filtering.
+movie_genre = db.Table(
+    "movie_genre",
+    db.Column("movie_id", db.Integer, db.ForeignKey("movie.id"), primary_key=True),
+    db.Column("genre_id", db.Integer, db.ForeignKey("genre.id"), primary_key=True),
+    db.Index("ix_movie_genre_genre_id", "genre_id", "movie_id"),
+)
+
+
+class Genre(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(50), unique=True, nullable=False)
+
+
+# ---------------- MOVIE MODEL ----------------
+class Movie(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    title = db.Column(db.String(200), nullable=False)
+    language = db.Column(db.String(50), nullable=False)
+    genre = db.Column(db.String(200), nullable=False)
+    description = db.Column(db.Text, nullable=False)
+    cast = db.Column(db.Text, nullable=False)
+    director = db.Column(db.String(100), nullable=False)
+    keywords = db.Column(db.Text, nullable=False)
+    release_year = db.Column(db.Integer, nullable=False)
+    poster = db.Column(db.String(300), nullable=False)
+
+    # Rating aggregates, kept up to date by rate_movie
+    # (repair_ratings.py recomputes them from the rating table)
+    rating_count = db.Column(db.Integer, nullable=False, default=0, server_default="0")
+    rating_sum = db.Column(db.Integer, nullable=False, default=0, server_default="0")
+    rating_avg = db.Column(db.Float, nullable=False, default=0.0, server_default="0")
+
+    genres = db.relationship("Genre", secondary=movie_genre)
+
+    __table_args__ = (
+        # keyset pagination by (release_year, id) and the rating sorts
+        db.Index("ix_movie_release_year_id", "release_year", "id"),
+        db.Index("ix_movie_rating_avg_id", "rating_avg", "id"),
+        db.Index("ix_movie_rating_count_id", "rating_count", "id"),
+        db.Index("ix_movie_language", "language"),
+        # natural key used by the catalog importer
+        db.Index("ix_movie_natural_key", "title", "release_year", "language"),
+    )
+
+# ---------------- WISHLIST MODEL ----------------
+class Wishlist(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey("user.id"))
+    movie_id = db.Column(db.Integer, db.ForeignKey("movie.id"))
+
+    __table_args__ = (
+        db.Index("ux_wishlist_user_movie", "user_id", "movie_id", unique=True),
+    )
+
+    user = db.relationship("User", backref="wishlist_items")
+    movie = db.relationship("Movie")
+
+class Watchlist(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey("user.id"))
+    movie_id = db.Column(db.Integer, db.ForeignKey("movie.id"))
+    status = db.Column(db.String(20))  # "watchlist" or "watched"
+
+    __table_args__ = (
+        db.UniqueConstraint("user_id", "movie_id", name="unique_user_movie"),
+        # covers the watched / watchlist ID lookups of one user
+        db.Index("ix_watchlist_user_status_movie", "user_id", "status", "movie_id"),
+    )
+
+    user = db.relationship("User")
+    movie = db.relationship("Movie")
+
+
+class Rating(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey("user.id"))
+    movie_id = db.Column(db.Integer, db.ForeignKey("movie.id"))
+    rating = db.Column(db.Integer, nullable=False)
+    review = db.Column(db.Text)   # 👈 NEW
+
+    __table_args__ = (
+        db.Index("ux_rating_user_movie", "user_id", "movie_id", unique=True),
+        db.Index("ix_rating_movie_id", "movie_id"),
+    )
+
+    user = db.relationship("User")
+    movie = db.relationship("Movie")
+
+
+# ---------------- CATALOG CHANGE LOG ----------------
+# Every movie add / edit / delete appends a row here.
+# The newest id is the catalog version used by the recommender.
+class CatalogChange(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    movie_id = db.Column(db.Integer)  # None for bulk imports
+    action = db.Column(db.String(10), nullable=False)  # "add", "edit", "delete", "import"
+
+
+# ---------------- PRECOMPUTED NEIGHBOURS ----------------
+# Filled by precompute_neighbors.py, read by movie_detail.
+class MovieNeighbor(db.Model):
+    movie_id = db.Column(db.Integer, primary_key=True)
+    rank = db.Column(db.Integer, primary_key=True)
+    neighbor_id = db.Column(db.Integer, nullable=False, index=True)
+    score = db.Column(db.Float, nullable=False)
+
+
+# Bookkeeping for offline jobs, e.g. the last catalog version processed.
+class JobState(db.Model):
+    name = db.Column(db.String(50), primary_key=True)
+    value = db.Column(db.Integer, nullable=False, default=0)
@@ -0,0 +1,59 @@
+# page_cache.py
+
+import threading
+from collections import OrderedDict
+
+
+class FragmentCache:
+    """
+    In-process LRU of rendered HTML fragments (movie grid, filters,
+    recommendation strip, ...).
+
+    Like FacetCache, entries are tied to a content version: when the
+    version moves (movie write or new rating, in any worker) the whole
+    cache is dropped. Fragments must not depend on who is logged in.
+    """
+
+    def __init__(self, max_entries=1024):
+        self.max_entries = max_entries
+        self.version = None
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def get(self, version, key, render):
+        with self._lock:
+            if version != self.version:
+                self.version = version
+                self.entries.clear()
+            html = self.entries.get(key)
+            if html is not None:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return html
+            self.misses += 1
+
+        html = render()
+
+        with self._lock:
+            if version == self.version:
+                self.entries[key] = html
+                while len(self.entries) > self.max_entries:
+                    self.entries.popitem(last=False)
+        return html
+
+    def clear(self):
+        with self._lock:
+            self.version = None
+            self.entries.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self.entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
@@ -0,0 +1,81 @@
+# pagination.py
+
+import sqlalchemy as sa
+
+DEFAULT_PAGE_SIZE = 24
+MAX_PAGE_SIZE = 100
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+class KeysetPage:
+    """One page of results plus the cursor that continues after it."""
+
+    def __init__(self, items, next_cursor=None):
+        self.items = items
+        self.next_cursor = next_cursor
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def __iter__(self):
+        return iter(self.items)
+
+    def __len__(self):
+        return len(self.items)
+
+
+def page_size(value, default=DEFAULT_PAGE_SIZE):
+    """Requested page size clamped to 1..MAX_PAGE_SIZE."""
+    try:
+        size = int(value)
+    except (TypeError, ValueError):
+        return default
+    return max(1, min(size, MAX_PAGE_SIZE))
+
+
+def encode_cursor(values):
+    return ",".join(repr(v) for v in values)
+
+
+def decode_cursor(cursor, columns):
+    parts = cursor.split(",")
+    if len(parts) != len(columns):
+        raise InvalidCursor(cursor)
+    try:
+        return tuple(
+            col.type.python_type(part) for col, part in zip(columns, parts)
+        )
+    except (TypeError, ValueError, NotImplementedError):
+        raise InvalidCursor(cursor)
+
+
+def keyset_page(query, columns, cursor=None, limit=DEFAULT_PAGE_SIZE,
+                descending=False):
+    """
+    Fetch one page of ``query`` ordered by ``columns``.
+
+    The last column must be unique (normally the primary key) so the
+    ordering is total. Instead of OFFSET, the next page starts after the
+    row values stored in ``cursor``, which an index on ``columns`` can
+    seek to directly. Cost stays the same no matter how deep the page.
+    """
+    if cursor:
+        key = sa.tuple_(*columns)
+        after = sa.tuple_(*decode_cursor(cursor, columns))
+        query = query.filter(key < after if descending else key > after)
+
+    ordering = [c.desc() if descending else c.asc() for c in columns]
+    rows = query.add_columns(*columns).order_by(
+        *ordering
+    ).limit(limit + 1).all()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(tuple(rows[-1])[1:])
+
+    return KeysetPage([row[0] for row in rows], next_cursor)
@@ -0,0 +1,227 @@
+"""
+Precompute the top-K similar movies for every movie.
+
+Results go to the MovieNeighbor table so movie_detail can serve
+recommendations with one indexed query.
+
+    py precompute_neighbors.py                # refresh movies changed since last run
+    py precompute_neighbors.py --full         # rebuild the whole table
+    py precompute_neighbors.py -k 30 --workers 4
+"""
+import argparse
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from app import (
+    app, db, CatalogChange, JobState, Movie, MovieNeighbor,
+    get_recommender, init_db
+)
+from recommender import load_vectors, top_k_block
+
+JOB_NAME = "neighbors"
+
+# Feature matrix shared with pool workers (set by _init_worker)
+_vectors = None
+
+
+def _init_worker(source):
+    """``source`` is a matrix, or a saved model directory to memory-map."""
+    global _vectors
+    if isinstance(source, str):
+        source = load_vectors(source)[1]
+    _vectors = source
+
+
+def _score_chunk(args):
+    rows, k = args
+    return rows, top_k_block(_vectors, rows, k)
+
+
+def chunked(rows, size):
+    for start in range(0, len(rows), size):
+        yield rows[start:start + size]
+
+
+# -----------------------------
+# Which movies need work
+# -----------------------------
+def changes_since(version):
+    """Movie ids touched after ``version``; None means a full rebuild."""
+    changes = CatalogChange.query.filter(
+        CatalogChange.id > version
+    ).with_entities(CatalogChange.movie_id).all()
+
+    touched = set()
+    for c in changes:
+        if c.movie_id is None:  # bulk import
+            return None
+        touched.add(c.movie_id)
+    return touched
+
+
+def rows_to_refresh(model, touched, k, chunk_size):
+    """
+    Rows whose stored top-K can change because of ``touched`` movies.
+
+    That is the touched movies themselves, every movie that lists one of
+    them as a neighbour, and every other movie for which a touched movie
+    now scores at least as high as its current K-th neighbour.
+    """
+    refresh = set(model.rows_for(touched))
+
+    listed = MovieNeighbor.query.filter(
+        MovieNeighbor.neighbor_id.in_(touched)
+    ).with_entities(MovieNeighbor.movie_id).distinct().all()
+    refresh.update(model.rows_for(n.movie_id for n in listed))
+
+    touched_rows = model.rows_for(touched)
+    if len(touched_rows) == 0:
+        return refresh
+
+    # Best score any touched movie reaches against each movie
+    best_new = np.full(len(model.movie_ids), -np.inf)
+    for rows in chunked(touched_rows, chunk_size):
+        block = model.vectors[rows].dot(model.vectors.T).toarray()
+        np.maximum(best_new, block.max(axis=0), out=best_new)
+
+    stored = db.session.query(
+        MovieNeighbor.movie_id,
+        db.func.min(MovieNeighbor.score),
+        db.func.count()
+    ).group_by(MovieNeighbor.movie_id).all()
+    kth_score = np.full(len(model.movie_ids), -np.inf)
+    for movie_id, min_score, count in stored:
+        row = model.row(movie_id)
+        if row is not None and count >= k:
+            kth_score[row] = min_score
+
+    refresh.update(np.flatnonzero(best_new >= kth_score))
+    return refresh
+
+
+# -----------------------------
+# Writing results
+# -----------------------------
+def write_neighbors(model, rows, results):
+    movie_ids = model.movie_ids[rows].tolist()
+    MovieNeighbor.query.filter(
+        MovieNeighbor.movie_id.in_(movie_ids)
+    ).delete(synchronize_session=False)
+
+    records = []
+    for movie_id, (neighbor_rows, scores) in zip(movie_ids, results):
+        for rank, (row, score) in enumerate(zip(neighbor_rows, scores), 1):
+            records.append({
+                "movie_id": movie_id,
+                "rank": rank,
+                "neighbor_id": int(model.movie_ids[row]),
+                "score": float(score),
+            })
+    if records:
+        db.session.execute(MovieNeighbor.__table__.insert(), records)
+    db.session.commit()
+
+
+def remove_missing(model, movie_ids=None):
+    """
+    Drop stored lists of movies that are no longer in the catalog.
+
+    With ``movie_ids`` only those movies are checked, otherwise all.
+    """
+    if movie_ids is None:
+        gone = MovieNeighbor.movie_id.notin_(db.session.query(Movie.id))
+    else:
+        gone = MovieNeighbor.movie_id.in_(
+            [m for m in movie_ids if model.row(m) is None]
+        )
+    MovieNeighbor.query.filter(gone).delete(synchronize_session=False)
+    db.session.commit()
+
+
+def score_rows(model, rows, k, workers, chunk_size):
+    tasks = [(chunk, k) for chunk in chunked(np.asarray(rows), chunk_size)]
+
+    if workers <= 1 or len(tasks) <= 1:
+        _init_worker(model.vectors)
+        for task in tasks:
+            write_neighbors(model, *_score_chunk(task))
+        return
+
+    with ProcessPoolExecutor(
+        max_workers=workers,
+        initializer=_init_worker,
+        # Workers map the saved model instead of receiving a pickled copy
+        initargs=(model.loaded_dir or model.vectors,)
+    ) as pool:
+        for rows_done, results in pool.map(_score_chunk, tasks):
+            write_neighbors(model, rows_done, results)
+
+
+# -----------------------------
+# Job
+# -----------------------------
+def run(k=20, workers=None, chunk_size=256, full=False):
+    workers = workers or os.cpu_count() or 1
+    started = time.perf_counter()
+
+    model = get_recommender().model
+    if model.vectors is None:
+        print("Catalog is empty, nothing to do")
+        return
+
+    state = db.session.get(JobState, JOB_NAME)
+    touched = None
+    if state is not None and not full:
+        touched = changes_since(state.value)
+
+    if touched is None:
+        mode = "full"
+        rows = np.arange(len(model.movie_ids))
+        remove_missing(model)
+    else:
+        mode = "incremental"
+        rows = np.array(
+            sorted(rows_to_refresh(model, touched, k, chunk_size)),
+            dtype=np.intp
+        )
+        remove_missing(model, touched)
+
+    score_rows(model, rows, k, workers, chunk_size)
+
+    if state is None:
+        state = JobState(name=JOB_NAME)
+        db.session.add(state)
+    state.value = model.version
+    db.session.commit()
+
+    elapsed = time.perf_counter() - started
+    rate = len(rows) / elapsed if elapsed > 0 else 0.0
+    print(
+        f"✅ {mode} refresh: {len(rows)} movies in {elapsed:.2f}s "
+        f"({rate:.1f} movies/sec, k={k}, workers={workers})"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("-k", type=int, default=20,
+                        help="neighbours stored per movie")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="process pool size (default: CPU count)")
+    parser.add_argument("--chunk-size", type=int, default=256,
+                        help="movies scored per task")
+    parser.add_argument("--full", action="store_true",
+                        help="rebuild every movie, not just changed ones")
+    args = parser.parse_args()
+
+    with app.app_context():
+        init_db()
+        run(k=args.k, workers=args.workers,
+            chunk_size=args.chunk_size, full=args.full)
+
+
+if __name__ == "__main__":
+    main()
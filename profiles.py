@@ -0,0 +1,159 @@
+# profiles.py
+
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+from scipy import sparse
+
+from recommender import timed_stage, top_k_rows
+
+# How much each kind of history pulls a profile towards a movie.
+# Ratings below LIKED_RATING do not count, even for watched movies.
+LIKED_RATING = 4
+WATCHED_WEIGHT = 0.6
+WISHLIST_WEIGHT = 0.5
+WATCHLIST_WEIGHT = 0.4
+
+
+def profile_weight(rating=None, status=None, wishlisted=False):
+    """Weight of one movie in a user's profile (0 = not part of it)."""
+    if rating:
+        return rating / 5.0 if rating >= LIKED_RATING else 0.0
+    weight = 0.0
+    if status == "watched":
+        weight = WATCHED_WEIGHT
+    elif status == "watchlist":
+        weight = WATCHLIST_WEIGHT
+    if wishlisted:
+        weight = max(weight, WISHLIST_WEIGHT)
+    return weight
+
+
+class UserProfile:
+    """
+    One user's taste as a weighted sum of movie feature vectors.
+
+    ``weights`` ({movie_id: weight}) is the source of truth; ``vector``
+    is derived from it for the model version in ``version``. ``seen``
+    holds the movies kept out of the feed: every movie in the history,
+    including the watchlist and wishlist entries the profile is built
+    from (they would otherwise score highest).
+    """
+
+    def __init__(self, weights, seen):
+        self.weights = weights
+        self.seen = seen
+        self.vector = None
+        self.version = None
+        self.built_at = time.monotonic()
+
+    def build(self, model):
+        """(Re)derive ``vector`` from ``weights`` in ``model``'s feature space."""
+        self.version = model.version
+        self.vector = None
+        if model.vectors is None or not self.weights:
+            return
+        ids = np.fromiter(self.weights.keys(), dtype=np.int64,
+                          count=len(self.weights))
+        values = np.fromiter(self.weights.values(), dtype=np.float64,
+                             count=len(self.weights))
+        rows, found = model.lookup(ids)
+        mix = sparse.csr_matrix(values[found].reshape(1, -1))
+        self.vector = mix.dot(model.vectors[rows]).tocsr()
+
+    def set_weight(self, model, movie_id, weight):
+        """Change one movie's weight, adjusting the vector in place."""
+        old = self.weights.pop(movie_id, 0.0)
+        if weight:
+            self.weights[movie_id] = weight
+        if self.vector is None or self.version != model.version:
+            self.build(model)
+            return
+        row = model.row(movie_id)
+        if row is not None and weight != old:
+            self.vector = self.vector + (weight - old) * model.vectors[row]
+
+
+class ProfileStore:
+    """
+    Bounded LRU of user profiles with incremental updates.
+
+    Profiles are loaded from the database on first use and afterwards
+    adjusted in place when the user rates, watches or wishlists a movie.
+    ``ttl`` bounds how long changes made through another worker can go
+    unnoticed. A new recommender model only rebuilds the vector from
+    the cached weights; it does not touch the database.
+    """
+
+    def __init__(self, max_users=10000, ttl=900):
+        self.max_users = max_users
+        self.ttl = ttl
+        self.profiles = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, user_id, engine, load_history):
+        """Profile of ``user_id``; ``load_history(user_id)`` -> (weights, seen)."""
+        return self._get(user_id, engine.model, load_history)[0]
+
+    def _get(self, user_id, model, load_history):
+        """(profile, vector) with the vector built for ``model``."""
+        with self._lock:
+            profile = self.profiles.get(user_id)
+            if profile is not None:
+                if (self.ttl is None
+                        or time.monotonic() - profile.built_at < self.ttl):
+                    self.profiles.move_to_end(user_id)
+                else:
+                    profile = None
+
+        if profile is None:
+            profile = UserProfile(*load_history(user_id))
+            with self._lock:
+                self.profiles[user_id] = profile
+                self.profiles.move_to_end(user_id)
+                while len(self.profiles) > self.max_users:
+                    self.profiles.popitem(last=False)
+
+        # Under the lock, so the vector always matches the model it is
+        # used with even when two requests see different models
+        with self._lock:
+            if profile.version != model.version:
+                profile.build(model)
+            return profile, profile.vector
+
+    def update(self, user_id, engine, movie_id, weight, seen):
+        """Push one movie's new weight into a cached profile, if any."""
+        with self._lock:
+            profile = self.profiles.get(user_id)
+            if profile is None:
+                return
+            if seen:
+                profile.seen.add(movie_id)
+            else:
+                profile.seen.discard(movie_id)
+            profile.set_weight(engine.model, movie_id, weight)
+
+    def forget(self, user_id):
+        with self._lock:
+            self.profiles.pop(user_id, None)
+
+    def feed(self, user_id, engine, load_history, k=12):
+        """
+        Top ``k`` movie IDs for a user, best first.
+
+        One sparse matrix-vector product scores the whole catalog
+        against the profile; movies already in the history are skipped.
+        """
+        model = engine.model
+        profile, vector = self._get(user_id, model, load_history)
+        if vector is None:
+            return []
+
+        with timed_stage("feed"):
+            scores = model.vectors.dot(vector.T).toarray().ravel()
+            scores[model.rows_for(profile.seen)] = -np.inf
+            scores[scores <= 0] = -np.inf
+            best = top_k_rows(scores, k)
+        return model.movie_ids[best].tolist()
@@ -0,0 +1,42 @@
+# querycount.py
+
+from contextlib import contextmanager
+
+from sqlalchemy import event
+
+
+class QueryCounter:
+    """SQL statements executed on an engine while the counter is active."""
+
+    def __init__(self):
+        self.statements = []
+
+    @property
+    def count(self):
+        return len(self.statements)
+
+    def _record(self, conn, cursor, statement, parameters, context, executemany):
+        self.statements.append(statement)
+
+    def report(self):
+        return "\n".join(
+            f"  {i}. {' '.join(s.split())}"
+            for i, s in enumerate(self.statements, 1)
+        )
+
+
+@contextmanager
+def count_queries(engine):
+    """
+    Count the SQL statements run inside the block.
+
+        with count_queries(db.engine) as counter:
+            client.get("/dashboard")
+        assert counter.count <= 5, counter.report()
+    """
+    counter = QueryCounter()
+    event.listen(engine, "before_cursor_execute", counter._record)
+    try:
+        yield counter
+    finally:
+        event.remove(engine, "before_cursor_execute", counter._record)
@@ -0,0 +1,221 @@
+# recommendation_cache.py
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+
+def watched_key(watched_ids):
+    """Short stable hash of a watched set; '' for no history."""
+    if not watched_ids:
+        return ""
+    raw = ",".join(map(str, sorted(watched_ids)))
+    return hashlib.sha1(raw.encode()).hexdigest()[:16]
+
+
+def cache_key(movie_id, version, watched_ids=None):
+    """
+    Cache key for one recommendation list.
+
+    Anonymous visitors and users with no watch history share one entry
+    per movie. The catalog version is part of the key, so entries from
+    before a catalog write are never served again.
+    """
+    return f"{version}:{movie_id}:{watched_key(watched_ids)}"
+
+
+# -----------------------------
+# Shared backend
+# -----------------------------
+class SQLiteCacheBackend:
+    """
+    Cache shared by every worker on one machine, in a small SQLite file.
+
+    Values are stored as JSON with an absolute expiry time. Rows for
+    older catalog versions are purged when a newer version is first seen.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        self._purged_version = None
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS recommendation_cache ("
+                " key TEXT PRIMARY KEY, version INTEGER NOT NULL,"
+                " value TEXT NOT NULL, expires REAL)"
+            )
+
+    def _connect(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=5)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def get(self, key):
+        row = self._connect().execute(
+            "SELECT value, expires FROM recommendation_cache WHERE key = ?",
+            (key,)
+        ).fetchone()
+        if row is None or (row[1] is not None and row[1] < time.time()):
+            return None
+        return json.loads(row[0])
+
+    def set(self, key, version, value, ttl=None):
+        expires = time.time() + ttl if ttl else None
+        with self._connect() as conn:
+            if version != self._purged_version:
+                conn.execute(
+                    "DELETE FROM recommendation_cache WHERE version < ?",
+                    (version,)
+                )
+                self._purged_version = version
+            conn.execute(
+                "INSERT OR REPLACE INTO recommendation_cache "
+                "VALUES (?, ?, ?, ?)",
+                (key, version, json.dumps(value), expires)
+            )
+
+    def clear(self):
+        with self._connect() as conn:
+            conn.execute("DELETE FROM recommendation_cache")
+
+
+# -----------------------------
+# In-process LRU
+# -----------------------------
+class RecommendationCache:
+    """
+    Bounded LRU cache of recommendation lists with an optional TTL.
+
+    Lookups go to the in-process LRU first, then to the shared backend
+    (if any), and only then to ``compute``. The TTL also bounds how long
+    collaborative-filtering drift (new ratings) can stay invisible,
+    since ratings do not change the catalog version.
+    """
+
+    def __init__(self, max_entries=2048, ttl=None, backend=None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.backend = backend
+        self.version = None
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.shared_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+
+    def get_or_compute(self, movie_id, version, watched_ids, compute):
+        return self.get_or_compute_many(
+            [movie_id], version, watched_ids,
+            lambda missing: {movie_id: compute()}
+        )[movie_id]
+
+    def get_or_compute_many(self, movie_ids, version, watched_ids,
+                            compute_many):
+        """
+        {movie_id: value} for several movies sharing one watched set.
+
+        ``compute_many(missing_ids)`` -> {movie_id: value} is called once,
+        with only the movies found in neither cache layer.
+        """
+        keys = {mid: cache_key(mid, version, watched_ids) for mid in movie_ids}
+        now = time.monotonic()
+        values, missing = {}, []
+
+        with self._lock:
+            if version != self.version:
+                # Every cached entry belongs to an older catalog
+                self.version = version
+                self.entries.clear()
+            for mid, key in keys.items():
+                entry = self.entries.get(key)
+                if entry is not None:
+                    value, expires = entry
+                    if expires is None or expires > now:
+                        self.entries.move_to_end(key)
+                        self.hits += 1
+                        values[mid] = value
+                        continue
+                    del self.entries[key]
+                missing.append(mid)
+
+        computed = []
+        for mid in missing:
+            value = None
+            if self.backend is not None:
+                value = self.backend.get(keys[mid])
+            if value is not None:
+                with self._lock:
+                    self.shared_hits += 1
+                values[mid] = value
+                self._store(keys[mid], version, value, now)
+            else:
+                computed.append(mid)
+
+        if computed:
+            with self._lock:
+                self.misses += len(computed)
+            fresh = compute_many(computed)
+            for mid in computed:
+                value = fresh[mid]
+                if self.backend is not None:
+                    self.backend.set(keys[mid], version, value, self.ttl)
+                self._store(keys[mid], version, value, now)
+                values[mid] = value
+        return values
+
+    def _store(self, key, version, value, now):
+        expires = now + self.ttl if self.ttl else None
+        with self._lock:
+            if version != self.version:
+                return
+            self.entries[key] = (value, expires)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self.version = None
+            self.entries.clear()
+        if self.backend is not None:
+            self.backend.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.shared_hits + self.misses
+            return {
+                "entries": len(self.entries),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "shared_hits": self.shared_hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": (self.hits + self.shared_hits) / lookups
+                if lookups else 0.0,
+            }
+
+    def prometheus(self):
+        """Counters in the Prometheus text exposition format."""
+        stats = self.stats()
+        lines = []
+        for name in ("hits", "shared_hits", "misses", "evictions"):
+            metric = f"app_recommendation_cache_{name}_total"
+            lines.append(f"# TYPE {metric} counter")
+            lines.append(f"{metric} {stats[name]}")
+        lines.append("# TYPE app_recommendation_cache_entries gauge")
+        lines.append(f"app_recommendation_cache_entries {stats['entries']}")
+        return "\n".join(lines) + "\n"
@@ -1,85 +1,586 @@
 # recommender.py
 
-import pandas as pd
-from sklearn.feature_extraction.text import CountVectorizer
-from sklearn.metrics.pairwise import cosine_similarity
+import json
+import os
+import shutil
+import threading
+import time
+from contextlib import contextmanager
 
+import numpy as np
+from scipy import sparse
 
-def get_recommendations(movie_id, movies, watched_ids=None):
+from ann import MinHashLSH
+
+# Bumped whenever the saved model layout changes
+MODEL_FORMAT = 3
+
+# In ANN mode, score the whole catalog when LSH returns more than this
+# share of it: slicing that many rows costs more than one full product
+ANN_MAX_CANDIDATE_SHARE = 0.2
+
+# Name of the file in the model directory that points at the live model
+CURRENT_FILE = "CURRENT"
+
+# Arrays written per saved model, opened with numpy.memmap on load
+ARRAYS = ("data", "indices", "indptr", "movie_ids", "id_order")
+
+# Score added to movies the user has already watched
+WATCHED_BOOST = 0.15
+
+# Optional callback(stage, seconds) for instrumentation, see metrics.py
+_stage_observer = None
+
+
+def set_stage_observer(observer):
+    global _stage_observer
+    _stage_observer = observer
+
+
+@contextmanager
+def timed_stage(stage):
+    """Report the time spent in a block as ``stage`` to the observer."""
+    if _stage_observer is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        _stage_observer(stage, time.perf_counter() - started)
+
+
+def movie_features(m):
+    """Text used to describe a movie to the vectorizer."""
+    return " ".join([
+        m.genre or "",
+        m.language or "",
+        m.cast or "",
+        m.director or "",
+        m.keywords or "",
+    ])
+
+
+def top_k_rows(scores, k):
     """
-    movie_id     : int (current movie)
-    movies       : list of Movie objects
-    watched_ids  : list of movie IDs already watched by user
+    Row indices of the ``k`` highest finite scores, best first.
+
+    Uses a partial selection so only the winners get sorted.
+    Ties are broken by row order to keep results stable.
     """
+    k = min(k, len(scores))
+    if k <= 0:
+        return np.empty(0, dtype=np.intp)
 
-    # -----------------------------
-    # 1️⃣ Build dataframe
-    # -----------------------------
-    data = []
-
-    for m in movies:
-        combined = f"""
-        {m.genre or ''}
-        {m.language or ''}
-        {m.cast or ''}
-        {m.director or ''}
-        {m.keywords or ''}
+    if k < len(scores):
+        kth = scores[np.argpartition(-scores, k - 1)[k - 1]]
+        above = np.flatnonzero(scores > kth)
+        ties = np.flatnonzero(scores == kth)[:k - len(above)]
+        candidates = np.concatenate([above, ties])
+    else:
+        candidates = np.arange(len(scores))
+
+    order = np.lexsort((candidates, -scores[candidates]))
+    candidates = candidates[order]
+    return candidates[np.isfinite(scores[candidates])]
+
+
+def top_k_block(vectors, rows, k):
+    """
+    Top ``k`` neighbours for each of ``rows`` of a normalized matrix.
+
+    The rows are scored together as one sparse block (len(rows) x N), so
+    callers control memory through the block size. Returns a list of
+    (neighbour_rows, scores) pairs, one per input row.
+    """
+    rows = np.asarray(rows, dtype=np.intp)
+    block = vectors[rows].dot(vectors.T).toarray()
+    block[np.arange(len(rows)), rows] = -np.inf
+
+    result = []
+    for i in range(len(rows)):
+        best = top_k_rows(block[i], k)
+        result.append((best, block[i, best]))
+    return result
+
+
+def load_vectors(model_dir):
+    """
+    Memory-mapped feature matrix and id arrays of one saved model.
+
+    Returns (meta, vectors, movie_ids, id_order). The arrays are
+    read-only views of the files, so every process that opens the same
+    model shares one copy of it in the page cache.
+    """
+    with open(os.path.join(model_dir, "meta.json")) as f:
+        meta = json.load(f)
+    if meta.get("format") != MODEL_FORMAT:
+        raise ValueError(f"unsupported model format in {model_dir}")
+
+    arrays = {
+        name: np.load(os.path.join(model_dir, f"{name}.npy"), mmap_mode="r")
+        for name in ARRAYS
+    }
+    vectors = None
+    if meta["shape"] is not None:
+        vectors = sparse.csr_matrix(
+            (arrays["data"], arrays["indices"], arrays["indptr"]),
+            shape=tuple(meta["shape"]), copy=False
+        )
+    return meta, vectors, arrays["movie_ids"], arrays["id_order"]
+
+
+class ContentModel:
+    """
+    One fitted or loaded state of the recommender.
+
+    The feature matrix, the id -> row mapping and the LSH index belong
+    together and are never changed once built: RecommenderEngine swaps
+    in a whole new model, so a caller that reads ``engine.model`` once
+    works on one consistent snapshot even while another thread refits.
+    """
+
+    def __init__(self, vectors=None, movie_ids=None, id_order=None,
+                 ann=None, vectorizer=None, version=None, loaded_dir=None):
+        self.vectors = vectors
+        self.movie_ids = (movie_ids if movie_ids is not None
+                          else np.empty(0, dtype=np.int64))
+        self.id_order = (id_order if id_order is not None
+                         else np.empty(0, dtype=np.intp))
+        self.ann = ann
+        self.vectorizer = vectorizer
+        self.version = version
+        self.loaded_dir = loaded_dir
+
+    def replace(self, **changes):
+        """Copy of the model with some attributes changed."""
+        return ContentModel(**{**vars(self), **changes})
+
+    def lookup(self, movie_ids):
         """
+        Rows of an array of movie IDs.
 
-        data.append({
-            "id": m.id,
-            "combined": combined
-        })
+        Returns (rows, found): ``found`` masks the IDs that are in the
+        model and ``rows`` holds their rows, in the same order. Uses a
+        binary search over ``id_order`` instead of a per-worker dict.
+        """
+        ids = np.asarray(movie_ids, dtype=np.int64)
+        if len(self.movie_ids) == 0 or len(ids) == 0:
+            return np.empty(0, dtype=np.intp), np.zeros(len(ids), dtype=bool)
+        pos = np.searchsorted(self.movie_ids, ids, sorter=self.id_order)
+        pos = np.minimum(pos, len(self.id_order) - 1)
+        rows = np.asarray(self.id_order[pos], dtype=np.intp)
+        found = self.movie_ids[rows] == ids
+        return rows[found], found
 
-    df = pd.DataFrame(data)
+    def row(self, movie_id):
+        """Feature-matrix row of one movie ID, or None."""
+        rows, _ = self.lookup([movie_id])
+        return int(rows[0]) if len(rows) else None
 
-    # Safety check
-    if df.empty or len(df) < 2:
-        return []
+    def rows_for(self, movie_ids):
+        """Feature-matrix rows of the given movie IDs, skipping unknown ones."""
+        ids = np.fromiter(set(movie_ids), dtype=np.int64)
+        return self.lookup(ids)[0]
 
-    # -----------------------------
-    # 2️⃣ Vectorize text
-    # -----------------------------
-    vectorizer = CountVectorizer(stop_words="english")
-    vectors = vectorizer.fit_transform(df["combined"])
+    def scores_for(self, movie_id):
+        """Cosine similarity of ``movie_id`` against every movie, or None."""
+        if self.vectors is None:
+            return None
+        index = self.row(movie_id)
+        if index is None:
+            return None
+        return self.vectors.dot(self.vectors[index].T).toarray().ravel()
 
-    # -----------------------------
-    # 3️⃣ Similarity matrix
-    # -----------------------------
-    similarity = cosine_similarity(vectors)
 
-    # -----------------------------
-    # 4️⃣ Find current movie index
-    # -----------------------------
-    if movie_id not in df["id"].values:
-        return []
+class RecommenderEngine:
+    """
+    Content-based recommender that is fitted once and reused.
+
+    The fitted feature matrix and id -> row mapping stay in memory
+    between requests and are saved under ``model_path`` so a restart,
+    or another worker, can load them instead of refitting.
+
+    A saved model is a directory of flat .npy arrays (the CSR matrix
+    plus the movie ids) that workers open with numpy.memmap, so N
+    gunicorn workers share one copy of the pages. Saving writes a new
+    directory and then atomically replaces the CURRENT pointer, so a
+    rebuilt model reaches running workers without a restart.
+
+    Rows of the feature matrix are L2-normalized and kept sparse, so the
+    cosine similarity of one movie against the catalog is a single sparse
+    dot product and the N x N matrix is never built.
+
+    The fitted state lives in one ContentModel (``model``). Fitting and
+    loading build a new one and replace the reference in a single
+    assignment, so requests never see half of an old and half of a new
+    model; read ``engine.model`` once per operation.
+
+    ``version`` is the catalog version the model was fitted against.
+    Callers pass the current catalog version to ``ensure_fitted`` and the
+    model is reloaded or refitted only when it no longer matches.
+
+    With ``ann`` ({"bands": .., "rows": ..}) a MinHash LSH index is built
+    alongside the matrix. Catalogs of at least ``ann_min_movies`` movies
+    then score only the LSH candidates (plus blended and watched movies)
+    instead of the whole catalog; see ann.py.
+    """
+
+    def __init__(self, model_path=None, watched_boost=WATCHED_BOOST,
+                 ann=None, ann_min_movies=0):
+        self.model_path = model_path
+        self.watched_boost = watched_boost
+        self.ann_params = dict(ann) if ann else None
+        self.ann_min_movies = ann_min_movies
+        self.model = ContentModel()
+        self._lock = threading.Lock()
 
-    index = df[df["id"] == movie_id].index[0]
-    scores = list(enumerate(similarity[index]))
+    @property
+    def version(self):
+        return self.model.version
 
     # -----------------------------
-    # 5️⃣ BOOST using watched history
+    # Fitting
     # -----------------------------
-    if watched_ids:
-        for i, row in df.iterrows():
-            if row["id"] in watched_ids:
-                scores[i] = (scores[i][0], scores[i][1] + 0.15)
+    def fit(self, movies, version=None):
+        movies = list(movies)
+        movie_ids = np.fromiter(
+            (m.id for m in movies), dtype=np.int64, count=len(movies)
+        )
+        vectorizer = vectors = ann = None
+        if movies:
+            # scikit-learn is slow to import and only needed for fitting
+            from sklearn.feature_extraction.text import CountVectorizer
+            from sklearn.preprocessing import normalize
+
+            documents = [movie_features(m) for m in movies]
+            vectorizer = CountVectorizer(stop_words="english")
+            try:
+                with timed_stage("vectorize"):
+                    counts = vectorizer.fit_transform(documents)
+                    vectors = normalize(
+                        counts.astype(np.float64), norm="l2", copy=False
+                    ).tocsr()
+            except ValueError:
+                # Every document was empty or only stop words
+                vectorizer = None
+            if self.ann_params and vectors is not None:
+                with timed_stage("ann_build"):
+                    ann = MinHashLSH(**self.ann_params).build(
+                        movie_ids, documents
+                    )
+
+        # One assignment: readers get the old model or the new one
+        self.model = ContentModel(
+            vectors, movie_ids, np.argsort(movie_ids, kind="stable"),
+            ann, vectorizer, version
+        )
+        return self
+
+    def mark_stale(self):
+        self.model = self.model.replace(version=None)
+
+    def ensure_fitted(self, version, load_movies):
+        """
+        Make sure the model matches ``version``.
+
+        Tries the saved model first and only refits (and saves) when the
+        saved model is missing or was built for another version.
+        """
+        if self.version == version:
+            return self
+
+        with self._lock:
+            if self.version == version:
+                return self
+            if self.load() and self.version == version:
+                return self
+            self.fit(load_movies(), version)
+            self.save()
+            # Swap the private arrays for the shared, memory-mapped copy
+            self.load()
+        return self
 
     # -----------------------------
-    # 6️⃣ Sort & select top movies
+    # Persistence
     # -----------------------------
-    scores = sorted(scores, key=lambda x: x[1], reverse=True)
+    def save(self):
+        """Write the model to a new directory and make it the current one."""
+        if not self.model_path:
+            return
+        model = self.model
+        os.makedirs(self.model_path, exist_ok=True)
+
+        name = f"v{model.version}-{os.getpid()}-{time.time_ns()}"
+        model_dir = os.path.join(self.model_path, name)
+        os.makedirs(model_dir)
+
+        vectors = model.vectors
+        arrays = {
+            "data": vectors.data if vectors is not None else np.empty(0),
+            "indices": vectors.indices if vectors is not None
+            else np.empty(0, dtype=np.int32),
+            "indptr": vectors.indptr if vectors is not None
+            else np.empty(0, dtype=np.int32),
+            "movie_ids": model.movie_ids,
+            "id_order": model.id_order,
+        }
+        if model.ann is not None:
+            arrays.update(model.ann.arrays())
+        for array_name, array in arrays.items():
+            np.save(os.path.join(model_dir, f"{array_name}.npy"), array)
+        with open(os.path.join(model_dir, "meta.json"), "w") as f:
+            json.dump({
+                "format": MODEL_FORMAT,
+                "version": model.version,
+                "shape": list(vectors.shape) if vectors is not None else None,
+                "ann": self.ann_params,
+                "ann_indexed": model.ann is not None,
+            }, f)
+
+        # Atomic swap: readers see either the old or the new pointer
+        pointer = os.path.join(self.model_path, CURRENT_FILE)
+        tmp_pointer = f"{pointer}.{os.getpid()}.tmp"
+        with open(tmp_pointer, "w") as f:
+            f.write(name)
+        previous = self._current_name()
+        os.replace(tmp_pointer, pointer)
+
+        self._remove_old_models(keep={name, previous})
 
-    # Remove the same movie
-    scores = [
-        s for s in scores
-        if df.iloc[s[0]]["id"] != movie_id
-    ]
+    def _current_name(self):
+        try:
+            with open(os.path.join(self.model_path, CURRENT_FILE)) as f:
+                return f.read().strip() or None
+        except OSError:
+            return None
 
-    # Take top 5
-    top_scores = scores[:5]
+    def _remove_old_models(self, keep):
+        # The previous model is kept for workers that still have it mapped
+        for entry in os.listdir(self.model_path):
+            path = os.path.join(self.model_path, entry)
+            if entry not in keep and entry.startswith("v") and os.path.isdir(path):
+                shutil.rmtree(path, ignore_errors=True)
+
+    def load(self):
+        """Map the current saved model; False if there is none usable."""
+        if not self.model_path:
+            return False
+        name = self._current_name()
+        if name is None:
+            return False
+        model_dir = os.path.join(self.model_path, name)
+        if model_dir == self.model.loaded_dir:
+            return True
+        try:
+            meta, vectors, movie_ids, id_order = load_vectors(model_dir)
+            if meta.get("ann") != self.ann_params:
+                return False  # built with other ANN settings
+            ann = None
+            if meta.get("ann_indexed"):
+                ann = MinHashLSH.from_arrays(self.ann_params, {
+                    name: np.load(os.path.join(model_dir, f"{name}.npy"),
+                                  mmap_mode="r")
+                    for name in MinHashLSH(1, 1).arrays()
+                })
+        except (OSError, ValueError, KeyError):
+            return False
+
+        self.model = ContentModel(
+            vectors, movie_ids, id_order, ann,
+            version=meta["version"], loaded_dir=model_dir
+        )
+        return True
 
     # -----------------------------
-    # 7️⃣ Return movie IDs
+    # Querying
     # -----------------------------
-    return [df.iloc[i[0]]["id"] for i in top_scores]
+    def lookup(self, movie_ids):
+        """(rows, found) of movie IDs in the current model, see ContentModel."""
+        return self.model.lookup(movie_ids)
+
+    def row(self, movie_id):
+        return self.model.row(movie_id)
+
+    def rows_for(self, movie_ids):
+        return self.model.rows_for(movie_ids)
+
+    def scores_for(self, movie_id):
+        return self.model.scores_for(movie_id)
+
+    def recommend(self, movie_id, watched_ids=None, k=5,
+                  boost=None, exclude_watched=False,
+                  blend=None, blend_weight=0.0):
+        """
+        movie_id         : int (current movie)
+        watched_ids      : iterable of movie IDs already watched by user
+        k                : number of movie IDs to return
+        boost            : score added to watched movies
+                           (defaults to ``watched_boost``)
+        exclude_watched  : drop watched movies instead of boosting them
+        blend            : {movie_id: score} from another recommender
+        blend_weight     : share of ``blend`` in the final score (0..1)
+        """
+        model = self.model
+        if len(model.movie_ids) < 2:
+            return []
+
+        candidates = None
+        if model.ann is not None and len(model.movie_ids) >= self.ann_min_movies:
+            with timed_stage("candidates"):
+                candidates = self.candidate_rows(
+                    model, movie_id, k, watched_ids, exclude_watched, blend
+                )
+
+        with timed_stage("score"):
+            scores = self._scores(
+                model, movie_id, watched_ids, boost, exclude_watched,
+                blend, blend_weight, candidates
+            )
+        if scores is None:
+            return []
+
+        with timed_stage("rank"):
+            best = top_k_rows(scores, k)
+        if candidates is not None:
+            best = candidates[best]
+        return model.movie_ids[best].tolist()
+
+    def recommend_many(self, movie_ids, watched_ids=None, k=5,
+                       boost=None, exclude_watched=False,
+                       blends=None, blend_weight=0.0):
+        """
+        ``recommend`` for several movies at once: {movie_id: [IDs]}.
+
+        The requested rows are scored together as one sparse block
+        (len(movie_ids) x N), always exactly. ``blends`` maps a movie ID
+        to its {movie_id: score} blend; movies not in the model get [].
+        """
+        model = self.model
+        result = {mid: [] for mid in movie_ids}
+        if model.vectors is None or len(model.movie_ids) < 2:
+            return result
+        ids = np.fromiter(result.keys(), dtype=np.int64, count=len(result))
+        rows, found = model.lookup(ids)
+        if len(rows) == 0:
+            return result
+        ids = ids[found]
+
+        with timed_stage("score"):
+            block = model.vectors[rows].dot(model.vectors.T).toarray()
+
+            if blends and blend_weight:
+                for i, mid in enumerate(ids.tolist()):
+                    blend = blends.get(mid)
+                    if not blend:
+                        continue
+                    blend_rows, hit = model.lookup(
+                        np.fromiter(blend.keys(), dtype=np.int64, count=len(blend))
+                    )
+                    values = np.fromiter(
+                        blend.values(), dtype=np.float64, count=len(blend)
+                    )[hit]
+                    block[i] *= 1.0 - blend_weight
+                    block[i, blend_rows] += blend_weight * values
+
+            if watched_ids:
+                watched_rows = model.rows_for(watched_ids)
+                if exclude_watched:
+                    block[:, watched_rows] = -np.inf
+                else:
+                    if boost is None:
+                        boost = self.watched_boost
+                    block[:, watched_rows] += boost
+
+            block[np.arange(len(rows)), rows] = -np.inf
+
+        with timed_stage("rank"):
+            for mid, scores in zip(ids.tolist(), block):
+                result[mid] = model.movie_ids[top_k_rows(scores, k)].tolist()
+        return result
+
+    def candidate_rows(self, model, movie_id, k, watched_ids=None,
+                       exclude_watched=False, blend=None):
+        """
+        Sorted rows worth scoring for ``movie_id`` in ANN mode, or None.
+
+        LSH neighbours plus every movie that can gain from a blend or a
+        watched boost. None (score everything) when LSH finds fewer than
+        ``k`` other movies, or so many that exact scoring is cheaper.
+        """
+        similar = model.ann.candidates(movie_id)
+        if not k < len(similar) <= ANN_MAX_CANDIDATE_SHARE * len(model.movie_ids):
+            return None
+        ids = [similar]
+        if blend:
+            ids.append(np.fromiter(blend.keys(), dtype=np.int64, count=len(blend)))
+        if watched_ids and not exclude_watched:
+            ids.append(np.fromiter(set(watched_ids), dtype=np.int64))
+        rows, _ = model.lookup(np.concatenate(ids))
+        return np.unique(rows)
+
+    def _scores(self, model, movie_id, watched_ids, boost, exclude_watched,
+                blend, blend_weight, candidates=None):
+        """
+        Final scores for every row, or for ``candidates`` (sorted rows)
+        only, in which case position i holds the score of candidates[i].
+        """
+        index = model.row(movie_id)
+        if model.vectors is None or index is None:
+            return None
+
+        if candidates is None:
+            scores = model.scores_for(movie_id)
+
+            def place(rows):
+                return rows, np.ones(len(rows), dtype=bool)
+        else:
+            scores = model.vectors[candidates].dot(
+                model.vectors[index].T
+            ).toarray().ravel()
+
+            def place(rows):
+                pos = np.searchsorted(candidates, rows)
+                pos = np.minimum(pos, len(candidates) - 1)
+                found = candidates[pos] == rows
+                return pos[found], found
+
+        # Mix in scores from another model (e.g. collaborative filtering)
+        if blend and blend_weight:
+            rows, found = model.lookup(
+                np.fromiter(blend.keys(), dtype=np.int64, count=len(blend))
+            )
+            values = np.fromiter(
+                blend.values(), dtype=np.float64, count=len(blend)
+            )[found]
+            pos, placed = place(rows)
+            scores *= 1.0 - blend_weight
+            scores[pos] += blend_weight * values[placed]
+
+        # BOOST (or exclude) using watched history
+        if watched_ids:
+            watched_pos, _ = place(model.rows_for(watched_ids))
+            if exclude_watched:
+                scores[watched_pos] = -np.inf
+            else:
+                if boost is None:
+                    boost = self.watched_boost
+                scores[watched_pos] += boost
+
+        # Remove the same movie
+        scores[place(np.array([index]))[0]] = -np.inf
+        return scores
+
+
+def get_recommendations(movie_id, movies, watched_ids=None, k=5, **options):
+    """
+    One-off recommendation without a persistent model.
+
+    movie_id     : int (current movie)
+    movies       : list of Movie objects
+    watched_ids  : iterable of movie IDs already watched by user
+    k            : number of movie IDs to return
+    options      : ``boost`` / ``exclude_watched``, see ``recommend``
+    """
+    engine = RecommenderEngine().fit(movies)
+    return engine.recommend(movie_id, watched_ids=watched_ids, k=k, **options)
@@ -0,0 +1,9 @@
+from app import app, db, init_db
+from migrations import recompute_rating_aggregates
+
+# Recompute every movie's rating_count / rating_sum / rating_avg in bulk
+with app.app_context():
+    init_db()
+    with db.engine.begin() as conn:
+        recompute_rating_aggregates(conn)
+    print("✅ Rating aggregates recomputed")
@@ -0,0 +1,150 @@
+# search.py
+
+import re
+
+import sqlalchemy as sa
+
+# Indexed movie columns and their BM25 weights (title matches count most)
+FTS_COLUMNS = {
+    "title": 10.0,
+    "cast": 4.0,
+    "director": 4.0,
+    "keywords": 2.0,
+    "description": 1.0,
+}
+
+_columns = ", ".join(f'"{c}"' for c in FTS_COLUMNS)
+_new_values = ", ".join(f'new."{c}"' for c in FTS_COLUMNS)
+_old_values = ", ".join(f'old."{c}"' for c in FTS_COLUMNS)
+_weights = ", ".join(str(w) for w in FTS_COLUMNS.values())
+
+TRIGGER_NAMES = ("movie_fts_ai", "movie_fts_ad", "movie_fts_au")
+
+# External-content FTS5 table kept in sync with `movie` by triggers.
+# prefix='2 3' adds prefix indexes so "dri*" style queries stay fast.
+# The update trigger only fires for the indexed columns, so rating
+# aggregate updates do not rewrite the movie's index entry.
+SETUP_SQL = [
+    f"""
+    CREATE VIRTUAL TABLE IF NOT EXISTS movie_fts USING fts5(
+        {_columns},
+        content='movie', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2',
+        prefix='2 3'
+    )
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS movie_fts_ai AFTER INSERT ON movie BEGIN
+        INSERT INTO movie_fts(rowid, {_columns})
+        VALUES (new.id, {_new_values});
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS movie_fts_ad AFTER DELETE ON movie BEGIN
+        INSERT INTO movie_fts(movie_fts, rowid, {_columns})
+        VALUES ('delete', old.id, {_old_values});
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS movie_fts_au
+    AFTER UPDATE OF {_columns} ON movie BEGIN
+        INSERT INTO movie_fts(movie_fts, rowid, {_columns})
+        VALUES ('delete', old.id, {_old_values});
+        INSERT INTO movie_fts(rowid, {_columns})
+        VALUES (new.id, {_new_values});
+    END
+    """,
+]
+
+
+def setup_search_index(engine, rebuild=False):
+    """
+    Create the FTS table and its triggers if they are missing.
+
+    The index is rebuilt from the movie table when it is first created
+    or when ``rebuild`` is set (e.g. after the movie table was recreated).
+    """
+    with engine.begin() as conn:
+        exists = conn.execute(sa.text(
+            "SELECT 1 FROM sqlite_master WHERE name = 'movie_fts'"
+        )).first()
+        for statement in SETUP_SQL:
+            conn.execute(sa.text(statement))
+        if rebuild or not exists:
+            rebuild_search_index(conn)
+
+
+def drop_search_triggers(conn):
+    """
+    Stop per-row index updates, e.g. during a bulk import.
+
+    Run setup_search_index(engine, rebuild=True) afterwards.
+    """
+    for name in TRIGGER_NAMES:
+        conn.execute(sa.text(f"DROP TRIGGER IF EXISTS {name}"))
+
+
+def restore_search_triggers(engine):
+    """
+    Recreate the triggers if a bulk import died without restoring them,
+    and rebuild the index, which missed every write since. Returns True
+    when they were missing.
+
+    Also replaces an update trigger from before it was limited to the
+    indexed columns.
+    """
+    with engine.begin() as conn:
+        triggers = dict(conn.execute(sa.text(
+            "SELECT name, sql FROM sqlite_master "
+            "WHERE type = 'trigger' OR name = 'movie_fts'"
+        )).all())
+        if "movie_fts" not in triggers:
+            return False
+        update_sql = triggers.get("movie_fts_au")
+        if update_sql is not None and "UPDATE OF" not in update_sql.upper():
+            conn.execute(sa.text("DROP TRIGGER movie_fts_au"))
+            conn.execute(sa.text(SETUP_SQL[-1]))
+        if triggers.keys() >= set(TRIGGER_NAMES):
+            return False
+        for statement in SETUP_SQL:
+            conn.execute(sa.text(statement))
+        rebuild_search_index(conn)
+    return True
+
+
+def rebuild_search_index(conn):
+    conn.execute(sa.text(
+        "INSERT INTO movie_fts(movie_fts) VALUES ('rebuild')"
+    ))
+
+
+def fts_query(text):
+    """
+    Turn free text into an FTS5 query.
+
+    Every word must match as a prefix, so "drish moh" finds
+    "Drishyam" with Mohanlal while the user is still typing.
+    """
+    words = re.findall(r"\w+", (text or "").lower())
+    if not words:
+        return None
+    return " ".join(f'"{w}"*' for w in words)
+
+
+def search_matches(text):
+    """
+    Subquery of (rowid, rank) for movies matching ``text``.
+
+    Join it to Movie on ``Movie.id == matches.c.rowid`` and order by
+    ``matches.c.rank`` for BM25 relevance (lower is better).
+    Returns None when the text has nothing searchable.
+    """
+    query = fts_query(text)
+    if query is None:
+        return None
+    return sa.text(
+        f"SELECT rowid, bm25(movie_fts, {_weights}) AS rank "
+        "FROM movie_fts WHERE movie_fts MATCH :q"
+    ).bindparams(q=query).columns(
+        rowid=sa.Integer, rank=sa.Float
+    ).subquery("fts")
@@ -0,0 +1,52 @@
+# serializers.py
+
+import json
+
+from flask import Response, request
+
+# Compact separators: no spaces after "," and ":"
+SEPARATORS = (",", ":")
+
+
+def movie_json(movie, detail=False):
+    """Plain dict for one Movie; ``detail`` adds the long text fields."""
+    data = {
+        "id": movie.id,
+        "title": movie.title,
+        "language": movie.language,
+        "genre": movie.genre,
+        "year": movie.release_year,
+        "poster": movie.poster,
+        "rating_avg": round(movie.rating_avg, 2) if movie.rating_count else None,
+        "rating_count": movie.rating_count,
+    }
+    if detail:
+        data.update(
+            description=movie.description,
+            cast=movie.cast,
+            director=movie.director,
+            keywords=movie.keywords,
+        )
+    return data
+
+
+def json_response(payload, status=200, max_age=0, private=False):
+    """
+    Compact JSON response with a content ETag.
+
+    A request whose If-None-Match carries the same ETag gets an empty
+    304 instead, so clients revalidate without downloading the body
+    again. ``max_age`` lets clients reuse the body without asking.
+    """
+    body = json.dumps(payload, separators=SEPARATORS, ensure_ascii=False)
+    response = Response(body, status=status, mimetype="application/json")
+    if status != 200:
+        return response
+
+    response.cache_control.max_age = max_age
+    if private:
+        response.cache_control.private = True
+    else:
+        response.cache_control.public = True
+    response.add_etag()
+    return response.make_conditional(request)
@@ -0,0 +1,54 @@
+# sqlite_pragmas.py
+
+from sqlalchemy import event
+
+# Named sets of PRAGMAs run on every new SQLite connection.
+# Pick one with SQLITE_PROFILE; SQLITE_PRAGMAS overrides single values.
+ENGINE_PROFILES = {
+    # SQLite's own defaults: rollback journal, writers block readers
+    "default": {},
+    "production": {
+        # Readers keep reading while one writer commits
+        "journal_mode": "WAL",
+        # Wait up to 5s for a lock instead of failing with "database is locked"
+        "busy_timeout": 5000,
+        # Safe with WAL: a power loss can only drop the newest commits
+        "synchronous": "NORMAL",
+        "mmap_size": 256 * 1024 * 1024,
+        # Negative values are KiB: 64 MiB of page cache per connection
+        "cache_size": -64 * 1024,
+        "temp_store": "MEMORY",
+    },
+}
+
+
+def profile_pragmas(profile, overrides=None):
+    """PRAGMAs of a named profile with ``overrides`` applied on top."""
+    try:
+        pragmas = dict(ENGINE_PROFILES[profile])
+    except KeyError:
+        raise ValueError(f"unknown SQLite profile {profile!r}")
+    pragmas.update(overrides or {})
+    return pragmas
+
+
+def apply_pragmas(engine, pragmas):
+    """Run ``pragmas`` on every connection ``engine`` opens (SQLite only)."""
+    if engine.dialect.name != "sqlite" or not pragmas:
+        return
+
+    @event.listens_for(engine, "connect")
+    def set_pragmas(dbapi_conn, connection_record):
+        cursor = dbapi_conn.cursor()
+        for name, value in pragmas.items():
+            # PRAGMA does not take bound parameters
+            cursor.execute(f"PRAGMA {name} = {value}")
+        cursor.close()
+
+
+def current_pragmas(conn, names):
+    """{name: value} as SQLite reports them on ``conn``."""
+    return {
+        name: conn.exec_driver_sql(f"PRAGMA {name}").scalar()
+        for name in names
+    }
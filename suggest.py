@@ -0,0 +1,258 @@
+# suggest.py
+
+import re
+import threading
+import time
+import unicodedata
+from bisect import bisect_left, insort
+
+import numpy as np
+
+TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+# Most suggestions one query returns
+MAX_RESULTS = 20
+# Prefixes matching more entries than this get their best movies
+# precomputed at build time, so even "a" is a short lookup
+LARGE_RANGE = 256
+# ... and a packed bitmap over movie ranks when larger than this, so
+# multi-word queries with short words ("sh kh") skip scattering the range
+BITMAP_RANGE = 8192
+# Past this many changed movies a full rebuild is cheaper than the overlay
+MAX_OVERLAY = 500
+# Words of a query that are matched; the rest is ignored
+MAX_QUERY_TOKENS = 4
+
+ALPHABET = "0123456789abcdefghijklmnopqrstuvwxyz"
+
+
+def normalize_tokens(text):
+    """Lower-case ASCII word tokens, accents removed ("Café" -> "cafe")."""
+    text = unicodedata.normalize("NFKD", text or "")
+    text = text.encode("ascii", "ignore").decode().lower()
+    return TOKEN_RE.findall(text)
+
+
+def movie_tokens(title, cast, director, keywords):
+    return tuple(sorted(set(normalize_tokens(" ".join(
+        (title or "", cast or "", director or "", keywords or "")
+    )))))
+
+
+class SuggestIndex:
+    """
+    Prefix index for search-as-you-type over title, cast, director
+    and keyword tokens, ranked by popularity.
+
+    Every (token, movie) pair is one entry of a sorted token list, so
+    all tokens starting with a prefix form one contiguous range found
+    with two binary searches. For the few prefixes whose range is large
+    (one or two letters) the best movies are precomputed. Each word of
+    a query is a prefix; a movie must match all of them.
+
+    Movies added, edited or deleted after the build live in a small
+    overlay until the next full build.
+    """
+
+    def __init__(self):
+        self.version = 0
+        self.built_at = time.monotonic()
+        self.tokens = []
+        self.entry_rank = np.empty(0, dtype=np.int64)
+        self.ranked = []  # movie ids, most popular first
+        self.movies = {}  # movie_id -> (title, year, popularity, tokens)
+        self.top = {}  # large prefix -> ranks of its best movies
+        self.bitmaps = {}  # larger prefix -> packed bits, one per rank
+
+        self.added = {}  # movie_id -> (title, year, popularity, tokens)
+        self.added_tokens = []  # sorted (token, movie_id) of self.added
+        self.removed = set()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.movies) - len(self.removed) + len(self.added)
+
+    # -----------------------------
+    # Building and updating
+    # -----------------------------
+    def build(self, rows, version=0):
+        """
+        Index ``rows`` of (id, title, year, cast, director, keywords,
+        popularity); more popular movies rank first.
+        """
+        movies = {
+            movie_id: (title, year, popularity,
+                       movie_tokens(title, cast, director, keywords))
+            for movie_id, title, year, cast, director, keywords, popularity
+            in rows
+        }
+        # rank 0 = most popular; ties go to the lower movie id
+        ranked = sorted(movies, key=lambda m: (-movies[m][2], m))
+        pairs = sorted(
+            (token, rank)
+            for rank, movie_id in enumerate(ranked)
+            for token in movies[movie_id][3]
+        )
+
+        self.tokens = [token for token, _ in pairs]
+        self.entry_rank = np.fromiter(
+            (rank for _, rank in pairs), dtype=np.int64, count=len(pairs)
+        )
+        self.ranked = ranked
+        self.movies = movies
+        self.top = {}
+        self.bitmaps = {}
+        self._precompute("", 0, len(self.tokens))
+
+        self.added = {}
+        self.added_tokens = []
+        self.removed = set()
+        self.version = version
+        self.built_at = time.monotonic()
+        return self
+
+    def _precompute(self, prefix, lo, hi):
+        if hi - lo <= LARGE_RANGE:
+            return
+        if prefix:
+            ranks = self._ranks(lo, hi)
+            self.top[prefix] = ranks[:MAX_RESULTS * 2]
+            if hi - lo > BITMAP_RANGE:
+                bits = np.zeros(len(self.ranked), dtype=bool)
+                bits[ranks] = True
+                self.bitmaps[prefix] = np.packbits(bits)
+        for char in ALPHABET:
+            self._precompute(prefix + char, *self._range(prefix + char, lo, hi))
+
+    def set_movie(self, movie_id, title, year, cast, director, keywords,
+                  popularity):
+        """Add or re-index one movie without rebuilding."""
+        entry = (title, year, popularity,
+                 movie_tokens(title, cast, director, keywords))
+        with self._lock:
+            if movie_id in self.movies:
+                self.removed.add(movie_id)
+            self._drop_added(movie_id)
+            self.added[movie_id] = entry
+            for token in entry[3]:
+                insort(self.added_tokens, (token, movie_id))
+
+    def remove_movie(self, movie_id):
+        with self._lock:
+            self._drop_added(movie_id)
+            if movie_id in self.movies:
+                self.removed.add(movie_id)
+
+    def _drop_added(self, movie_id):
+        if self.added.pop(movie_id, None) is not None:
+            self.added_tokens = [
+                pair for pair in self.added_tokens if pair[1] != movie_id
+            ]
+
+    @property
+    def overlay_size(self):
+        return len(self.added) + len(self.removed)
+
+    # -----------------------------
+    # Querying
+    # -----------------------------
+    def _range(self, prefix, lo=0, hi=None):
+        hi = len(self.tokens) if hi is None else hi
+        start = bisect_left(self.tokens, prefix, lo, hi)
+        # "\x7f" sorts after every token character
+        end = bisect_left(self.tokens, prefix + "\x7f", start, hi)
+        return start, end
+
+    def _ranks(self, lo, hi):
+        """Distinct movie ranks of entries lo..hi, best first."""
+        return np.unique(self.entry_rank[lo:hi])
+
+    def _mask(self, lo, hi, prefix):
+        """Boolean array over ranks: movies with entries lo..hi."""
+        bitmap = self.bitmaps.get(prefix)
+        if bitmap is not None:
+            return np.unpackbits(bitmap, count=len(self.ranked)).view(bool)
+        mask = np.zeros(len(self.ranked), dtype=bool)
+        mask[self.entry_rank[lo:hi]] = True
+        return mask
+
+    def _base_ids(self, prefixes, k, removed):
+        """Up to ``k`` base movie ids matching every prefix, best first."""
+        ranges = sorted(
+            (hi - lo, lo, hi, p)
+            for p in set(prefixes) for lo, hi in [self._range(p)]
+        )
+        size, lo, hi, driver = ranges[0]
+        if size == 0:
+            return []
+
+        if len(ranges) == 1:
+            # Single word: the precomputed best movies usually suffice
+            if size > LARGE_RANGE:
+                found = self._first(self.top[driver], k, removed)
+                if found is not None:
+                    return found
+            return self._first(self._ranks(lo, hi), k, removed, complete=True)
+
+        # Several words: AND one boolean mask over movie ranks per word.
+        # Scattering a range is much cheaper than sorting it.
+        matched = self._mask(lo, hi, driver)
+        for _, p_lo, p_hi, p in ranges[1:]:
+            matched &= self._mask(p_lo, p_hi, p)
+        ranks = np.flatnonzero(matched)
+        return self._first(ranks, k, removed, complete=True)
+
+    def _added_ids(self, prefixes):
+        """Overlay movies matching every prefix (call with the lock held)."""
+        ids = None
+        for prefix in prefixes:
+            lo = bisect_left(self.added_tokens, (prefix,))
+            hi = bisect_left(self.added_tokens, (prefix + "\x7f",), lo)
+            found = {movie_id for _, movie_id in self.added_tokens[lo:hi]}
+            ids = found if ids is None else ids & found
+            if not ids:
+                break
+        return ids
+
+    def _first(self, ranks, k, removed, complete=False):
+        """
+        The first ``k`` movies of ``ranks`` not in ``removed``. None when
+        a truncated precomputed list (``complete`` False) ran out first.
+        """
+        result = []
+        # At most len(removed) ranks are skipped
+        for rank in ranks[:k + len(removed)].tolist():
+            movie_id = self.ranked[rank]
+            if movie_id not in removed:
+                result.append(movie_id)
+                if len(result) == k:
+                    return result
+        if not complete and len(ranks) >= MAX_RESULTS * 2:
+            # The precomputed list is truncated: removed movies used it up
+            return None
+        return result
+
+    def suggest(self, query, k=10):
+        """
+        Up to ``k`` (movie_id, title, year) matches for ``query``, most
+        popular first.
+        """
+        prefixes = normalize_tokens(query)[:MAX_QUERY_TOKENS]
+        k = max(0, min(k, MAX_RESULTS))
+        if not prefixes or not k:
+            return []
+
+        with self._lock:
+            added = [(m, self.added[m]) for m in self._added_ids(prefixes)]
+            removed = set(self.removed)
+
+        base = self._base_ids(prefixes, k, removed)
+        matches = [(self.movies[m][2], m, self.movies[m]) for m in base]
+        matches.extend((entry[2], m, entry) for m, entry in added)
+
+        if added:
+            matches.sort(key=lambda m: (-m[0], m[1]))
+        return [
+            (movie_id, entry[0], entry[1])
+            for _, movie_id, entry in matches[:k]
+        ]
@@ -0,0 +1,124 @@
+# user_cache.py
+
+import threading
+import time
+from collections import OrderedDict
+
+
+class UserSnapshot:
+    """
+    The User columns pages read, detached from any database session.
+
+    What Flask-Login's ``current_user`` is for cached users: it carries
+    no password hash and cannot be changed and committed; update the
+    User row instead and forget the snapshot (UserCache.forget).
+    """
+
+    __slots__ = (
+        "id", "username", "email", "profile_image",
+        "is_admin", "is_active", "is_verified",
+    )
+
+    is_authenticated = True
+    is_anonymous = False
+
+    def __init__(self, **fields):
+        for name in self.__slots__:
+            setattr(self, name, fields[name])
+
+    @classmethod
+    def from_user(cls, user):
+        return cls(**{name: getattr(user, name) for name in cls.__slots__})
+
+    def get_id(self):
+        return str(self.id)
+
+    def __eq__(self, other):
+        if isinstance(other, UserSnapshot):
+            return self.id == other.id
+        return NotImplemented
+
+    def __hash__(self):
+        return hash(self.id)
+
+    def __repr__(self):
+        return f"<UserSnapshot {self.id}>"
+
+
+class UserCache:
+    """
+    Bounded LRU of UserSnapshots for the login user loader.
+
+    Saves the user lookup on every authenticated request. Routes that
+    change a user forget its snapshot, which takes effect at once in
+    this process; ``ttl`` bounds how long other workers keep serving
+    the old one (e.g. a deactivated user's session).
+    """
+
+    def __init__(self, max_users=10000, ttl=30):
+        self.max_users = max_users
+        self.ttl = ttl
+        self.users = OrderedDict()  # user_id -> (snapshot, loaded_at)
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self._lock = threading.Lock()
+
+    def get(self, user_id, load):
+        """Snapshot of ``user_id``; ``load(user_id)`` -> snapshot or None."""
+        with self._lock:
+            entry = self.users.get(user_id)
+            if entry is not None:
+                snapshot, loaded_at = entry
+                if self.ttl is None or time.monotonic() - loaded_at < self.ttl:
+                    self.users.move_to_end(user_id)
+                    self.hits += 1
+                    return snapshot
+                del self.users[user_id]
+            self.misses += 1
+            invalidations = self.invalidations
+
+        loaded_at = time.monotonic()
+        snapshot = load(user_id)
+
+        with self._lock:
+            # Not if a forget() ran meanwhile: the row may have changed
+            # after it was read
+            if snapshot is not None and invalidations == self.invalidations:
+                self.users[user_id] = (snapshot, loaded_at)
+                while len(self.users) > self.max_users:
+                    self.users.popitem(last=False)
+        return snapshot
+
+    def forget(self, user_id):
+        with self._lock:
+            self.users.pop(user_id, None)
+            self.invalidations += 1
+
+    def clear(self):
+        with self._lock:
+            self.users.clear()
+            self.invalidations += 1
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self.users),
+                "hits": self.hits,
+                "misses": self.misses,
+                "invalidations": self.invalidations,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
+
+    def prometheus(self):
+        """Counters in the Prometheus text exposition format."""
+        stats = self.stats()
+        lines = []
+        for name in ("hits", "misses", "invalidations"):
+            metric = f"app_user_cache_{name}_total"
+            lines.append(f"# TYPE {metric} counter")
+            lines.append(f"{metric} {stats[name]}")
+        lines.append("# TYPE app_user_cache_entries gauge")
+        lines.append(f"app_user_cache_entries {stats['entries']}")
+        return "\n".join(lines) + "\n"